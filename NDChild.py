@@ -1,4 +1,13 @@
+import copy
+import functools
 import re
+from time import perf_counter
+from Sentence import (
+    S_AT, O1_AT, O2_AT, O3_AT, P_AT, AUX_AT, VERB_AT, NOT_AT, NEVER_AT, KA_AT,
+    O3_IN, P_IN, NOT_IN, O1_IN, NEVER_IN, VERB_IN,
+    HAS_S, HAS_O1, HAS_O2, HAS_O3, HAS_ADV, HAS_AUX, HAS_VERB, HAS_NOT,
+    HAS_NEVER, HAS_KA, HAS_WH, HAS_PLUS_WH, HAS_WA,
+    LAST_AUX, LAST_KA, FIRST_WH, FIRST_P_O3_WH, OUT_OBLIQUE)
 from utils import progress_bar
 
 
@@ -10,6 +19,10 @@ def format_val(val):
 
 
 class NDChild(object):
+    # the attributes which make up the complete state of a learner (see
+    # `snapshot`). variants which add state extend them.
+    state_attributes = ('grammar', 'r', 'conservativerate', 'target_language')
+
     def __repr__(self):
         return 'NDChild({})'.format({k: format_val(v)
                                      for k, v in self.grammar.items()})
@@ -48,31 +61,48 @@ class NDChild(object):
             self.QInvEtrigger
         ]
 
+    def snapshot(self):
+        """Returns a copy of the complete state of the learner, which `restore`
+        resumes exactly. It pickles, and can be restored into another variant
+        of the learner, eg. one which runs more of its e-triggers.
+
+        """
+        return copy.deepcopy({name: getattr(self, name)
+                              for name in self.state_attributes})
+
+    def restore(self, state):
+        """ Resumes the learner from `state`, as returned by `snapshot` """
+        for name, value in copy.deepcopy(state).items():
+            setattr(self, name, value)
+
     def consumeSentence(self, s):  # child is fed a list containing [lang, inflec, sentencestring]
         for trigger in self.trigger_methods:
             trigger(s)
 
-    # etriggers for parameters
+    # etriggers for parameters. they read the sentence's precomputed features
+    # (see Sentence.py) rather than searching its words.
     # first parameter Subject Position
     def spEtrigger(self, s):
+        f = s.features
+        O1index = f[O1_AT]
+        Sindex = f[S_AT]  # Sindex is position of S in sentList
         # Check if O1 and S are in the sentence and sent is declarative
-        if "O1" in s.sentenceList and "S" in s.sentenceList and s.inflection == "DEC":
-            O1index = s.sentenceList.index("O1")
-            Sindex = s.sentenceList.index("S")  # Sindex is position of S in sentList
+        if O1index != -1 and Sindex != -1 and s.inflection == "DEC":
             # Make sure O1 is non-sentence-initial and before S
-            if O1index > 0 and O1index < s.sentenceList.index("S"):
+            if O1index > 0 and O1index < Sindex:
                 # set towards Subject final
                 self.adjustweight("SP", 1)
             # S occurs before 01
-            elif Sindex > 0 and O1index > s.sentenceList.index("S"):  # S cannot be Sent initial
+            elif Sindex > 0 and O1index > Sindex:  # S cannot be Sent initial
                 # set towards Subject initial
                 self.adjustweight("SP", 0)
 
     # second parameter Head IP, VP, PP, etc
     def hipEtrigger(self, s):
-        if "O3" in s.sentenceList and "P" in s.sentenceList:
-            O3index = s.sentenceList.index("O3")
-            Pindex = s.sentenceList.index("P")
+        f = s.features
+        O3index = f[O3_AT]
+        Pindex = f[P_AT]
+        if O3index != -1 and Pindex != -1:
             # O3 followed by P and not topicalized
             if O3index > 0 and Pindex == O3index + 1:
                 self.adjustweight("HIP", 1)
@@ -80,75 +110,84 @@ class NDChild(object):
                 self.adjustweight("HIP", 0)
 
         # If imperative, make sure Verb directly follows O1
-        elif s.inflection == "IMP" and "O1" in s.sentenceList and "Verb" in s.sentenceList:
-            if s.sentenceList.index("O1") == s.sentenceList.index("Verb") - 1:
+        elif s.inflection == "IMP" and f[O1_AT] != -1 and f[VERB_AT] != -1:
+            if f[O1_AT] == f[VERB_AT] - 1:
                 self.adjustweight("HIP", 1)
-            elif s.sentenceList.index("Verb") == (s.sentenceList.index("O1") - 1):
+            elif f[VERB_AT] == (f[O1_AT] - 1):
                 self.adjustweight("HIP", 0)
 
     # third parameter Head in CP
     def hcpEtrigger(self, s):
         if s.inflection == "Q":
+            f = s.features
             # ka or aux last in question
-            if s.sentenceList[-1] == 'ka' or ("ka" not in s.sentenceList and s.sentenceList[-1] == "Aux"):
+            if f[LAST_KA] or (f[KA_AT] == -1 and f[LAST_AUX]):
                 self.adjustweight("HCP", 1)
             # ka or aux first in question
-            elif s.sentenceList[0] == "ka" or ("ka" not in s.sentenceList and s.sentenceList[0] == "Aux"):
+            elif f[KA_AT] == 0 or (f[KA_AT] == -1 and f[AUX_AT] == 0):
                 self.adjustweight("HCP", 0)
 
     # fourth parameter Optional Topic (0 is obligatory,  1 is optional)
     def optEtrigger(self, s):
+        f = s.features
         if s.inflection == "DEC" and self.grammar["TM"] > 0.5 and self.grammar[
-            "NT"] < 0.5 and "[+WA]" not in s.sentenceStr:
+            "NT"] < 0.5 and not f[HAS_WA]:
             self.adjustweight("OPT", 1)
         #elif s.inflection == "DEC" and self.grammar["TM"] > 0.5 and self.grammar[
             #"NT"] < 0.5 and "[+WA]" in s.sentenceStr:
             #self.adjustweightConservatively("OPT", 0)
 
         elif s.inflection == "Q" and self.grammar["TM"] > 0.5 and self.grammar[
-            "NT"] < 0.5 and "[+WA]" not in s.sentenceStr and "+WH" in s.sentenceStr:
+            "NT"] < 0.5 and not f[HAS_WA] and f[HAS_PLUS_WH]:
             self.adjustweight("OPT", 1)
         #first word in sentence is any of those & overt subject and full complemenets in VP
 
         elif (self.grammar["NT"] < 0.5):
-            if (s.inflection == "DEC" and s.sentenceList[0] in ["Verb", "Aux", "Not", "Never"]):
+            # the first word is one of Verb, Aux, Not, Never
+            first_is_head = (f[VERB_AT] == 0 or f[AUX_AT] == 0
+                             or f[NOT_AT] == 0 or f[NEVER_AT] == 0)
+            if (s.inflection == "DEC" and first_is_head):
                 self.adjustweight("OPT", 1)  # Opt to 1 unambig
                 ##print("ka in DEC")
-            if (s.sentenceList[0] in ["ka","Verb", "Aux", "Not", "Never"] and ("+WH" in s.sentenceStr)  and s.inflection=="Q"):
+            if ((f[KA_AT] == 0 or first_is_head) and f[HAS_PLUS_WH] and s.inflection=="Q"):
                 self.adjustweight("OPT",1)
                 ##print("ka in Q")
-            elif self.grammar["NT"] < 0.5 and s.outOblique():
+            elif self.grammar["NT"] < 0.5 and f[OUT_OBLIQUE]:
                 self.adjustweightConservatively("OPT", 0)
                 ##print("fullhouse")
         #if s.fullhouse():
             #self.adjustweightConservatively("OPT",1)
     def nsEtrigger(self, s):
-        if s.inflection == "DEC" and "S" not in s.sentenceStr and s.outOblique():
+        f = s.features
+        if s.inflection == "DEC" and not f[HAS_S] and f[OUT_OBLIQUE]:
             self.adjustweight("NS", 1)
             self.adjustweight("OPT", 1)
 
-        elif s.inflection == "DEC" and "S" in s.sentenceStr and s.outOblique():
+        elif s.inflection == "DEC" and f[HAS_S] and f[OUT_OBLIQUE]:
             self.adjustweightConservatively("NS", 0)
 
     def ntEtrigger(self, s):
-        if s.inflection == "DEC" and "O2" in s.sentenceStr and "O1" not in s.sentenceStr:
+        f = s.features
+        if s.inflection == "DEC" and f[HAS_O2] and not f[HAS_O1]:
             self.adjustweight("NT", 1)
             self.adjustweight("OPT", 0) # null topic necessitates obligatory topic
 
-        elif s.inflection == "DEC" and "O2" in s.sentenceStr and "O1" in s.sentenceStr and "O3" in s.sentenceStr and "S" in s.sentenceStr and "Adv" in s.sentenceStr:
+        elif s.inflection == "DEC" and f[HAS_O2] and f[HAS_O1] and f[HAS_O3] and f[HAS_S] and f[HAS_ADV]:
             self.adjustweightConservatively("NT", 0)
         # if all possible complements of VP are in sentence, then the sentence is not Null Topic
 
     def whmEtrigger(self, s):
-        if s.inflection == "Q" and "+WH" in s.sentenceStr:
-            if ("+WH" in s.sentenceList[0]) or ("P" in s.sentenceList[0] and "O3[+WH]" == s.sentenceList[1]):
+        f = s.features
+        if s.inflection == "Q" and f[HAS_PLUS_WH]:
+            if f[FIRST_WH] or f[FIRST_P_O3_WH]:
                 self.adjustweightConservatively("WHM", 1)
             else:
                 self.adjustweight("WHM", 0)
 
     def piEtrigger(self, s):
-        pIndex = s.indexString("P")
-        O3Index = s.indexString("O3")
+        f = s.features
+        pIndex = f[P_IN]
+        O3Index = f[O3_IN]
         if pIndex > -1 and O3Index > -1:
             if abs(pIndex - O3Index) > 1:
                 ##print("pos",s.sentenceStr)
@@ -159,10 +198,11 @@ class NDChild(object):
                 self.adjustweightConservatively("PI", 0)
 
     def tmEtrigger(self, s):
-        if "[+WA]" in s.sentenceStr:
+        f = s.features
+        if f[HAS_WA]:
             self.adjustweight("TM", 1)
-        elif "O1" in s.sentenceList and "O2" in s.sentenceList and (
-                abs(s.sentenceList.index("O1") - s.sentenceList.index("O2")) > 1):
+        elif f[O1_AT] != -1 and f[O2_AT] != -1 and (
+                abs(f[O1_AT] - f[O2_AT]) > 1):
             self.adjustweight("TM", 0)
 
     def VtoIEtrigger(self, s):
@@ -197,9 +237,10 @@ class NDChild(object):
         #         #print("never before",s.sentenceStr)
         #         self.adjustweight("VtoI", 1)
         #         self.adjustweight("AH", 0)
-        if "Verb" in s.sentenceStr and "O1" in s.sentenceStr and 'Aux' not in s.sentenceStr and s.inflection == "DEC":
-            o1index = s.indexString("O1")
-            if o1index != 0 and abs(s.indexString("Verb") - o1index) > 1:
+        f = s.features
+        if f[HAS_VERB] and f[HAS_O1] and not f[HAS_AUX] and s.inflection == "DEC":
+            o1index = f[O1_IN]
+            if o1index != 0 and abs(f[VERB_IN] - o1index) > 1:
                 # #print(s.indexString("Verb"))
                 # #print(Notindex)
                 ##print("01 v separate", s.sentenceStr)
@@ -207,7 +248,7 @@ class NDChild(object):
                 self.adjustweight("AH", 0)
 
             # no need to explicitly check inflection because only Q and DEC have AUX
-        elif "Aux" in s.sentenceList:
+        elif f[AUX_AT] != -1:
             ##print(s.sentenceStr)
             self.adjustweightConservatively("VtoI", 0)
 
@@ -215,60 +256,60 @@ class NDChild(object):
         sp = self.grammar['SP']
         hip = self.grammar['HIP']
         hcp = self.grammar['HCP']
+        f = s.features
+        Sindex = f[S_AT]
+        AuxIndex = f[AUX_AT]
+        Vindex = f[VERB_AT]
 
-        if s.inflection == "DEC" and "S" in s.sentenceList and "Aux" in s.sentenceList:
+        if s.inflection == "DEC" and Sindex != -1 and AuxIndex != -1:
             if sp < 0.5 and hip < 0.5:  # (Word orders 1, 5) subject and IP initial, aux to the right of Subject
-                Sindex = s.sentenceList.index("S")
-                if Sindex > 0 and s.sentenceList.index("Aux") == Sindex + 1:
+                if Sindex > 0 and AuxIndex == Sindex + 1:
                     self.adjustweight("ItoC", 0)
 
                     ##print(s.sentenceStr)
 
-                elif hcp < 0.5 and (s.sentenceList.index("Aux") - s.sentenceList.index("S")) < 0:
+                elif hcp < 0.5 and (AuxIndex - Sindex) < 0:
                     # above code aux - s position less than 0 means aux precedes s
                     self.adjustweight("ItoC", 1)
                     self.adjustweight("AH", 0)
 
-                elif hcp > 0.5 and s.sentenceList[-1] == "Aux":
+                elif hcp > 0.5 and f[LAST_AUX]:
                     self.adjustweight("ItoC", 1)
                     self.adjustweight("AH", 0)
 
 
             elif sp > 0.5 and hip > 0.5:  # (Word orders 2, 6) #subject and IP final, aux to the left of subject
-                AuxIndex = s.sentenceList.index("Aux")
-                if (AuxIndex > 0 and s.sentenceList.index("S") == AuxIndex + 1):
+                if (AuxIndex > 0 and Sindex == AuxIndex + 1):
                     self.adjustweight("ItoC", 0)
                     ##print(s.sentenceStr)
 
-                elif hcp > 0.5 and s.sentenceList[-1] == "Aux" and s.sentenceList.index("S") == (AuxIndex - 1):
+                elif hcp > 0.5 and f[LAST_AUX] and Sindex == (AuxIndex - 1):
                     self.adjustweight("ItoC", 1)
                     self.adjustweight("AH", 0)
                     #print("itoc1",s.sentenceStr)
 
 
-                elif hcp < 0.5 and s.sentenceList.index("Aux") == 0:
+                elif hcp < 0.5 and AuxIndex == 0:
                     self.adjustweight("ItoC", 1)
                     self.adjustweight("AH", 0)
                     #print("itoc1", s.sentenceStr)
-                elif hcp < 0.5 and (s.sentenceList.index("Aux") < s.sentenceList.index("Verb")):
+                elif hcp < 0.5 and (AuxIndex < Vindex):
                     self.adjustweight("ItoC", 1)
                     self.adjustweight("AH", 0)
                     #print("itoc1", s.sentenceStr)
 
 
 
-            elif sp > 0.5 and hip < 0.5 and hcp > 0.5 and "Verb" in s.sentenceList:  # subject and C initial, IP final, Aux immediately precedes verb
-                if s.sentenceList.index("Verb") == s.sentenceList.index("Aux") + 1:
+            elif sp > 0.5 and hip < 0.5 and hcp > 0.5 and Vindex != -1:  # subject and C initial, IP final, Aux immediately precedes verb
+                if Vindex == AuxIndex + 1:
                     #print(s.sentenceStr)
                     self.adjustweight("ItoC", 0)
-                elif "Not" in s.sentenceList and (
-                        s.sentenceList.index("Verb") == s.sentenceList.index("Not") + 1 and s.sentenceList.index(
-                        "Verb") == s.sentenceList.index("Aux") + 2):
+                elif f[NOT_AT] != -1 and (
+                        Vindex == f[NOT_AT] + 1 and Vindex == AuxIndex + 2):
                     #print(s.sentenceStr)
                     self.adjustweight("ItoC", 0)
-                elif "Never" in s.sentenceList and (
-                        s.sentenceList.index("Verb") == s.sentenceList.index("Never") + 1 and s.sentenceList.index(
-                        "Verb") == s.sentenceList.index("Aux") + 2):
+                elif f[NEVER_AT] != -1 and (
+                        Vindex == f[NEVER_AT] + 1 and Vindex == AuxIndex + 2):
                     #print(s.sentenceStr)
                     self.adjustweight("ItoC", 0)
                 else:
@@ -277,16 +318,14 @@ class NDChild(object):
                     # will experiment with aggressive rate
                     self.adjustweight("AH", 0)
 
-            elif sp < 0.5 and hip > 0.5 and hcp < 0.5 and "Verb" in s.sentenceList:  # subject and C initial, IP final, Aux immediately precedes verb
-                if s.sentenceList.index("Aux") == s.sentenceList.index("Verb") + 1:
+            elif sp < 0.5 and hip > 0.5 and hcp < 0.5 and Vindex != -1:  # subject and C initial, IP final, Aux immediately precedes verb
+                if AuxIndex == Vindex + 1:
                     self.adjustweight("ItoC", 0)
-                elif "Not" in s.sentenceList and (
-                        s.sentenceList.index("Aux") == s.sentenceList.index("Not") + 1 and s.sentenceList.index(
-                        "Aux") == s.sentenceList.index("Verb") + 2):
+                elif f[NOT_AT] != -1 and (
+                        AuxIndex == f[NOT_AT] + 1 and AuxIndex == Vindex + 2):
                     self.adjustweight("ItoC", 0)
-                elif "Never" in s.sentenceList and (
-                        s.sentenceList.index("Aux") == s.sentenceList.index("Never") + 1 and s.sentenceList.index(
-                        "Aux") == s.sentenceList.index("Verb") + 2):
+                elif f[NEVER_AT] != -1 and (
+                        AuxIndex == f[NEVER_AT] + 1 and AuxIndex == Vindex + 2):
                     self.adjustweight("ItoC", 0)
                 else:
                     self.adjustweight("ItoC", 1)
@@ -297,35 +336,24 @@ class NDChild(object):
 
 
 
-            elif "Aux" in s.sentenceStr and "Verb" in s.sentenceList:  # check if aux and verb in sentence and something comes between them
-                Vindex = s.sentenceList.index("Verb")
-                Auxindex = s.sentenceList.index("Aux")
-                indexlist = []  # tokens that would shed light if between
-                if "S" in s.sentenceList:
-                    Sindex = s.sentenceList.index("S")
-                    indexlist.append(Sindex)
-
-                if "O1" in s.sentenceList:
-                    O1index = s.sentenceList.index("O1")
-                    indexlist.append(O1index)
+            elif f[HAS_AUX] and Vindex != -1:  # check if aux and verb in sentence and something comes between them
+                # tokens that would shed light if between
+                indexlist = [idx for idx in (Sindex, f[O1_AT], f[O2_AT])
+                             if idx != -1]
 
-                if "O2" in s.sentenceList:
-                    O2index = s.sentenceList.index("O2")
-                    indexlist.append(O2index)
-
-                if abs(Vindex - Auxindex) != 1:  # if verb and aux not adjacent
+                if abs(Vindex - AuxIndex) != 1:  # if verb and aux not adjacent
                     for idx in indexlist:
-                        if (Vindex < idx < Auxindex) or (Vindex > idx > Auxindex):  # if item in index list between them
+                        if (Vindex < idx < AuxIndex) or (Vindex > idx > AuxIndex):  # if item in index list between them
                             self.adjustweight("ItoC", 1)
                             self.adjustweight("AH", 0) # set toward 1
                             ##print("itoc1", s.sentenceStr)
                             break
 
-        elif s.inflection == "DEC" and "Never" in s.sentenceStr and "Verb" in s.sentenceStr and "O1" in s.sentenceStr and (
-                "Aux" not in s.sentenceStr):
-            neverPos = s.indexString("Never")
-            verbPos = s.indexString("Verb")
-            O1Pos = s.indexString("O1")
+        elif s.inflection == "DEC" and f[HAS_NEVER] and f[HAS_VERB] and f[HAS_O1] and (
+                not f[HAS_AUX]):
+            neverPos = f[NEVER_IN]
+            verbPos = f[VERB_IN]
+            O1Pos = f[O1_IN]
 
             if (neverPos > -1 and verbPos == neverPos + 1 and O1Pos == verbPos + 1 and self.grammar["HIP"]<0.5 ) or (
                     O1Pos > 0 and verbPos == O1Pos + 1 and neverPos == verbPos + 1 and self.grammar["HIP"]>0.5):
@@ -336,18 +364,19 @@ class NDChild(object):
         #     self.adjustweight("ItoC", 1 )
             # Following line outlines conservative trigger for +ItoC in SOVIC and CIVOS languages. These languages will always have an aux in consv trigger is evidence towards 1 because it is contrary to VPedge triggers
         elif ((sp > 0.5 and hcp < 0.5 and hip < 0.5) or (
-                sp < 0.5 and hcp > 0.5 and hip > 0.5)) and "Never" in s.sentenceStr and "Aux" in s.sentenceStr and "Verb" in s.sentenceStr:
+                sp < 0.5 and hcp > 0.5 and hip > 0.5)) and f[HAS_NEVER] and f[HAS_AUX] and f[HAS_VERB]:
             self.adjustweightConservatively("ItoC", 1)
 
 
     def ahEtrigger(self, s):
         ##print(s.sentenceStr)
+        f = s.features
         if (s.inflection == "DEC" and self.grammar["ItoC"]<0.5) and (
-                "Aux" not in s.sentenceStr and ("Never" in s.sentenceStr or "Not" in s.sentenceStr) and "Verb" in s.sentenceStr and "O1" in s.sentenceStr):
-            neverPos = s.indexString("Never")
-            verbPos = s.indexString("Verb")
-            O1Pos = s.indexString("O1")
-            notPos = s.indexString("Not")
+                not f[HAS_AUX] and (f[HAS_NEVER] or f[HAS_NOT]) and f[HAS_VERB] and f[HAS_O1]):
+            neverPos = f[NEVER_IN]
+            verbPos = f[VERB_IN]
+            O1Pos = f[O1_IN]
+            notPos = f[NOT_IN]
             if (neverPos > -1 and verbPos == neverPos + 1 and O1Pos == verbPos + 1 and self.grammar["HIP"]<0.5) or (
                     O1Pos > -1 and verbPos == O1Pos + 1 and neverPos == verbPos + 1 and self.grammar["HIP"]>0.5):
                 ##print("never verb 01",s.sentenceStr)
@@ -360,17 +389,18 @@ class NDChild(object):
                 self.adjustweight("AH", 1)
                 self.adjustweight("VtoI", 0)
 
-        elif "Aux" in s.sentenceStr:
+        elif f[HAS_AUX]:
             self.adjustweightConservatively("AH", 0)
             # if self.grammar["VtoI"] > 0.5: #If not affix hopping language, vtoi is either 0 or 1, but if evidence of vtoi towards 1 has alreadybeen observed, increase confidence 1VtoI given 0AH
             #   self.adjustweightConservatively("VtoI", 1)
 
     def QInvEtrigger(self, s):
-        if s.inflection == "Q" and "ka" in s.sentenceStr:
+        f = s.features
+        if s.inflection == "Q" and f[HAS_KA]:
             self.adjustweight("QInv", 0)
             self.adjustweight("ItoC", 0)
 
-        elif s.inflection == "Q" and "ka" not in s.sentenceStr and "WH" not in s.sentenceStr:
+        elif s.inflection == "Q" and not f[HAS_KA] and not f[HAS_WH]:
             self.adjustweight("QInv", 1)
 
     #            self.adjustweightConservatively("ItoC", 1)
@@ -406,7 +436,8 @@ class TriggerCacher:
         self.current_trigger = None
         self.current_sentence = None
 
-    def trigger_name(self, method):
+    @staticmethod
+    def trigger_name(method):
         name = re.sub('Etrigger', '', method.__name__)
         name = name.upper() if name.islower() else name
         return name
@@ -425,6 +456,8 @@ class TriggerCacher:
         self.set_trigger(self.current_trigger, self.current_sentence, param, direction, True)
 
     def consume_sentence(self, s):
+        # start from scratch, so precomputing a sentence twice is harmless
+        s.triggers = {}
         child = NDChild(None, None, None)
         child.adjustweight = self.adjustweight
         child.adjustweightConservatively = self.adjustweightConservatively
@@ -449,10 +482,15 @@ def cached_child(klass):
 
         @classmethod
         def precompute_domain(cls, domain):
+            # the cached triggers are those of the base NDChild, whatever
+            # `klass` is, so they only need computing once per domain.
+            if domain.triggers_precomputed:
+                return
             for sentence in progress_bar(
                     domain.sentences.values(),
                     desc='{}: precomputing triggers'.format(klass.__name__)):
                 cls.precompute_sentence(sentence)
+            domain.triggers_precomputed = True
 
         @classmethod
         def precompute_sentence(cls, sentence):
@@ -497,3 +535,152 @@ def cached_child(klass):
         def whmEtrigger(self, s):
             self.handleTrigger(s, 'WHM')
     return CachedChild
+
+
+@functools.lru_cache(maxsize=None)
+def restricted_triggers(klass, triggers: frozenset):
+    """Returns a version of klass which only runs the e-triggers named in
+    `triggers` (see `TriggerCacher.trigger_name`). The others must never fire on
+    the sentences the learner is fed, eg. because the trigger index shows they
+    can't fire on any sentence of its target language (see trigger_index.py).
+
+    """
+    class RestrictedChild(klass):
+        def __init__(self, learningrate, conslearningrate, language):
+            super().__init__(learningrate, conslearningrate, language)
+            self.trigger_methods = [
+                method for method in self.trigger_methods
+                if TriggerCacher.trigger_name(method) in triggers]
+
+    return RestrictedChild
+
+
+@functools.lru_cache(maxsize=None)
+def convergence_tracking(klass, epsilon):
+    """Returns a version of klass which records how fast each parameter is
+    learned, at a constant cost per sentence.
+
+    The target value of each parameter is the corresponding bit of the target
+    language's grammar id. For each parameter, `converged_at` holds the number
+    of sentences consumed when it last moved to the target side of 0.5 (and
+    stayed there since), or None if it is not on the target side.
+    `within_epsilon_at` holds the number of sentences consumed when it first
+    came within `epsilon` of its target, or None if it never did.
+
+    """
+    class ConvergenceTrackingChild(klass):
+        state_attributes = klass.state_attributes + (
+            'sentences_consumed', 'converged_at', 'within_epsilon_at')
+
+        def __init__(self, learningrate, conslearningrate, language):
+            super().__init__(learningrate, conslearningrate, language)
+            self.epsilon = epsilon
+            self.sentences_consumed = 0
+            bits = format(int(language), '013b')
+            self.targets = {param: int(bit)
+                            for param, bit in zip(self.grammar, bits)}
+            self.converged_at = dict.fromkeys(self.grammar)
+            self.within_epsilon_at = dict.fromkeys(self.grammar)
+
+        def consumeSentence(self, s):
+            super().consumeSentence(s)
+            self.sentences_consumed += 1
+
+        def _adjustweight(self, parameter, direction, rate):
+            super()._adjustweight(parameter, direction, rate)
+            value = self.grammar[parameter]
+            target = self.targets[parameter]
+            # parameters only move here, so this is the only place where they
+            # can cross 0.5 or come within epsilon of their target.
+            if (value > 0.5) if target else (value < 0.5):
+                if self.converged_at[parameter] is None:
+                    self.converged_at[parameter] = self.sentences_consumed + 1
+            else:
+                self.converged_at[parameter] = None
+            if (self.within_epsilon_at[parameter] is None
+                    and abs(value - target) < epsilon):
+                self.within_epsilon_at[parameter] = self.sentences_consumed + 1
+
+        def convergence(self):
+            """ The convergence metrics, as columns of an NDResult """
+            metrics = {}
+            for param in self.grammar:
+                metrics[param + '_converged'] = self.converged_at[param]
+                metrics[param + '_within_eps'] = self.within_epsilon_at[param]
+            return metrics
+
+    return ConvergenceTrackingChild
+
+
+@functools.lru_cache(maxsize=None)
+def trigger_profiling(klass, timing=False):
+    """Returns a version of klass which counts, per e-trigger, how often it
+    fires, broken down by the parameter, direction and conservativeness of
+    each adjustment it makes. Counting costs a dict update per adjustment, so
+    it is cheap enough to leave on. With `timing`, the cumulative time spent in
+    each trigger is measured too, which adds two clock reads per trigger call.
+
+    Every trigger is called once per sentence, so `sentences` is also the call
+    count of each trigger.
+
+    """
+    class TriggerProfilingChild(klass):
+        state_attributes = klass.state_attributes + (
+            'sentences', 'fires', 'trigger_time')
+
+        def __init__(self, learningrate, conslearningrate, language):
+            super().__init__(learningrate, conslearningrate, language)
+            self.named_triggers = [(TriggerCacher.trigger_name(method), method)
+                                   for method in self.trigger_methods]
+            self.current_trigger = None
+            self.sentences = 0
+            # maps (trigger, param, direction, conservative) -> fire count
+            self.fires = {}
+            # maps trigger -> cumulative seconds
+            self.trigger_time = dict.fromkeys(
+                (name for name, _ in self.named_triggers), 0.0)
+
+        if timing:
+            def consumeSentence(self, s):
+                self.sentences += 1
+                trigger_time = self.trigger_time
+                for name, trigger in self.named_triggers:
+                    self.current_trigger = name
+                    start = perf_counter()
+                    trigger(s)
+                    trigger_time[name] += perf_counter() - start
+        else:
+            def consumeSentence(self, s):
+                self.sentences += 1
+                for name, trigger in self.named_triggers:
+                    self.current_trigger = name
+                    trigger(s)
+
+        def adjustweight(self, parameter, direction):
+            key = (self.current_trigger, parameter, direction, False)
+            self.fires[key] = self.fires.get(key, 0) + 1
+            super().adjustweight(parameter, direction)
+
+        def adjustweightConservatively(self, parameter, direction):
+            key = (self.current_trigger, parameter, direction, True)
+            self.fires[key] = self.fires.get(key, 0) + 1
+            super().adjustweightConservatively(parameter, direction)
+
+        def trigger_stats(self):
+            """ The profile of this learner, as reported in an NDResult """
+            return {
+                'sentences': self.sentences,
+                'fires': dict(self.fires),
+                'time': dict(self.trigger_time) if timing else None,
+            }
+
+    return TriggerProfilingChild
+
+
+# the learner variants that can be selected by name, eg. from the command line
+LEARNERS = {
+    'NDChild': NDChild,
+    'NDChildModLRP': NDChildModLRP,
+    'CachedNDChild': cached_child(NDChild),
+    'CachedNDChildModLRP': cached_child(NDChildModLRP),
+}
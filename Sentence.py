@@ -1,43 +1,85 @@
-
 # coding: utf-8
 
-# In[ ]:
+import sys
+from array import array
+
+# layout of Sentence.features, which holds everything the e-triggers look up
+# in a sentence.
+
+# position of the first word equal to each token, or -1 if there is none
+TOKENS = ['S', 'O1', 'O2', 'O3', 'P', 'Aux', 'Verb', 'Not', 'Never', 'ka']
+(S_AT, O1_AT, O2_AT, O3_AT, P_AT, AUX_AT, VERB_AT, NOT_AT, NEVER_AT,
+ KA_AT) = range(0, 10)
+
+# position of the first word containing each key, or -1 (see indexString)
+WORD_KEYS = ['O3', 'P', 'Not', 'O1', 'Never', 'Verb']
+O3_IN, P_IN, NOT_IN, O1_IN, NEVER_IN, VERB_IN = range(10, 16)
+
+# whether the sentence string contains each key (1) or not (0)
+STRING_KEYS = ['S', 'O1', 'O2', 'O3', 'Adv', 'Aux', 'Verb', 'Not', 'Never',
+               'ka', 'WH', '+WH', '[+WA]']
+(HAS_S, HAS_O1, HAS_O2, HAS_O3, HAS_ADV, HAS_AUX, HAS_VERB, HAS_NOT,
+ HAS_NEVER, HAS_KA, HAS_WH, HAS_PLUS_WH, HAS_WA) = range(16, 29)
+
+# other flags: the last word is 'Aux' / 'ka', the first word contains '+WH',
+# the first word contains 'P' and the second is 'O3[+WH]', and outOblique
+LAST_AUX, LAST_KA, FIRST_WH, FIRST_P_O3_WH, OUT_OBLIQUE = range(29, 34)
+
+NUM_FEATURES = 34
+
 
 class Sentence(object):
+    # no per-instance dict: the domain holds hundreds of thousands of these
+    __slots__ = ('language', 'inflection', 'sentenceStr', 'sentenceList',
+                 'sentID', 'triggers', 'features')
+
     def __init__ (self, infoList):
-        self.language = infoList[0]
-        self.inflection = infoList[1]
+        # the same few strings recur in every sentence, so they are interned
+        self.language = sys.intern(infoList[0])
+        self.inflection = sys.intern(infoList[1])
         self.sentenceStr = infoList [2]
-        self.sentenceList = infoList[2].split()
+        self.sentenceList = [sys.intern(word) for word in infoList[2].split()]
         self.sentID = int(infoList[3])
         self.triggers = {}
 
+        words = self.sentenceList
+        # positions are stored as signed bytes
+        assert len(words) < 128, self.sentenceStr
+
+        features = array('b', [-1]) * NUM_FEATURES
+        for i, token in enumerate(TOKENS):
+            if token in words:
+                features[i] = words.index(token)
+        for i, key in enumerate(WORD_KEYS, O3_IN):
+            features[i] = self.indexStringFull(key)
+        for i, key in enumerate(STRING_KEYS, HAS_S):
+            features[i] = key in self.sentenceStr
+        features[LAST_AUX] = bool(words) and words[-1] == 'Aux'
+        features[LAST_KA] = bool(words) and words[-1] == 'ka'
+        features[FIRST_WH] = bool(words) and '+WH' in words[0]
+        features[FIRST_P_O3_WH] = (len(words) > 1 and 'P' in words[0]
+                                   and words[1] == 'O3[+WH]')
+
         O1index = self.indexStringFull("O1")
         O2index = self.indexStringFull("O2")
         Pindex = self.indexStringFull("P")
         O3index = self.indexStringFull("O3")
 
-        self.word_indexes = {
-            'O3': self.indexStringFull("O3"),
-            'P': self.indexStringFull("P"),
-            'Not': self.indexStringFull("Not"),
-            'O1': self.indexStringFull("O1"),
-            'Never': self.indexStringFull("Never"),
-            'Verb': self.indexStringFull("Verb")
-        }
-
-        self._outOblique = False
+        outOblique = False
         if (O1index != -1 and O1index < O2index < Pindex and O3index == Pindex+1):
-            self._outOblique = False
+            outOblique = False
         elif (O3index != -1 and O3index < O2index < O1index and Pindex == O3index+1):
-            self._outOblique = False
+            outOblique = False
         elif (O1index != -1 and O2index != -1 and Pindex != -1 and O3index != -1):
-            self._outOblique = True
+            outOblique = True
+        features[OUT_OBLIQUE] = outOblique
+
+        self.features = features
 
     #indexString returns index of word in sentenceList if key string is contained in that word.
     #Returns -1 if key string is not in sentence
     def indexString(self,key):
-        return self.word_indexes[key]
+        return self.features[O3_IN + WORD_KEYS.index(key)]
 
     def indexStringFull(self,key):
         for word in self.sentenceList:
@@ -48,4 +90,4 @@ class Sentence(object):
     #outOblique checks to see if something other than subject has been topicalized ie. moved out of canonical argument order
     #not checking for presence of Adv topicalized, maybe add later (this is sufficient but Adv could be informative for longitudinal study)
     def outOblique(self):
-        return self._outOblique
+        return bool(self.features[OUT_OBLIQUE])
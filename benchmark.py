@@ -0,0 +1,388 @@
+# coding: utf-8
+"""Benchmarks for the hot paths of the simulator.
+
+Runs against either the small domain bundled in benchmarks/small_domain.txt
+(a synthetic domain in the COLAG flat-file format: random sentences over the
+COLAG tokens for 20 grammars, so it runs anywhere in seconds) or the real COLAG
+domain (downloaded and cached in the current directory, as by main.py).
+
+Each benchmark reports its throughput and the peak RSS of the process so far.
+Results can be saved as JSON, and compared against an earlier run: any
+benchmark whose throughput dropped by more than the threshold counts as a
+regression, and makes the script exit with status 1.
+
+    $ python benchmark.py --output before.json
+    ... make changes ...
+    $ python benchmark.py --baseline before.json
+
+"""
+import argparse
+import json
+import logging
+import os
+import os.path
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from random import Random
+
+import main
+from NDChild import LEARNERS
+from datatypes import PARAMETERS, TrialParameters
+from domain import COLAG_FLAT_FILE_RE, ColagDomain
+
+SMALL_DOMAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'benchmarks', 'small_domain.txt')
+
+
+class BenchmarkDefaults:
+    sentences = 100000
+    trial_sentences = 50000
+    plot_languages = 100
+    repeat = 3
+    threshold = 0.1
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process so far, in MB """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macos bytes
+    if sys.platform == 'darwin':
+        return usage / 2 ** 20
+    return usage / 2 ** 10
+
+
+def measure(func, repeat):
+    """Calls `func` `repeat` times, and returns the best wall time, along with
+    the return value of the last call.
+
+    """
+    best = float('inf')
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def report(results, name, seconds, amount, unit):
+    results[name] = {
+        'seconds': seconds,
+        'throughput': amount / seconds,
+        'unit': unit,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    print('{:<32} {:>14,.0f} {:<14} {:>8.3f}s {:>8.1f} MB'.format(
+        name, amount / seconds, unit, seconds, results[name]['peak_rss_mb']))
+
+
+def bench_import(results, repeat):
+    """Times starting a python process that imports main, ie. the startup
+    cost of every run and spawned worker.
+
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    seconds, _ = measure(
+        lambda: subprocess.run([sys.executable, '-c', 'import main'],
+                               cwd=directory, check=True), repeat)
+    report(results, 'import_main', seconds, 1, 'imports/s')
+
+
+def bench_domain_load(results, domain_file, repeat):
+    """Times parsing the flat file `domain_file`, and loading the pickled domain
+    cache written next to it.
+
+    """
+    with open(domain_file) as fh:
+        num_lines = sum(1 for _ in fh)
+    directory = os.path.dirname(domain_file)
+
+    def parse():
+        for path in os.listdir(directory):
+            if path.endswith('.pkl'):
+                os.remove(os.path.join(directory, path))
+        ColagDomain().read_domain_flatfile(domain_file)
+
+    seconds, _ = measure(parse, repeat)
+    report(results, 'domain_parse', seconds, num_lines, 'lines/s')
+
+    seconds, _ = measure(
+        lambda: ColagDomain().read_domain_flatfile(domain_file), repeat)
+    report(results, 'domain_cache_load', seconds, num_lines, 'lines/s')
+
+
+def bench_precompute(results, domain, repeat):
+    learner = LEARNERS['CachedNDChild']
+
+    def precompute():
+        domain.triggers_precomputed = False
+        learner.precompute_domain(domain)
+
+    seconds, _ = measure(precompute, repeat)
+    report(results, 'precompute_domain', seconds, len(domain.sentences),
+           'sentences/s')
+
+
+def bench_sampling(results, domain, languages, num_sentences, repeat):
+    rng = Random(0)
+
+    def sample(get_sentence):
+        def run():
+            for i in range(num_sentences):
+                get_sentence(languages[i % len(languages)], rng=rng)
+        return run
+
+    seconds, _ = measure(sample(domain.get_sentence_in_language), repeat)
+    report(results, 'sample_in_language', seconds, num_sentences,
+           'sentences/s')
+
+    def get_zipf_sentence(language, rng):
+        return domain.get_sentence_in_language(language, rng, 'zipf:1')
+
+    seconds, _ = measure(sample(get_zipf_sentence), repeat)
+    report(results, 'sample_in_language_zipf', seconds, num_sentences,
+           'sentences/s')
+
+    # as main.in_language_sentences draws them for a long stream
+    def sample_batches():
+        params = TrialParameters(language=languages[0], noise=0, rate=0.9,
+                                 conservativerate=0.0005,
+                                 numberofsentences=num_sentences, seed=0,
+                                 learner='CachedNDChild', epsilon=0.01,
+                                 input_distribution='zipf:1')
+        sentences = main.in_language_sentences(params,
+                                               main.StreamRandom(params))
+        for _ in range(num_sentences):
+            next(sentences)
+
+    seconds, _ = measure(sample_batches, repeat)
+    report(results, 'sample_in_language_zipf_batch', seconds, num_sentences,
+           'sentences/s')
+
+    seconds, _ = measure(sample(domain.get_sentence_not_in_language), repeat)
+    report(results, 'sample_noise', seconds, num_sentences, 'sentences/s')
+
+    # a structured noise model, drawn from its precomputed pools: every
+    # language is confused with the next one
+    noise_models = {
+        language: 'confuser:{}'.format(languages[(i + 1) % len(languages)])
+        for i, language in enumerate(languages)}
+
+    def get_confuser_sentence(language, rng):
+        return domain.get_noise_sentence(language, noise_models[language], rng)
+
+    seconds, _ = measure(sample(get_confuser_sentence), repeat)
+    report(results, 'sample_noise_confuser', seconds, num_sentences,
+           'sentences/s')
+
+
+def bench_consume(results, domain, language, num_sentences, repeat):
+    rng = Random(0)
+    sentences = [domain.get_sentence_in_language(language, rng=rng)
+                 if rng.random() > 0.1
+                 else domain.get_sentence_not_in_language(language, rng=rng)
+                 for _ in range(num_sentences)]
+
+    for name in ('NDChild', 'CachedNDChild'):
+        def consume():
+            child = LEARNERS[name](0.9, 0.0005, language)
+            for s in sentences:
+                child.consumeSentence(s)
+
+        seconds, _ = measure(consume, repeat)
+        report(results, 'consume_{}'.format(name), seconds, num_sentences,
+               'sentences/s')
+
+
+def bench_trial(results, language, num_sentences, repeat):
+    params = TrialParameters(language=language,
+                             noise=0.1,
+                             rate=0.9,
+                             conservativerate=0.0005,
+                             numberofsentences=num_sentences,
+                             seed=0,
+                             learner='CachedNDChild',
+                             epsilon=0.01)
+    seconds, _ = measure(lambda: main.run_trial(params), repeat)
+    report(results, 'run_trial', seconds, num_sentences, 'sentences/s')
+
+
+def bench_report(results, num_languages, repeat):
+    """Times plotting the results of `num_languages` languages, at 3 noise
+    levels with 100 echildren each, from box plot statistics.
+
+    """
+    import numpy as np
+    from output_handler import box_stats, barplot_output, render_plots
+
+    rng = np.random.RandomState(0)
+    size = num_languages * 3 * 100
+    arrays = {
+        'learner': np.array(['CachedNDChild'] * size),
+        'rate': np.full(size, 0.9),
+        'conservativerate': np.full(size, 0.0005),
+        'language': np.repeat(np.arange(num_languages), 300),
+        'noise': np.tile(np.repeat([0, 0.1, 0.2], 100), num_languages),
+    }
+    for param in PARAMETERS:
+        arrays[param] = rng.uniform(size=size)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        def plot():
+            render_plots(barplot_output(box_stats(arrays),
+                                        os.path.join(tmpdir, 'plot.pdf')))
+
+        seconds, _ = measure(plot, repeat)
+    report(results, 'plot_{}_languages'.format(num_languages), seconds,
+           num_languages, 'languages/s')
+
+
+def compare(results, baseline, threshold):
+    """Compares the throughput of `results` against `baseline`. Returns the
+    names of the benchmarks that regressed by more than `threshold`.
+
+    """
+    regressions = []
+    print('\n{:<32} {:>14} {:>14} {:>8}'.format(
+        'benchmark', 'baseline', 'current', 'change'))
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['throughput']
+        after = result['throughput']
+        change = after / before - 1
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{:<32} {:>14,.0f} {:>14,.0f} {:>+7.1%}{}'.format(
+            name, before, after, change, flag))
+    return regressions
+
+
+def make_fixture(domain, domain_file, output, num_languages, seed=0):
+    """Writes the lines of `num_languages` randomly chosen languages of `domain`
+    from its flat file `domain_file` to `output`, to serve as a small benchmark
+    domain.
+
+    """
+    languages = set(Random(seed).sample(sorted(domain.languages),
+                                        num_languages))
+    with open(domain_file) as fh, open(output, 'w') as out:
+        for line in fh:
+            match = COLAG_FLAT_FILE_RE.match(line)
+            if int(match.group('grammID')) in languages:
+                out.write(line)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--domain', choices=['small', 'real'],
+                        default='small',
+                        help='benchmark against the bundled small domain or '
+                        'the real COLAG domain')
+    parser.add_argument('-s', '--sentences', type=int,
+                        help='sentences per sampling/consumption benchmark',
+                        default=BenchmarkDefaults.sentences)
+    parser.add_argument('--trial-sentences', type=int,
+                        help='sentences in the run_trial benchmark',
+                        default=BenchmarkDefaults.trial_sentences)
+    parser.add_argument('--plot-languages', type=int,
+                        help='languages in the plotting benchmark',
+                        default=BenchmarkDefaults.plot_languages)
+    parser.add_argument('--repeat', type=int,
+                        help='repetitions per benchmark (the best is kept)',
+                        default=BenchmarkDefaults.repeat)
+    parser.add_argument('-o', '--output',
+                        help='write the results to this JSON file')
+    parser.add_argument('--baseline',
+                        help='compare the results against this JSON file')
+    parser.add_argument('--threshold', type=float,
+                        help='relative throughput drop counted as a '
+                        'regression',
+                        default=BenchmarkDefaults.threshold)
+    parser.add_argument('--make-fixture', metavar='PATH',
+                        help='write a small domain with 20 languages of the '
+                        'real domain to PATH, and exit')
+    return parser.parse_args()
+
+
+def main_benchmark():
+    args = parse_arguments()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.make_fixture:
+        main.DOMAIN.init_from_flatfile()
+        make_fixture(main.DOMAIN, 'COLAG_2011_flat.txt', args.make_fixture, 20)
+        return
+
+    if args.domain == 'small':
+        domain_file = SMALL_DOMAIN
+    else:
+        # downloads and unzips the flat file, if necessary
+        main.DOMAIN.init_from_flatfile()
+        domain_file = 'COLAG_2011_flat.txt'
+
+    print('{:<32} {:>14} {:<14} {:>9} {:>11}'.format(
+        'benchmark', 'throughput', '', 'time', 'peak RSS'))
+
+    results = {}
+    bench_import(results, args.repeat)
+
+    # the domain is read from a temporary directory, so its pickled cache is
+    # written there and not next to the flat file.
+    with tempfile.TemporaryDirectory() as tmpdir:
+        local_file = os.path.join(tmpdir, os.path.basename(domain_file))
+        os.symlink(os.path.abspath(domain_file), local_file)
+
+        bench_domain_load(results, local_file, args.repeat)
+
+        # the remaining benchmarks use the domain of main.py, which run_trial
+        # samples from
+        domain = main.DOMAIN
+        domain.read_domain_flatfile(local_file)
+
+    languages = sorted(domain.languages)
+    language = main.Language.English
+    if language not in domain.languages:
+        language = languages[0]
+
+    bench_precompute(results, domain, args.repeat)
+    bench_sampling(results, domain, languages, args.sentences, args.repeat)
+    bench_consume(results, domain, language, args.sentences, args.repeat)
+    bench_trial(results, language, args.trial_sentences, args.repeat)
+    bench_report(results, args.plot_languages, args.repeat)
+
+    output = {
+        'timestamp': datetime.now().isoformat(),
+        'domain': args.domain,
+        'python': sys.version,
+        'platform': platform.platform(),
+        'git_commit': subprocess.getoutput('git rev-parse HEAD'),
+        'benchmarks': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(output, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline.get('domain') != args.domain:
+            logging.warning('baseline was run on the %s domain',
+                            baseline.get('domain'))
+        regressions = compare(results, baseline['benchmarks'], args.threshold)
+        if regressions:
+            print('\n{} benchmark(s) regressed by more than {:.0%}: {}'.format(
+                len(regressions), args.threshold, ', '.join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_benchmark()
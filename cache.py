@@ -0,0 +1,132 @@
+import inspect
+import json
+import logging
+import os
+import os.path
+import pickle
+from collections import OrderedDict
+from hashlib import md5, sha256
+from typing import Optional
+
+from datatypes import NDResult, TrialParameters
+
+
+def code_fingerprint(*objects):
+    """Returns a digest of the code behind `objects`.
+
+    Classes contribute the source of every module in their MRO (so a cached
+    learner fingerprints both the cache wrapper and the learner it wraps),
+    functions and modules contribute their own source. Any edit to that code
+    changes the fingerprint, which invalidates results computed with the old
+    code.
+
+    """
+    digest = md5()
+    for obj in objects:
+        if inspect.isclass(obj):
+            for klass in obj.__mro__:
+                module = inspect.getmodule(klass)
+                if module is None or module.__name__ == 'builtins':
+                    continue
+                digest.update(klass.__qualname__.encode())
+                digest.update(inspect.getsource(module).encode())
+        else:
+            digest.update(inspect.getsource(obj).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """A size-bounded, on-disk cache of trial results.
+
+    Results are content-addressed: the key of a trial is the hash of its
+    `TrialParameters` (which include the echild's seed) and of `namespace`,
+    which should identify everything else the result depends on, ie. the
+    domain and the learner code. Entries are evicted in least recently used
+    order once the cache grows past `max_bytes`. File modification times serve
+    as the LRU clock, so the eviction order survives across runs.
+
+    """
+
+    def __init__(self, directory, max_bytes, namespace=''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        # maps key -> size of entry on disk, least recently used first
+        self.index = OrderedDict()
+        self.total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if not filename.endswith('.pkl'):
+                    continue
+                stat = os.stat(os.path.join(dirpath, filename))
+                entries.append((stat.st_mtime, filename[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.index[key] = size
+            self.total_bytes += size
+
+        logging.info('result cache %s: %s entries, %.1f MB',
+                     directory, len(self.index), self.total_bytes / 2 ** 20)
+
+    def key(self, params: TrialParameters):
+        payload = json.dumps([self.namespace, params.as_dict()], sort_keys=True)
+        return sha256(payload.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+    def get(self, params: TrialParameters) -> Optional[NDResult]:
+        """Returns the cached result of the trial `params`, or None."""
+        key = self.key(params)
+        if key not in self.index:
+            self.misses += 1
+            return None
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as fh:
+                result = pickle.load(fh)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            logging.warning('dropping unreadable cache entry %s', path)
+            self.discard(key)
+            self.misses += 1
+            return None
+        self.index.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, result: NDResult):
+        key = self.key(result.trial_params)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temp file first so a crash never leaves a truncated entry
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as fh:
+            pickle.dump(result, fh)
+        os.replace(tmp_path, path)
+
+        if key in self.index:
+            self.total_bytes -= self.index.pop(key)
+        size = os.path.getsize(path)
+        self.index[key] = size
+        self.total_bytes += size
+        self.evict()
+
+    def discard(self, key):
+        size = self.index.pop(key, 0)
+        self.total_bytes -= size
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in
+        `max_bytes`."""
+        while self.total_bytes > self.max_bytes and self.index:
+            key = next(iter(self.index))
+            self.discard(key)
@@ -1,20 +1,66 @@
 from datetime import datetime, timedelta
-from typing import List
+from typing import Any, List, Optional
 import dataclasses
 
 from domain import GrammarId
 
+# the parameters of a grammar, in the order of the bits of a grammar id
+PARAMETERS = ["SP", "HIP", "HCP", "OPT", "NS", "NT", "WHM", "PI", "TM", "VtoI",
+              "ItoC", "AH", "QInv"]
+
 
 @dataclasses.dataclass
 class ExperimentParameters:
     languages: List[GrammarId]
     noise_levels: List[float]
-    learningrate: float
-    conservative_learningrate: float
+    learningrates: List[float]
+    conservative_learningrates: List[float]
     num_sentences: int
     num_echildren: int
     num_procs: int
+    # record the trajectory of every echild's parameters
     trace: bool
+    # base seed from which the seed of every echild is derived
+    seed: int = 0
+    # directory of the on-disk result cache. caching is disabled when None.
+    cache_dir: Optional[str] = None
+    cache_size: int = 2 ** 30
+    # names of the learner variants (see NDChild.LEARNERS) to run. all of them
+    # are fed the same sentences.
+    learners: List[str] = dataclasses.field(
+        default_factory=lambda: ['CachedNDChild'])
+    # share random draws between the echildren of different noise levels
+    common_random_numbers: bool = False
+    # when set, the number of echildren per language and noise level adapts
+    # (between min_echildren and num_echildren) until the standard error of
+    # every parameter mean is below target_se
+    target_se: Optional[float] = None
+    min_echildren: int = 10
+    # number of samples per trace, evenly spaced in sentence count ('linear')
+    # or in its log ('log')
+    trace_samples: int = 1000
+    trace_spacing: str = 'linear'
+    # distance from its target at which a parameter counts as learned
+    convergence_epsilon: float = 0.01
+    # profile the e-triggers of every echild: None, 'counts' or 'timing'
+    trigger_profiling: Optional[str] = None
+    # serve live metrics of the pool workers over HTTP on this port
+    metrics_port: Optional[int] = None
+    # run the echildren on a pool of processes ('process') or threads
+    # ('thread'), see main.worker_pool
+    executor: str = 'process'
+    # what noise sentences are drawn from, see domain.parse_noise_model
+    noise_model: str = 'uniform'
+    # how in-language sentences are distributed, see
+    # domain.parse_input_distribution
+    input_distribution: str = 'uniform'
+    # when set, every echild consumes its first prefix_sentences sentences
+    # once, without noise, and the noise levels (and learning rates) branch
+    # from there. the prefix runs at prefix_rate and prefix_conservativerate,
+    # or at each rate setting's own rates when None.
+    prefix_sentences: int = 0
+    prefix_rate: Optional[float] = None
+    prefix_conservativerate: Optional[float] = None
 
 
 @dataclasses.dataclass
@@ -25,11 +71,116 @@ class TrialParameters:
     rate: float
     conservativerate: float
     numberofsentences: int
+    seed: int
+    learner: str
+    # a parameter is considered learned once within epsilon of its target
+    epsilon: float
+    # what noise sentences are drawn from, see domain.parse_noise_model
+    noise_model: str = 'uniform'
+    # how in-language sentences are distributed, see
+    # domain.parse_input_distribution
+    input_distribution: str = 'uniform'
+    # the first prefix_sentences sentences are clean, and consumed at
+    # prefix_rate and prefix_conservativerate (see main.run_branches)
+    prefix_sentences: int = 0
+    prefix_rate: Optional[float] = None
+    prefix_conservativerate: Optional[float] = None
+
+    def stream_key(self):
+        """Trials with the same stream key are fed the exact same sentences, and
+        can be run side by side in a single pass.
+
+        """
+        return (self.language, self.noise, self.noise_model,
+                self.input_distribution, self.numberofsentences, self.seed,
+                self.prefix_sentences)
+
+    def prefix(self):
+        """The trial which consumes the prefix of this one, which it branches
+        from.
+
+        """
+        return dataclasses.replace(
+            self, noise=0, rate=self.prefix_rate,
+            conservativerate=self.prefix_conservativerate,
+            numberofsentences=self.prefix_sentences, prefix_sentences=0,
+            prefix_rate=None, prefix_conservativerate=None)
+
+    def family_key(self):
+        """Trials with the same family key branch from the same prefix stream,
+        and can be run together by `main.run_branches`.
+
+        """
+        return self.prefix().stream_key()
 
     def as_dict(self):
         return dataclasses.asdict(self)
 
 
+@dataclasses.dataclass
+class Trace:
+    """ The values of an echild's parameters, sampled over time """
+    # number of sentences consumed at each sample. int array of shape (samples,)
+    sentences: Any
+    # the parameters (in PARAMETERS order) at each sample. float32 array of
+    # shape (samples, len(PARAMETERS))
+    grammar: Any
+
+
+@dataclasses.dataclass
+class Checkpoint:
+    """The learners of a pass over a sentence stream (see main.run_pass), after
+    they consumed `sentences` sentences. The pass resumes feeding the same
+    learners once the next checkpoint is asked for, so consumers read what they
+    need from them first, and never modify them.
+
+    """
+    sentences: int
+    # the trials of the pass, and their learners, in the same order
+    trials: List[TrialParameters]
+    children: List[Any]
+    # when the pass started, which durations are counted from
+    started: datetime
+    # whether all the sentences of the pass were consumed
+    final: bool
+
+
+@dataclasses.dataclass
+class Trajectory:
+    """The exact sentence stream of an echild, with snapshots of its parameters,
+    to replay learners against (see replay.py)
+
+    """
+    language: GrammarId
+    rate: float
+    conservativerate: float
+    # name of the learner that produced it, see NDChild.LEARNERS
+    learner: str
+    # ids of the sentences consumed, in order. uint32 array
+    sentence_ids: Any
+    # number of sentences consumed at each snapshot. int array of shape
+    # (snapshots,)
+    sentences: Any
+    # the parameters (in PARAMETERS order) at each snapshot. float64 array of
+    # shape (snapshots, len(PARAMETERS))
+    grammar: Any
+
+
+@dataclasses.dataclass
+class Divergence:
+    """ Where a replayed learner first departed from a trajectory """
+    # number of sentences consumed when the divergence was found, and the id of
+    # the last one
+    sentence: int
+    sentence_id: int
+    parameter: str
+    expected: float
+    actual: float
+    # whether `sentence` is the first sentence after which the parameter
+    # differed, or only the snapshot where the difference was detected
+    exact: bool
+
+
 @dataclasses.dataclass
 class NDResult:
     trial_params: TrialParameters
@@ -37,6 +188,12 @@ class NDResult:
     duration: timedelta
     language: int
     grammar: dict
+    # per parameter sentences-to-convergence metrics, see
+    # NDChild.convergence_tracking
+    convergence: Optional[dict] = None
+    trace: Optional[Trace] = None
+    # per e-trigger firing counts (and timings), see NDChild.trigger_profiling
+    trigger_stats: Optional[dict] = None
 
     @classmethod
     def csv_headers(cls):
@@ -44,15 +201,24 @@ class NDResult:
             field.name for field in dataclasses.fields(TrialParameters)
         ]
 
-        return [
-            *param_fields, "SP", "HIP", "HCP", "OPT", "NS", "NT", "WHM", "PI",
-            "TM", "VtoI", "ItoC", "AH", "QInv", "timestamp", "duration"
+        convergence_fields = [
+            *(param + '_converged' for param in PARAMETERS),
+            *(param + '_within_eps' for param in PARAMETERS),
         ]
 
+        return [*param_fields, *PARAMETERS, *convergence_fields, "timestamp",
+                "duration"]
+
     def as_csv_row(self):
-        row = dataclasses.asdict(self)
+        # traces and trigger profiles are written to their own files
+        row = dataclasses.asdict(dataclasses.replace(self, trace=None,
+                                                     trigger_stats=None))
+        row.pop('trace')
+        row.pop('trigger_stats')
         trial_params = row.pop('trial_params')
         grammar = row.pop('grammar')
+        convergence = row.pop('convergence')
         row.update(trial_params)
         row.update(grammar)
+        row.update(convergence or {})
         return row
@@ -1,3 +1,4 @@
+import itertools
 import logging
 import os.path
 import pickle
@@ -5,13 +6,13 @@ import re
 import shutil
 import zipfile
 
-import requests
+import random
+from array import array
 from hashlib import md5
-from random import choice
 from typing import Dict, List, NewType
 
 from Sentence import Sentence
-from utils import progress_bar
+from utils import AliasTable, progress_bar
 
 logging.basicConfig(level=logging.INFO)
 
@@ -32,6 +33,8 @@ COLAG_FLAT_FILE_RE = re.compile(r"""
 
 def download_file(url):
     """Downloads a file to disk and returns the resulting local filename"""
+    import requests
+
     local_filename = url.split('/')[-1]
     with requests.get(url, stream=True) as r:
         with open(local_filename, 'wb') as f:
@@ -43,16 +46,18 @@ def download_file(url):
 # changing the salt will force the cached domain to be regenerated. this should
 # be done when changes are made to the domain-generation code that should force
 # re-running and re-caching.
-SALT = b'j3k2f3'
+SALT = b'j3k2f4'
 
 
-def pickled_path(domain_file):
+def pickled_path(domain_file, digest=None):
     """Returns the expected pickled path for the domain file, with the file's hash
     embedded in the filename. If the domain file ever changes, the hash will
     change, which will force recomputing the domain object from the flat file.
 
     """
-    return '{}-{}.pkl'.format(domain_file, hash_file(domain_file, SALT))
+    if digest is None:
+        digest = hash_file(domain_file, SALT)
+    return '{}-{}.pkl'.format(domain_file, digest)
 
 
 def hash_file(path, salt=None):
@@ -69,6 +74,109 @@ def hash_file(path, salt=None):
     return digest.hexdigest()
 
 
+def parse_noise_model(spec):
+    """Parses a noise model specification into a (kind, argument) pair. The
+    noise models are:
+
+    - 'uniform': any sentence type not in the target language
+    - 'hamming:K': the sentence types of the grammars whose parameters differ
+      from the target's in 1 to K places, and that are not in the target
+      language
+    - 'confuser:G': the sentence types of grammar G that are not in the target
+      language
+
+    Raises ValueError for an invalid specification.
+
+    """
+    kind, _, argument = spec.partition(':')
+    if kind == 'uniform' and not argument:
+        return kind, None
+    if kind in ('hamming', 'confuser') and argument.isdigit():
+        return kind, int(argument)
+    raise ValueError('invalid noise model {!r}: expected uniform, hamming:K '
+                     'or confuser:GRAMMAR'.format(spec))
+
+
+def parse_input_distribution(spec):
+    """Parses an input distribution specification into a (kind, argument) pair.
+    The input distributions, over the sentence types of a language, are:
+
+    - 'uniform': every sentence type is equally likely
+    - 'zipf:S': Zipfian with exponent S, the shortest sentences being the most
+      frequent: the sentence of rank r (by number of words, then id) has
+      weight 1 / r ** S
+    - 'illocution:DEC=W,Q=W,IMP=W': the illocution types get the given shares
+      of the input, and the types of each illocution share it equally. Unlisted
+      illocutions get no share.
+    - 'file:PATH': the weights in the file PATH, whose lines are a sentence id
+      and its weight. Unlisted sentences get no weight. Its argument is a
+      (path, digest) pair: 'file:PATH#DIGEST' only matches the file while the
+      md5 of its contents is DIGEST (see `resolve_input_distribution`), and
+      the digest of a bare path is None.
+
+    Raises ValueError for an invalid specification.
+
+    """
+    kind, _, argument = spec.partition(':')
+    try:
+        if kind == 'uniform' and not argument:
+            return kind, None
+        if kind == 'zipf':
+            return kind, float(argument)
+        if kind == 'illocution':
+            weights = {}
+            for item in argument.split(','):
+                illocution, weight = item.split('=')
+                weights[illocution] = float(weight)
+            return kind, weights
+        if kind == 'file' and argument:
+            match = re.fullmatch(r'(.+)#([0-9a-f]{32})', argument)
+            return kind, match.groups() if match else (argument, None)
+    except ValueError:
+        pass
+    raise ValueError('invalid input distribution {!r}: expected uniform, '
+                     'zipf:S, illocution:DEC=W,Q=W,IMP=W or file:PATH'.format(
+                         spec))
+
+
+def resolve_input_distribution(spec):
+    """Returns the input distribution `spec` in the form trials are keyed on. A
+    file:PATH distribution becomes file:ABSPATH#DIGEST, with the path resolved
+    against the current directory and the digest of the file's contents, so
+    the results (and tables) of edited weights are never mistaken for those of
+    the old ones. Specs with a digest are returned as is. Raises ValueError
+    for an invalid specification, or an unreadable file.
+
+    """
+    kind, argument = parse_input_distribution(spec)
+    if kind != 'file' or argument[1] is not None:
+        return spec
+    path = os.path.abspath(argument[0])
+    try:
+        digest = hash_file(path)
+    except OSError as e:
+        raise ValueError('cannot read sentence weights: {}'.format(e))
+    return 'file:{}#{}'.format(path, digest)
+
+
+def read_sentence_weights(path, digest=None):
+    """Reads a file of sentence ids and weights (see `parse_input_distribution`).
+    Raises ValueError if `digest` is given and the file no longer matches it.
+
+    """
+    if digest is not None and hash_file(path) != digest:
+        raise ValueError('sentence weights {} changed since their input '
+                         'distribution was given'.format(path))
+    weights = {}
+    with open(path) as fh:
+        for line in fh:
+            line = line.split('#')[0].strip()
+            if line:
+                sentence_id, weight = line.split()
+                weights[int(sentence_id)] = float(weight)
+    return weights
+
+
 class ColagDomain:
     """ Represents the COLAG language domain."""
 
@@ -87,12 +195,32 @@ class ColagDomain:
         self.languages = {}
         self.sentences = {}
         self.sentence_list = []
+        # salted hash of the flat file the domain was read from. identifies the
+        # domain contents, eg. for caching results computed against it.
+        self.digest = None
+        # set once the static triggers of every sentence have been cached, see
+        # NDChild.cached_child
+        self.triggers_precomputed = False
+        # the trigger_index.TriggerIndex of the domain, once built
+        self.trigger_index = None
+        # maps (grammar id, noise model) -> array of the ids of the sentences
+        # the noise model draws from, see noise_pool
+        self.noise_pools = {}
+        # maps grammar id -> frozenset of its sentence ids
+        self.language_sets = {}
+        # maps (grammar id, input distribution) -> utils.AliasTable over the
+        # grammar's sentence ids, see input_table
+        self.input_tables = {}
+        # maps (path, digest) -> the sentence weights read from the file
+        self.sentence_weights = {}
 
     def init_from_flatfile(self):
         """Convenience function that downloads, unzips and reads the colag domain file,
-        if necessary.
+        if necessary. Does nothing if the domain has been read already.
 
         """
+        if self.digest is not None:
+            return
         txt = 'COLAG_2011_flat.txt'
         zipped = 'COLAG_2011_flat.zip'
         if not os.path.exists(txt):
@@ -110,7 +238,14 @@ class ColagDomain:
         disk as pickle, just reads and returns the cached object.
 
         """
-        pickled = pickled_path(domain_file)
+        self.digest = hash_file(domain_file, SALT)
+        self.triggers_precomputed = False
+        self.trigger_index = None
+        self.noise_pools = {}
+        self.language_sets = {}
+        self.input_tables = {}
+        self.sentence_weights = {}
+        pickled = pickled_path(domain_file, self.digest)
         if os.path.exists(pickled):
             logging.info('reading pickled colag domain from %s' % pickled)
             with open(pickled, 'rb') as fh:
@@ -151,12 +286,132 @@ class ColagDomain:
         with open(pickled, 'wb') as fh:
             pickle.dump(self, fh)
 
-    def get_sentence_not_in_language(self, grammar_id: GrammarId):
+    def language_set(self, grammar_id: GrammarId):
+        """ The set of the sentence ids of a language """
+        try:
+            return self.language_sets[grammar_id]
+        except KeyError:
+            ids = self.language_sets[grammar_id] = frozenset(
+                self.languages[grammar_id])
+            return ids
+
+    def noise_pool(self, grammar_id: GrammarId, noise_model):
+        """Returns the ids of the sentences the noise model `noise_model` (see
+        `parse_noise_model`) draws from for the target `grammar_id`, as an
+        array. Pools are computed once per target and noise model. Raises
+        ValueError if the pool is empty.
+
+        """
+        key = (grammar_id, noise_model)
+        if key in self.noise_pools:
+            return self.noise_pools[key]
+
+        kind, argument = parse_noise_model(noise_model)
+        if kind == 'hamming':
+            # flip every combination of 1 to K of the 13 parameter bits
+            sources = [grammar_id ^ sum(1 << bit for bit in bits)
+                       for distance in range(1, min(argument, 13) + 1)
+                       for bits in itertools.combinations(range(13), distance)]
+            sources = [other for other in sources if other in self.languages]
+        elif kind == 'confuser':
+            if argument not in self.languages:
+                raise ValueError('noise model {}: no grammar {} in the '
+                                 'domain'.format(noise_model, argument))
+            sources = [argument]
+        else:
+            sources = self.languages
+
+        ids = set()
+        for other in sources:
+            ids.update(self.languages[other])
+        ids -= self.language_set(grammar_id)
+        pool = array('i', sorted(ids))
+        if not pool:
+            raise ValueError('noise model {} has no sentences outside of '
+                             'grammar {}'.format(noise_model, grammar_id))
+        self.noise_pools[key] = pool
+        return pool
+
+    def get_sentence_not_in_language(self, grammar_id: GrammarId, rng=random):
+        language = self.language_set(grammar_id)
         while True:
-            s: Sentence = choice(self.sentence_list)
-            if s.sentID not in self.languages[grammar_id]:
+            s: Sentence = rng.choice(self.sentence_list)
+            if s.sentID not in language:
                 return s
 
-    def get_sentence_in_language(self, grammar_id: GrammarId):
-        sentence_id = choice(self.languages[grammar_id])
+    def get_noise_sentence(self, grammar_id: GrammarId, noise_model='uniform',
+                           rng=random):
+        """Draws a noise sentence for the target `grammar_id` from the noise
+        model `noise_model` (see `parse_noise_model`), in constant time once
+        its pool is computed. The uniform model draws by rejection instead,
+        since its pools would hold most of the domain for every target.
+
+        """
+        if noise_model == 'uniform':
+            return self.get_sentence_not_in_language(grammar_id, rng)
+        pool = self.noise_pool(grammar_id, noise_model)
+        return self.sentences[pool[rng.randrange(len(pool))]]
+
+    def input_table(self, grammar_id: GrammarId, input_distribution):
+        """Returns the alias table of the input distribution
+        `input_distribution` (see `parse_input_distribution`) over the
+        sentences of `grammar_id`: its indices are positions in
+        `languages[grammar_id]`. Tables are computed once per language and
+        distribution, and file distributions by the contents of their file (see
+        `resolve_input_distribution`). Raises ValueError if the distribution
+        gives the language no weight.
+
+        """
+        if input_distribution.startswith('file:'):
+            input_distribution = resolve_input_distribution(input_distribution)
+        key = (grammar_id, input_distribution)
+        if key in self.input_tables:
+            return self.input_tables[key]
+
+        kind, argument = parse_input_distribution(input_distribution)
+        sentence_ids = self.languages[grammar_id]
+        if kind == 'zipf':
+            ranked = sorted(
+                range(len(sentence_ids)),
+                key=lambda i: (len(self.sentences[sentence_ids[i]]
+                                   .sentenceList), sentence_ids[i]))
+            weights = [0.0] * len(sentence_ids)
+            for rank, i in enumerate(ranked, 1):
+                weights[i] = 1 / rank ** argument
+        elif kind == 'illocution':
+            illocutions = [self.sentences[i].inflection for i in sentence_ids]
+            counts = {}
+            for illocution in illocutions:
+                counts[illocution] = counts.get(illocution, 0) + 1
+            weights = [argument.get(illocution, 0) / counts[illocution]
+                       for illocution in illocutions]
+        elif kind == 'file':
+            file_weights = self.sentence_weights.get(argument)
+            if file_weights is None:
+                file_weights = read_sentence_weights(*argument)
+                self.sentence_weights[argument] = file_weights
+            weights = [file_weights.get(i, 0) for i in sentence_ids]
+        else:
+            weights = [1] * len(sentence_ids)
+
+        try:
+            table = AliasTable(weights)
+        except ValueError:
+            raise ValueError('input distribution {} gives grammar {} no '
+                             'weight'.format(input_distribution, grammar_id))
+        self.input_tables[key] = table
+        return table
+
+    def get_sentence_in_language(self, grammar_id: GrammarId, rng=random,
+                                 input_distribution='uniform'):
+        """Draws a sentence of `grammar_id` from the input distribution
+        `input_distribution` (see `parse_input_distribution`), in constant
+        time once its table is computed.
+
+        """
+        if input_distribution == 'uniform':
+            sentence_id = rng.choice(self.languages[grammar_id])
+        else:
+            table = self.input_table(grammar_id, input_distribution)
+            sentence_id = self.languages[grammar_id][table.draw(rng)]
         return self.sentences[sentence_id]
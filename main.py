@@ -1,16 +1,31 @@
 # coding: utf-8
 
 import argparse
+import contextlib
+import functools
+import itertools
 import logging
 import multiprocessing
+import os.path
+import queue
+import sys
 from datetime import datetime
-from random import random
+from multiprocessing.pool import ThreadPool
+from random import Random, SystemRandom
+from typing import List
 
-from NDChild import NDChild, NDChildModLRP, cached_child
-from datatypes import ExperimentParameters, TrialParameters, NDResult
-from domain import ColagDomain
-from output_handler import write_results
-from utils import progress_bar
+from NDChild import (LEARNERS, convergence_tracking, restricted_triggers,
+                     trigger_profiling)
+from Sentence import Sentence
+from cache import ResultCache, code_fingerprint
+from datatypes import (Checkpoint, ExperimentParameters, NDResult,
+                       TrialParameters)
+from domain import (ColagDomain, parse_noise_model,
+                    resolve_input_distribution)
+from scheduling import CostModel, run_longest_first
+from telemetry import Telemetry, init_worker, track
+from trigger_index import TriggerIndex
+from utils import AliasTable, RunningStats, derive_seed, progress_bar
 
 logging.basicConfig(level=logging.INFO)
 
@@ -23,7 +38,15 @@ class ExperimentDefaults:
     conservativerate = 0.0005
     numberofsentences = 500000
     numechildren = 100
+    min_echildren = 10
     noise_levels = [0, 0.05, 0.10, 0.25, 0.50]
+    cache_size_mb = 1024
+    trace_samples = 1000
+    convergence_epsilon = 0.01
+
+
+# number of sentences drawn at a time from weighted input distributions
+INPUT_BATCH = 4096
 
 
 class Language:
@@ -41,206 +64,992 @@ class LanguageNotFound(Exception):
     pass
 
 
-def run_traced_trial(params: TrialParameters):
-    """ Runs a single echild simulation and reports the results """
-    logging.debug('running echild with %s', params)
+class StreamRandom:
+    """The random streams an echild's sentences are drawn from (see
+    `sentence_stream`): the noise decisions, the in-language sentences and the
+    noise sentences, each derived from the echild's seed. `getstate` saves
+    their position, and `setstate` restores it.
+
+    """
+
+    def __init__(self, params: TrialParameters):
+        self.decisions = Random(derive_seed(params.seed, 'noise-decisions'))
+        self.out_of_language = Random(derive_seed(params.seed,
+                                                  'out-of-language'))
+        seed = derive_seed(params.seed, 'in-language')
+        if params.input_distribution == 'uniform':
+            self.in_language = Random(seed)
+        else:
+            import numpy as np
+            self.in_language = np.random.default_rng(seed)
+        # indices of in-language sentences drawn from a weighted input
+        # distribution but not yet fed, last first
+        self.batch = []
+
+    def getstate(self):
+        if isinstance(self.in_language, Random):
+            in_language = self.in_language.getstate()
+        else:
+            in_language = self.in_language.bit_generator.state
+        return (self.decisions.getstate(), in_language,
+                self.out_of_language.getstate(), list(self.batch))
+
+    def setstate(self, state):
+        decisions, in_language, out_of_language, batch = state
+        self.decisions.setstate(decisions)
+        if isinstance(self.in_language, Random):
+            self.in_language.setstate(in_language)
+        else:
+            self.in_language.bit_generator.state = in_language
+        self.out_of_language.setstate(out_of_language)
+        self.batch = list(batch)
+
 
+def sentence_stream(params: TrialParameters, rng: StreamRandom = None,
+                    start=0):
+    """Yields the sentences fed to the echild described by `params`.
+
+    The noise decisions, the in-language sentences and the noise sentences come
+    from three independent random streams derived from the echild's seed. An
+    in-language sentence is drawn for every position, even when noise replaces
+    it, so that two echildren with the same seed but different noise levels
+    see the same in-language sentence at every position where neither is fed
+    noise. With common random numbers (see `run_simulations`), the
+    echildren of different noise levels are coupled in exactly this way.
+
+    The first `params.prefix_sentences` sentences are clean. To resume the
+    stream after its first `start` sentences, pass the state of its random
+    streams at that point as `rng`.
+
+    """
+    if rng is None:
+        rng = StreamRandom(params)
     language = params.language
-    noise_level = params.noise
-    child = NDChild(params.rate, params.conservativerate, language)
+    decisions = rng.decisions
+    in_language = in_language_sentences(params, rng)
+    out_of_language = rng.out_of_language
 
-    history = []
+    noise_level = 0 if start < params.prefix_sentences else params.noise
+    for i in range(start, params.numberofsentences):
+        if i == params.prefix_sentences:
+            noise_level = params.noise
+        s = next(in_language)
+        if decisions.random() < noise_level:
+            s = DOMAIN.get_noise_sentence(grammar_id=language,
+                                          noise_model=params.noise_model,
+                                          rng=out_of_language)
+        yield s
 
-    then = datetime.now()
 
-    sample_period = params.numberofsentences / 1000
+def in_language_sentences(params: TrialParameters, rng: StreamRandom):
+    """Endlessly yields in-language sentences for the echild described by
+    `params`, from its input distribution, drawn from `rng.in_language`.
+    Weighted distributions are drawn from their alias tables (see
+    `ColagDomain.input_table`) in vectorized batches of `INPUT_BATCH`.
 
-    for i in range(params.numberofsentences):
-        if random() < noise_level:
-            s = DOMAIN.get_sentence_not_in_language(grammar_id=language)
-        else:
-            s = DOMAIN.get_sentence_in_language(grammar_id=language)
-        child.consumeSentence(s)
-        if i % sample_period == 0:
-            history.append(dict(child.grammar))
+    """
+    if params.input_distribution == 'uniform':
+        while True:
+            yield DOMAIN.get_sentence_in_language(grammar_id=params.language,
+                                                  rng=rng.in_language)
 
-    now = datetime.now()
+    table = DOMAIN.input_table(params.language, params.input_distribution)
+    sentences = [DOMAIN.sentences[sentence_id]
+                 for sentence_id in DOMAIN.languages[params.language]]
+    batch = rng.batch
+    while True:
+        if not batch:
+            batch.extend(reversed(
+                table.draw_batch(rng.in_language, INPUT_BATCH).tolist()))
+        yield sentences[batch.pop()]
 
-    result = NDResult(
-        trial_params=params,
-        timestamp=now,
-        duration=now - then,
-        language=child.target_language,
-        grammar=child.grammar)
 
-    logging.debug('experiment result: %s', result)
+def make_child(params: TrialParameters, profiling=None):
+    """Returns a new learner for the trial `params`, which tracks its
+    sentences-to-convergence metrics. With `profiling` set to 'counts' or
+    'timing', the learner also profiles its e-triggers.
 
-    import pandas as pd
-    import matplotlib.pyplot as plt
-    import numpy as np
+    Without noise, and once the trigger index of the domain is built (see
+    `prepare_domain`), the learner skips the e-triggers that can't fire on any
+    sentence of its target language.
 
-    df = pd.DataFrame(history)
-    df = df + (np.arange(len(df.columns)) / 500)
-    df.index = df.index * 1000
-    ax = df.plot(title='lang={}, noise={}'.format(params.language, params.noise),
-                 sharey=True,
-                 subplots=True)
-    # ax.set_xscale('log')
-    plt.show()
+    """
+    klass = LEARNERS[params.learner]
+    if (params.noise == 0 and profiling is None
+            and DOMAIN.trigger_index is not None):
+        klass = restricted_triggers(
+            klass, DOMAIN.trigger_index.reachable_triggers(params.language))
+    if profiling is not None:
+        klass = trigger_profiling(klass, timing=profiling == 'timing')
+    klass = convergence_tracking(klass, params.epsilon)
+    return klass(params.rate, params.conservativerate, params.language)
 
-    return result
 
-def run_trial(params: TrialParameters):
-    """ Runs a single echild simulation and reports the results """
-    logging.debug('running echild with %s', params)
+def run_pass(trials: List[TrialParameters], children, points=(), rng=None,
+             start=0, started=None):
+    """Feeds the learners `children`, one per trial of `trials`, the sentence
+    stream which the trials share (see `TrialParameters.stream_key`), and
+    yields a `Checkpoint` after every sentence count of `points`, and after
+    the last sentence. To resume the stream after its first `start` sentences,
+    pass the state of its random streams at that point as `rng` (see
+    `sentence_stream`).
 
-    language = params.language
-    noise_level = params.noise
-    child = NDChild(params.rate, params.conservativerate, language)
+    This is the only loop feeding learners sentences: results, traces and any
+    other analysis are read from the checkpoints. The consumer can stop the
+    pass early by not asking for more checkpoints. Between two checkpoints,
+    sentences are fed without any per-sentence bookkeeping, so checkpoints
+    cost nothing to the sentences in between.
 
-    then = datetime.now()
+    The durations reported by the checkpoints are counted from `started`, by
+    default the start of the pass.
+
+    """
+    params = trials[0]
+    end = params.numberofsentences
+    points = sorted(point for point in set(points) if start < point < end)
+    stream = track(sentence_stream(params, rng, start), params)
+
+    if started is None:
+        started = datetime.now()
+
+    consumed = start
+    for point in points + [end]:
+        for s in itertools.islice(stream, point - consumed):
+            for child in children:
+                child.consumeSentence(s)
+        consumed = point
+        yield Checkpoint(sentences=consumed, trials=trials, children=children,
+                         started=started, final=consumed == end)
 
-    for i in range(params.numberofsentences):
-        if random() < noise_level:
-            s = DOMAIN.get_sentence_not_in_language(grammar_id=language)
-        else:
-            s = DOMAIN.get_sentence_in_language(grammar_id=language)
-        child.consumeSentence(s)
 
+def checkpoint_results(checkpoint: Checkpoint, profiling=None):
+    """ The results of the trials of `checkpoint`, as of that checkpoint """
     now = datetime.now()
+    return [
+        NDResult(
+            trial_params=trial,
+            timestamp=now,
+            duration=now - checkpoint.started,
+            language=child.target_language,
+            grammar=dict(child.grammar),
+            convergence=child.convergence(),
+            trigger_stats=child.trigger_stats() if profiling else None)
+        for trial, child in zip(checkpoint.trials, checkpoint.children)
+    ]
+
+
+def run_traced_trial(params: TrialParameters, samples=1000, spacing='linear',
+                     profiling=None):
+    """Runs a single echild simulation and reports the results, including a trace
+    of the echild's parameters at `samples` points in time (see
+    `traces.sample_points`).
+
+    """
+    from traces import TraceRecorder, sample_points
+
+    logging.debug('running traced echild with %s', params)
+
+    child = make_child(params, profiling)
 
-    result = NDResult(
-        trial_params=params,
-        timestamp=now,
-        duration=now - then,
-        language=child.target_language,
-        grammar=child.grammar)
+    recorder = TraceRecorder(
+        sample_points(params.numberofsentences, samples, spacing))
+
+    for checkpoint in run_pass([params], [child],
+                               points=recorder.points.tolist()):
+        if checkpoint.sentences == recorder.due:
+            recorder.record(child.grammar)
+
+    result, = checkpoint_results(checkpoint, profiling)
+    result.trace = recorder.trace()
 
     logging.debug('experiment result: %s', result)
 
     return result
 
 
-def run_simulations(params: ExperimentParameters):
+def run_traced_trials(trials: List[TrialParameters], **kwargs):
+    """ Runs `run_traced_trial` on each of `trials`, with `kwargs` """
+    return [run_traced_trial(trial, **kwargs) for trial in trials]
+
+
+def run_trial(params: TrialParameters, profiling=None):
+    """ Runs a single echild simulation and reports the results """
+    return run_trials([params], profiling)[0]
+
+
+def run_trials(trials: List[TrialParameters], profiling=None):
+    """Runs several echild simulations which share a sentence stream (see
+    `TrialParameters.stream_key`) side by side: every sentence is sampled once,
+    and fed to each learner in turn. Returns one result per trial.
+
+    `profiling` is passed on to `make_child`.
+
+    """
+    logging.debug('running echildren with %s', trials)
+
+    assert all(t.stream_key() == trials[0].stream_key() for t in trials)
+
+    children = [make_child(t, profiling) for t in trials]
+
+    for checkpoint in run_pass(trials, children):
+        pass
+
+    # the learners run interleaved, so each result reports the duration of the
+    # whole pass.
+    results = checkpoint_results(checkpoint, profiling)
+
+    logging.debug('experiment results: %s', results)
+
+    return results
+
+
+def run_branches(trials: List[TrialParameters], profiling=None):
+    """Runs trials which branch from the same prefix (see
+    `TrialParameters.family_key`). The prefix is consumed once by a learner
+    per learner setting of the prefix, side by side. Then every trial resumes
+    from a snapshot of its prefix learner and of the sentence stream, at its
+    own learning rates, and only consumes its own continuation. Continuations
+    sharing a sentence stream run side by side too. Returns one result per
+    trial, the same as if it had consumed its prefix itself.
+
+    `profiling` is passed on to `make_child`.
+
+    """
+    logging.debug('running branches %s', trials)
+
+    def prefix_setting(trial):
+        return (trial.learner, trial.prefix_rate, trial.prefix_conservativerate,
+                trial.epsilon)
+
+    prefixes = {}
+    for trial in trials:
+        prefixes.setdefault(prefix_setting(trial), trial.prefix())
+
+    rng = StreamRandom(trials[0])
+    children = [make_child(trial, profiling) for trial in prefixes.values()]
+    for checkpoint in run_pass(list(prefixes.values()), children, rng=rng):
+        pass
+    snapshots = {setting: child.snapshot()
+                 for setting, child in zip(prefixes, children)}
+    branch_point = rng.getstate()
+    prefix_duration = datetime.now() - checkpoint.started
+
+    streams = {}
+    for trial in trials:
+        streams.setdefault(trial.stream_key(), []).append(trial)
+
+    results = []
+    for stream in streams.values():
+        rng.setstate(branch_point)
+        children = []
+        for trial in stream:
+            child = make_child(trial, profiling)
+            child.restore(snapshots[prefix_setting(trial)])
+            child.r = trial.rate
+            child.conservativerate = trial.conservativerate
+            children.append(child)
+
+        # each result reports the duration of the shared prefix, and of the
+        # pass over its continuation
+        for checkpoint in run_pass(stream, children, rng=rng,
+                                   start=stream[0].prefix_sentences,
+                                   started=datetime.now() - prefix_duration):
+            pass
+        results.extend(checkpoint_results(checkpoint, profiling))
+
+    logging.debug('experiment results: %s', results)
+
+    return results
+
+
+def prepare_domain(learners, trigger_index=False, noise_pools=(),
+                   input_tables=()):
+    """Precomputes, for the whole domain, the static triggers of `learners` (see
+    `NDChild.cached_child`) and, with `trigger_index`, the trigger index used
+    by `make_child`, as well as the noise pools of the (language, noise model)
+    pairs `noise_pools` (see `ColagDomain.noise_pool`) and the alias tables of
+    the (language, input distribution) pairs `input_tables` (see
+    `ColagDomain.input_table`). All are inherited by the workers of pools
+    started afterwards. The workers of a pool started before, like the warm
+    pool of server.py, get the noise pools and alias tables from
+    `prepare_workers`.
+
+    """
+    for name in learners:
+        LEARNERS[name].precompute_domain(DOMAIN)
+    if trigger_index and DOMAIN.trigger_index is None:
+        DOMAIN.trigger_index = TriggerIndex.build(DOMAIN)
+    for language, noise_model in noise_pools:
+        DOMAIN.noise_pool(language, noise_model)
+    for language, input_distribution in input_tables:
+        DOMAIN.input_table(language, input_distribution)
+
+
+def prepare_workers(pool, noise_pools=(), input_tables=()):
+    """Builds the noise pools and alias tables of `noise_pools` and
+    `input_tables` (see `prepare_domain`) in every worker of `pool`, a pool
+    started before `prepare_domain` built them, so they are not built lazily,
+    mid-job, by each worker.
+
+    """
+    if not (noise_pools or input_tables) or isinstance(pool, ThreadPool):
+        # threads share the domain of the main process
+        return
+    size = pool_size(pool)
+    with multiprocessing.Manager() as manager:
+        # every call waits for all the others, so each worker makes one
+        barrier = manager.Barrier(size)
+        pool.starmap(_prepare_worker,
+                     [(barrier, noise_pools, input_tables)] * size,
+                     chunksize=1)
+
+
+def _prepare_worker(barrier, noise_pools, input_tables):
+    prepare_domain((), noise_pools=noise_pools, input_tables=input_tables)
+    barrier.wait()
+
+
+def noise_pools(params: ExperimentParameters):
+    """ The (language, noise model) pairs whose noise pools `params` draws from """
+    if params.noise_model == 'uniform' or not any(params.noise_levels):
+        return []
+    return [(language, params.noise_model) for language in params.languages]
+
+
+def input_tables(params: ExperimentParameters):
+    """Returns the (language, input distribution) pairs whose alias tables
+    `params` draws from.
+
+    """
+    if params.input_distribution == 'uniform':
+        return []
+    return [(language, params.input_distribution)
+            for language in params.languages]
+
+
+def result_code(learners):
+    """The code the results of trials of `learners` depend on, which namespaces
+    the result cache (see `cache.code_fingerprint`): this module, which derives
+    the seeds, draws the sentences, and builds and feeds the learners, and the
+    code it runs to do so.
+
+    """
+    return (*(LEARNERS[name] for name in learners), sys.modules[__name__],
+            Sentence, ColagDomain, TriggerIndex, TrialParameters, AliasTable,
+            track)
+
+
+def run_simulations(params: ExperimentParameters, pool=None, telemetry=None):
     """Runs echild simulations according to `params`.
 
     Returns a generator that yields one result dictionary (as returned by
     run_trial) for each simulation run.
 
+    The simulations run in a new pool of `params.num_procs` processes, unless
+    an existing `pool` is passed, along with the `telemetry` its workers were
+    initialized with (see `worker_pool`).
+
+    """
+
+    DOMAIN.init_from_flatfile()
+
+    cache = None
+    # cached results carry neither traces nor trigger profiles
+    if (params.cache_dir is not None and not params.trace
+            and params.trigger_profiling is None):
+        cache = ResultCache(
+            params.cache_dir,
+            params.cache_size,
+            namespace=DOMAIN.digest + code_fingerprint(
+                *result_code(params.learners)))
+
+    if telemetry is None:
+        telemetry = Telemetry(params.num_procs, port=params.metrics_port)
+
+    if params.target_se is not None and not params.trace:
+        results = progress_bar(
+            _run_adaptive_trials(params, cache, telemetry, pool),
+            desc="running simulations")
+        telemetry.display = getattr(results, 'set_postfix_str', None)
+        yield from results
+        return
+
+    trials = [
+        trial
+        for lang in params.languages
+        for noise in params.noise_levels
+        for echild in range(params.num_echildren)
+        for trial in echild_trials(params, lang, noise, echild)
+    ]
+
+    hits, misses = [], []
+    for trial in trials:
+        result = cache.get(trial) if cache is not None else None
+        if result is None:
+            misses.append(trial)
+        else:
+            hits.append(result)
+
+    if cache is not None:
+        logging.info('%s of %s trials served from the result cache',
+                     len(hits), len(trials))
+
+    results = progress_bar(_run_trials(params, misses, cache, hits, telemetry,
+                                       pool),
+                           total=len(trials),
+                           desc="running simulations")
+    telemetry.display = getattr(results, 'set_postfix_str', None)
+    yield from results
+
+
+def echild_trials(params: ExperimentParameters, lang, noise, echild):
+    """Returns the trials of echild number `echild` of a language and noise
+    level: one per learning rate setting and learner variant, all fed the same
+    sentence stream. With `params.prefix_sentences`, they branch from a clean
+    prefix shared by the echildren of every noise level (see `run_branches`).
+
     """
+    # each echild's seed is derived from its position in the experiment grid,
+    # so re-running the same cell with the same base seed reproduces (and can
+    # be served from the cache) exactly.
+    # the seed does not depend on the learning rates or the learner, so every
+    # rate setting and learner variant sees the same sentence streams. with
+    # common random numbers it doesn't depend on the noise level either, so
+    # echild k of every noise level shares its random draws, as branches of
+    # the same prefix must.
+    if params.common_random_numbers or params.prefix_sentences:
+        seed = derive_seed(params.seed, lang, echild)
+    else:
+        seed = derive_seed(params.seed, lang, noise, echild)
 
-    trials = (
+    trials = [
         TrialParameters(language=lang,
                         noise=noise,
-                        rate=params.learningrate,
+                        rate=rate,
                         numberofsentences=params.num_sentences,
-                        conservativerate=params.conservative_learningrate)
-        for lang in params.languages
-        for noise in params.noise_levels
-        for _ in range(params.num_echildren)
-    )
+                        conservativerate=cons_rate,
+                        seed=seed,
+                        learner=learner,
+                        epsilon=params.convergence_epsilon,
+                        noise_model=params.noise_model,
+                        input_distribution=params.input_distribution)
+        for rate in params.learningrates
+        for cons_rate in params.conservative_learningrates
+        for learner in params.learners
+    ]
 
-    # for reporting progress during the run
-    num_trials = (params.num_echildren
-                  * len(params.languages)
-                  * len(params.noise_levels))
+    if params.prefix_sentences:
+        for trial in trials:
+            trial.prefix_sentences = params.prefix_sentences
+            trial.prefix_rate = (trial.rate if params.prefix_rate is None
+                                 else params.prefix_rate)
+            trial.prefix_conservativerate = (
+                trial.conservativerate
+                if params.prefix_conservativerate is None
+                else params.prefix_conservativerate)
 
-    DOMAIN.init_from_flatfile()
+    return trials
+
+
+@contextlib.contextmanager
+def worker_pool(num_procs, telemetry, pool=None, executor='process'):
+    """Context manager for a pool of `num_procs` workers which report their
+    progress to `telemetry`, while it is active. If `pool` is given, it is
+    used (and left open) instead: its workers must have been initialized with
+    `telemetry` by passing `init_worker` and `telemetry.worker_args()` as the
+    initializer of the pool.
+
+    The workers are processes, or threads with the 'thread' `executor`.
+    Threads share the domain and its precomputed tables with the main
+    process, and exchange trials and results without pickling them, but only
+    run in parallel on a free-threaded build of python (see `free_threaded`).
+
+    """
+    if pool is not None:
+        with telemetry:
+            yield pool
+        return
+    klass = ThreadPool if executor == 'thread' else multiprocessing.Pool
+    with telemetry, klass(num_procs, initializer=init_worker,
+                          initargs=telemetry.worker_args()) as p:
+        yield p
+
+
+def pool_size(pool):
+    """ The number of workers of `pool`, a process or thread pool """
+    return pool._processes
+
+
+def free_threaded():
+    """ Whether python threads run in parallel, ie. the GIL is disabled """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _run_trials(params: ExperimentParameters, trials, cache, cached_results,
+                telemetry, pool=None):
+    """Yields `cached_results`, then the results of running `trials` on
+    `pool` (see `worker_pool`), which report their progress to `telemetry`.
+
+    """
+    yield from cached_results
+
+    if not trials:
+        return
 
     # compute all "static" triggers once for each sentence in the domain and
     # store the cached value.
-    NDChild.precompute_domain(DOMAIN)
+    prepare_domain(params.learners,
+                   trigger_index=0 in params.noise_levels,
+                   noise_pools=noise_pools(params),
+                   input_tables=input_tables(params))
 
-    with multiprocessing.Pool(params.num_procs) as p:
+    # every pass over a sentence stream consumes num_sentences sentences
+    if params.trace:
+        telemetry.expected = len(trials) * params.num_sentences
+    elif params.prefix_sentences:
+        # except the continuations of a branched family, which share a prefix
+        telemetry.expected = (
+            len({trial.family_key() for trial in trials})
+            * params.prefix_sentences
+            + len({trial.stream_key() for trial in trials})
+            * (params.num_sentences - params.prefix_sentences))
+    else:
+        telemetry.expected = len({trial.stream_key() for trial in trials}) * \
+            params.num_sentences
+
+    with worker_pool(params.num_procs, telemetry, pool,
+                     params.executor) as p:
+        if pool is not None:
+            prepare_workers(p, noise_pools(params), input_tables(params))
         # run trials across processors (this doesn't actually start them
         # running- `results` is a generator. the actual computation is deferred
         # until somebody iterates through the generator object.
         if params.trace:
-            results = p.imap_unordered(run_traced_trial, trials)
+            units = [[trial] for trial in trials]
+            run_unit = functools.partial(run_traced_trials,
+                                         samples=params.trace_samples,
+                                         spacing=params.trace_spacing,
+                                         profiling=params.trigger_profiling)
+            kind = 'trace'
+        elif params.prefix_sentences:
+            families = {}
+            for trial in trials:
+                families.setdefault(trial.family_key(), []).append(trial)
+            units = list(families.values())
+            run_unit = functools.partial(run_branches,
+                                         profiling=params.trigger_profiling)
+            kind = 'branch'
         else:
-            results = p.imap_unordered(run_trial, trials)
+            # trials sharing a sentence stream (ie. differing only in learner
+            # or learning rates) run together, in a single pass.
+            streams = {}
+            for trial in trials:
+                streams.setdefault(trial.stream_key(), []).append(trial)
+            units = list(streams.values())
+            run_unit = functools.partial(run_trials,
+                                         profiling=params.trigger_profiling)
+            kind = ''
+        if params.trigger_profiling is not None:
+            kind += ' profiled ' + params.trigger_profiling
 
-        # report output
-        results = progress_bar(results,
-                               total=num_trials,
-                               desc="running simulations")
-        yield from results
+        # the costliest units run first, so no worker is left with a long one
+        # when the others are done (see scheduling.py)
+        cost_model = CostModel(
+            os.path.join(params.cache_dir, 'costs.json')
+            if params.cache_dir is not None else None)
+        results = (result
+                   for unit_results in run_longest_first(
+                       p, run_unit, units, cost_model,
+                       max_pending=2 * pool_size(p), kind=kind)
+                   for result in unit_results)
+
+        for result in results:
+            if cache is not None:
+                cache.put(result)
+            yield result
+
+
+def _run_adaptive_trials(params: ExperimentParameters, cache, telemetry,
+                         pool=None):
+    """Runs echildren for every language and noise level (a "cell") until the
+    standard error of the mean of every parameter, in every learner setting of
+    the cell, drops below `params.target_se`. Each cell runs at least
+    `params.min_echildren` and at most `params.num_echildren` echildren.
+
+    A cell is first judged once its first `min_echildren` echildren are in,
+    so one which converged by then stops there. Otherwise it keeps
+    `min_echildren` echildren in flight until it converges, so compute is
+    spent where the uncertainty is. Yields results as they come in.
+    The echildren run on `pool` (see `worker_pool`), and report their progress
+    to `telemetry`.
+
+    """
+    min_echildren = min(params.min_echildren, params.num_echildren)
+    cells = [(lang, noise)
+             for lang in params.languages
+             for noise in params.noise_levels]
+    launched = {cell: 0 for cell in cells}
+    pending = {cell: 0 for cell in cells}
+    # maps cell -> (learner, rate, cons rate, param) -> stats of param values
+    stats = {cell: {} for cell in cells}
+    # receives (cell, cached results, computed results) for each echild, or
+    # the exception raised while running it.
+    completed = queue.Queue()
+
+    def converged(cell):
+        cell_stats = stats[cell].values()
+        return bool(cell_stats) and all(
+            s.count >= min_echildren and s.sem <= params.target_se
+            for s in cell_stats)
+
+    prepare_domain(params.learners,
+                   trigger_index=0 in params.noise_levels,
+                   noise_pools=noise_pools(params),
+                   input_tables=input_tables(params))
+
+    with worker_pool(params.num_procs, telemetry, pool,
+                     params.executor) as p:
+        if pool is not None:
+            prepare_workers(p, noise_pools(params), input_tables(params))
+
+        def launch(cell):
+            trials = echild_trials(params, *cell, launched[cell])
+            launched[cell] += 1
+            pending[cell] += 1
+            hits, misses = [], []
+            for trial in trials:
+                result = cache.get(trial) if cache is not None else None
+                if result is None:
+                    misses.append(trial)
+                else:
+                    hits.append(result)
+            if not misses:
+                completed.put((cell, hits, []))
+                return
+            p.apply_async(run_trials, (misses, params.trigger_profiling),
+                          callback=lambda results: completed.put(
+                              (cell, hits, results)),
+                          error_callback=completed.put)
 
+        for cell in cells:
+            for _ in range(min_echildren):
+                launch(cell)
 
-def parse_arguments():
+        while any(pending.values()):
+            item = completed.get()
+            if isinstance(item, BaseException):
+                raise item
+            cell, hits, results = item
+            pending[cell] -= 1
+
+            for result in hits + results:
+                trial = result.trial_params
+                for param, value in result.grammar.items():
+                    key = (trial.learner, trial.rate, trial.conservativerate,
+                           param)
+                    stats[cell].setdefault(key, RunningStats()).add(value)
+                yield result
+
+            if cache is not None:
+                for result in results:
+                    cache.put(result)
+
+            # a cell is only judged once its first min_echildren are in, and
+            # then topped up to min_echildren in flight until it converges
+            if (launched[cell] - pending[cell] >= min_echildren
+                    and not converged(cell)):
+                while (pending[cell] < min_echildren
+                       and launched[cell] < params.num_echildren):
+                    launch(cell)
+            if not pending[cell]:
+                logging.debug('language %s, noise %s: stopped after %s '
+                              'echildren (converged: %s)',
+                              *cell, launched[cell], converged(cell))
+
+
+def float_range(value):
+    """Parses either a single float, or an inclusive range of floats written as
+    `start:stop:step`. Always returns a list.
+
+    >>> float_range('0.5')
+    [0.5]
+    >>> float_range('0.1:0.5:0.2')
+    [0.1, 0.3, 0.5]
+    >>> float_range('0.1:0.9:0.5')
+    [0.1, 0.6]
+
+    """
+    if ':' not in value:
+        return [float(value)]
+    try:
+        start, stop, step = (float(x) for x in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'expected a float or start:stop:step, got {!r}'.format(value))
+    if step <= 0 or stop < start:
+        raise argparse.ArgumentTypeError(
+            'invalid range {!r}: needs start <= stop and step > 0'.format(
+                value))
+    # the tolerance keeps 0.3 / 0.1 = 2.9999999999999996 from losing the stop,
+    # flooring keeps steps that overshoot it out
+    num = int((stop - start) / step + 1e-9) + 1
+    # rounding keeps values like 0.30000000000000004 out of the output
+    return [round(start + i * step, 10) for i in range(num)]
+
+
+def rate_range(value):
+    """ A `float_range` of learning rates, which must lie in [0, 1] """
+    rates = float_range(value)
+    if not all(0 <= rate <= 1 for rate in rates):
+        raise argparse.ArgumentTypeError(
+            'invalid rate {!r}: rates must be between 0 and 1'.format(value))
+    return rates
+
+
+def noise_model_argument(spec):
+    try:
+        parse_noise_model(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return spec
+
+
+def input_distribution_argument(spec):
+    # file paths are resolved here, against the directory of the caller
+    try:
+        return resolve_input_distribution(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser()
-    parser.add_argument('-r', '--rate',
-                        type=float,
-                        default=ExperimentDefaults.rate)
-    parser.add_argument('-c', '--cons-rate',
-                        type=float,
-                        default=ExperimentDefaults.conservativerate)
+    parser.add_argument('-r', '--rate', nargs='+',
+                        type=rate_range,
+                        help='learning rate(s). several values or '
+                        'start:stop:step ranges run a sweep',
+                        default=[[ExperimentDefaults.rate]])
+    parser.add_argument('-c', '--cons-rate', nargs='+',
+                        type=rate_range,
+                        help='conservative learning rate(s). several values '
+                        'or start:stop:step ranges run a sweep',
+                        default=[[ExperimentDefaults.conservativerate]])
     parser.add_argument('-e', '--num-echildren',
                         type=int,
                         help='number of echildren per language/noise-level',
                         default=ExperimentDefaults.numechildren)
+    parser.add_argument('--target-se', type=float,
+                        help='run echildren for each language/noise-level '
+                        'until the standard error of every parameter mean '
+                        'drops below TARGET_SE (at most NUM_ECHILDREN)')
+    parser.add_argument('--min-echildren', type=int,
+                        help='minimum number of echildren per '
+                        'language/noise-level with --target-se',
+                        default=ExperimentDefaults.min_echildren)
     parser.add_argument('-s', '--num-sents',
                         type=int,
                         default=ExperimentDefaults.numberofsentences)
     parser.add_argument('-n', '--noise-levels', nargs="+", type=float,
                         default=ExperimentDefaults.noise_levels)
+    parser.add_argument('--noise-model', type=noise_model_argument,
+                        help='what noise sentences are drawn from: uniform '
+                        '(any sentence not in the target language), hamming:K '
+                        '(sentences of the grammars within K parameters of '
+                        'the target) or confuser:GRAMMAR (sentences of '
+                        'GRAMMAR)',
+                        default='uniform')
+    parser.add_argument('--input-distribution',
+                        type=input_distribution_argument,
+                        help='how in-language sentences are distributed: '
+                        'uniform, zipf:S (Zipfian with exponent S, shortest '
+                        'sentences first), illocution:DEC=W,Q=W,IMP=W '
+                        '(shares of each illocution) or file:PATH (sentence '
+                        'ids and weights)',
+                        default='uniform')
     parser.add_argument('-l', '--languages', nargs="+", type=int,
                         default=[Language.English,
                                  Language.French,
                                  Language.German,
                                  Language.Japanese])
+    parser.add_argument('--all-languages', default=False,
+                        action='store_const', const=True,
+                        help='run every grammar in the domain (overrides '
+                        '--languages), and report learnability across '
+                        'grammars instead of per-language stats and plots')
     parser.add_argument('-p', '--num-procs', type=int,
                         help='number of concurrent processes to run',
                         default=multiprocessing.cpu_count())
+    parser.add_argument('--executor', choices=['process', 'thread', 'auto'],
+                        help='run the echildren on a pool of processes, or '
+                        'of threads sharing the domain (only faster on a '
+                        'free-threaded build of python). auto picks threads '
+                        'on free-threaded builds',
+                        default='process')
+    parser.add_argument('--no-plot', default=False,
+                        action='store_const', const=True,
+                        help='do not plot the results (skips importing '
+                        'matplotlib)')
+    parser.add_argument('--no-summary', default=False,
+                        action='store_const', const=True,
+                        help='do not write summary stats and learnability '
+                        'reports (with --no-plot, skips importing pandas)')
     parser.add_argument('-v', '--verbose', default=False,
                         action='store_const', const=True,
                         help='Output per-echild debugging info')
     parser.add_argument('--trace', default=False,
                         action='store_const', const=True,
-                        help='Trace & plot per-parameter values over time')
+                        help='Record per-parameter values over time, for '
+                        'every echild')
+    parser.add_argument('--trace-samples', type=int,
+                        help='number of samples per trace',
+                        default=ExperimentDefaults.trace_samples)
+    parser.add_argument('--trace-spacing', choices=['linear', 'log'],
+                        help='space trace samples evenly over the sentence '
+                        'count or its log',
+                        default='linear')
+    parser.add_argument('--convergence-epsilon', type=float,
+                        help='report when each parameter first comes within '
+                        'this distance of its target',
+                        default=ExperimentDefaults.convergence_epsilon)
+    parser.add_argument('--profile-triggers', default=False,
+                        action='store_const', const=True,
+                        help='count how often each e-trigger fires, and '
+                        'write a report to triggers.csv')
+    parser.add_argument('--profile-trigger-timing', default=False,
+                        action='store_const', const=True,
+                        help='like --profile-triggers, and also time each '
+                        'e-trigger (slower)')
     parser.add_argument('--mod-lrp', default=False,
                         action='store_const', const=True,
                         help='Use the modified-LRP learner')
-    return parser.parse_args()
+    parser.add_argument('--learners', nargs='+', choices=sorted(LEARNERS),
+                        help='run several learner variants side by side, on '
+                        'the same sentences (overrides --mod-lrp)')
+    parser.add_argument('--common-random-numbers', default=False,
+                        action='store_const', const=True,
+                        help='couple the echildren of different noise levels '
+                        'by sharing their random draws, and report paired '
+                        'differences between noise levels')
+    parser.add_argument('--branch-after', type=int, default=0,
+                        metavar='SENTENCES',
+                        help='feed every echild its first SENTENCES sentences '
+                        'once, without noise, and branch the noise levels '
+                        '(and, with --prefix-rate, the learning rates) from '
+                        'a snapshot of its learner. implies '
+                        '--common-random-numbers')
+    parser.add_argument('--prefix-rate', type=float,
+                        help='learning rate of the prefix with --branch-after '
+                        '(default: the rate of each setting)')
+    parser.add_argument('--prefix-cons-rate', type=float,
+                        help='conservative learning rate of the prefix with '
+                        '--branch-after (default: the rate of each setting)')
+    parser.add_argument('--seed', type=int,
+                        help='base random seed. echildren are reproducible '
+                        'given the same seed (default: random)')
+    # resolved here, against the directory of the caller
+    parser.add_argument('--cache-dir', type=os.path.abspath,
+                        help='reuse trial results cached in this directory '
+                        'by earlier runs')
+    parser.add_argument('--cache-size', type=int,
+                        help='maximum size of the result cache in MB',
+                        default=ExperimentDefaults.cache_size_mb)
+    parser.add_argument('--metrics-port', type=int,
+                        help='serve live throughput metrics of the workers '
+                        'on http://localhost:METRICS_PORT/metrics')
+    args = parser.parse_args(argv)
+    if not 0 <= args.branch_after < args.num_sents:
+        parser.error('--branch-after must be between 0 and --num-sents')
+    if args.branch_after and (args.trace or args.target_se is not None):
+        parser.error('--branch-after does not combine with --trace or '
+                     '--target-se')
+    # flatten the lists of ranges into a single list of (unique) rates
+    args.rate = sorted(set(x for xs in args.rate for x in xs))
+    args.cons_rate = sorted(set(x for xs in args.cons_rate for x in xs))
+    return args
 
 
-def main():
-    global NDChild
+def experiment_parameters(args):
+    """Returns the `ExperimentParameters` for the command line arguments `args`
+    (see `parse_arguments`). Fills in the defaults that depend on other
+    arguments, or are random, in `args`.
 
-    args = parse_arguments()
+    """
+    if args.seed is None:
+        args.seed = SystemRandom().randrange(2 ** 32)
 
-    if args.trace:
-        args.num_echildren = 1
+    if args.all_languages:
+        DOMAIN.init_from_flatfile()
+        args.languages = sorted(DOMAIN.languages)
 
-    logging.info('starting simulation with %s',
-                 ' '.join('{}={}'.format(key, val)
-                          for key, val in args.__dict__.items()))
+    if args.profile_trigger_timing:
+        profiling = 'timing'
+    elif args.profile_triggers:
+        profiling = 'counts'
+    else:
+        profiling = None
 
-    params = ExperimentParameters(
-        learningrate=args.rate,
-        conservative_learningrate=args.cons_rate,
+    # the branches of every noise level share their prefix, so they are paired
+    # like with common random numbers
+    if args.branch_after:
+        args.common_random_numbers = True
+
+    if args.executor == 'auto':
+        args.executor = 'thread' if free_threaded() else 'process'
+    elif args.executor == 'thread' and not free_threaded():
+        logging.warning('the GIL is enabled: echildren will run on one core '
+                        'at a time with --executor thread')
+
+    if args.learners is None:
+        args.learners = ['CachedNDChildModLRP' if args.mod_lrp
+                         else 'CachedNDChild']
+
+    return ExperimentParameters(
+        learningrates=args.rate,
+        conservative_learningrates=args.cons_rate,
         num_sentences=args.num_sents,
         noise_levels=args.noise_levels,
         num_procs=args.num_procs,
         num_echildren=args.num_echildren,
         languages=args.languages,
-        trace=args.trace)
+        trace=args.trace,
+        seed=args.seed,
+        cache_dir=args.cache_dir,
+        cache_size=args.cache_size * 2 ** 20,
+        learners=args.learners,
+        common_random_numbers=args.common_random_numbers,
+        target_se=args.target_se,
+        min_echildren=args.min_echildren,
+        trace_samples=args.trace_samples,
+        trace_spacing=args.trace_spacing,
+        convergence_epsilon=args.convergence_epsilon,
+        trigger_profiling=profiling,
+        metrics_port=args.metrics_port,
+        noise_model=args.noise_model,
+        input_distribution=args.input_distribution,
+        executor=args.executor,
+        prefix_sentences=args.branch_after,
+        prefix_rate=args.prefix_rate,
+        prefix_conservativerate=args.prefix_cons_rate)
 
-    results = run_simulations(params)
 
-    if args.mod_lrp:
-        NDChild = cached_child(NDChildModLRP)
-    else:
-        NDChild = cached_child(NDChild)
+def main():
+    args = parse_arguments()
+    params = experiment_parameters(args)
+
+    logging.info('starting simulation with %s',
+                 ' '.join('{}={}'.format(key, val)
+                          for key, val in args.__dict__.items()))
+
+    results = run_simulations(params)
 
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
-    if args.trace:
-        for result in results:
-            pass
-    else:
-        write_results('simulation_output', args, results)
+    # pandas and matplotlib take longer to import than a short simulation
+    # takes to run, so they are only loaded for the output
+    from output_handler import write_results
+    write_results('simulation_output', args, results)
 
 
 if __name__ == "__main__":
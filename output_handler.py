@@ -1,15 +1,15 @@
 import csv
 import datetime
 import logging
+import multiprocessing
 import os
 import os.path
-import re
 from typing import List
 
-import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 
-from datatypes import NDResult
+from datatypes import PARAMETERS, NDResult
+from traces import TrajectoryBands, write_trace
 
 languages = {
     611: 'english',
@@ -19,69 +19,510 @@ languages = {
 }
 
 
+def format_values(values):
+    """Formats a list of hyperparameter values for use in a filename: the value
+    itself if there is only one, or the range of values covered otherwise.
+
+    """
+    values = sorted(set(values))
+    if len(values) == 1:
+        return str(values[0])
+    return '{}-{}'.format(values[0], values[-1])
+
+
+# columns identifying the learner setting of an echild, and their prefix in
+# filenames
+SETTING_COLUMNS = {
+    'learner': '',
+    'rate': 'R',
+    'conservativerate': 'C',
+}
+
+
+def setting_columns(df):
+    """Returns the learner setting columns that vary within `df`, ie. the ones
+    that were swept over or compared side by side.
+
+    """
+    return [col for col in SETTING_COLUMNS if df[col].nunique() > 1]
+
+
+# pandas and matplotlib are slow to import, and only needed for the summaries
+# and plots, so they are imported in the functions that use them.
+
+
 def summary_stats_output(results_csv, stats_output):
+    import pandas as pd
+
     df = pd.read_csv(results_csv)
+    groups = setting_columns(df) + ['language', 'noise']
     cols = [x for x in df.columns
-            if x not in {'rate', 'conservativerate',
-                         'numberofsentences', 'threshold'}]
-    df[cols].groupby(['language', 'noise']).agg(['mean', 'var']).to_excel(
-        stats_output)
-
-
-def barplot_output(pathname, image_output):
-    plt.rcParams['figure.figsize'] = 15, 25
-    hyperparams = re.search(r'R(?P<rate>0.\d+)_C(?P<consrate>0.\d+)',
-                            pathname).groupdict()
-    df = pd.read_csv(pathname)
-    params = [p for p in df.columns if p[0].isupper()]
-    hyperparams['noiserates'] = list(df.noise.unique())
-    fig, axs = plt.subplots(4, 1, constrained_layout=True)
-    fig.suptitle("""Learning Rate: {rate}
+            if x not in {'rate', 'conservativerate', 'learner', 'epsilon',
+                         'numberofsentences', 'threshold', 'seed',
+                         'noise_model', 'input_distribution',
+                         'prefix_sentences', 'prefix_rate',
+                         'prefix_conservativerate'}
+            or x in groups]
+    df[cols].groupby(groups).agg(['mean', 'var']).to_excel(stats_output)
+
+
+def paired_summary_output(results_csv, stats_output):
+    """ Writes the `paired_differences` of the results in `results_csv` """
+    import pandas as pd
+
+    paired_differences(pd.read_csv(results_csv)).to_excel(stats_output)
+
+
+def paired_differences(df):
+    """Returns the mean, variance and standard error of the paired differences
+    of each param between every noise level and the lowest one, in the results
+    `df`.
+
+    Echildren are paired by seed, so this is only meaningful for runs with
+    common random numbers, where echild k of every noise level shares its
+    random draws.
+
+    """
+    params = PARAMETERS
+    settings = setting_columns(df)
+    keys = settings + ['language', 'seed']
+    baseline_noise = df.noise.min()
+    baseline = df[df.noise.eq(baseline_noise)][keys + params]
+    paired = df[df.noise.ne(baseline_noise)].merge(
+        baseline, on=keys, suffixes=('', '_baseline'))
+    diffs = paired[settings + ['language', 'noise']].copy()
+    for param in params:
+        diffs[param] = paired[param] - paired[param + '_baseline']
+    return diffs.groupby(settings + ['language', 'noise']).agg(
+        ['mean', 'var', 'sem'])
+
+
+# the cells of the results: a language and noise level, for a learner setting
+CELL_COLUMNS = ['learner', 'rate', 'conservativerate', 'language', 'noise']
+
+# number of languages plotted on each page of plot.pdf
+LANGUAGES_PER_PAGE = 4
+
+
+def box_stats(arrays):
+    """Returns the box plot statistics of the final params of the echildren in
+    each cell of the results `arrays` (see `ColumnarResults`), as a dict that
+    maps (learner, rate, conservativerate, language, noise) to the number of
+    echildren and an array (5 x params) of the lower whisker, first quartile,
+    median, third quartile and upper whisker of each param. The whiskers reach
+    the furthest values within 1.5 interquartile ranges of the box, as in
+    matplotlib's boxplot.
+
+    """
+    values = np.column_stack([arrays[param] for param in PARAMETERS])
+    rows = {}
+    for i, cell in enumerate(zip(*(arrays[col].tolist()
+                                   for col in CELL_COLUMNS))):
+        rows.setdefault(cell, []).append(i)
+
+    stats = {}
+    for cell, indices in rows.items():
+        cell_values = values[indices]
+        q1, median, q3 = np.percentile(cell_values, [25, 50, 75], axis=0)
+        reach = 1.5 * (q3 - q1)
+        low = np.where(cell_values >= q1 - reach, cell_values, np.inf)
+        high = np.where(cell_values <= q3 + reach, cell_values, -np.inf)
+        stats[cell] = (len(indices), np.array(
+            [low.min(axis=0), q1, median, q3, high.max(axis=0)]))
+    return stats
+
+
+def barplot_output(stats, image_output):
+    """Plots the box plot statistics `stats` (see `box_stats`), with
+    `LANGUAGES_PER_PAGE` languages per page. When several learner settings
+    (learning rates or learner variants) were run, each gets its own plot,
+    named after `image_output` with the setting appended. Returns the plots to
+    render, as (function, arguments) pairs for `render_plots`.
+
+    """
+    settings = sorted({cell[:3] for cell in stats})
+    varying = [num for num in range(3)
+               if len({setting[num] for setting in settings}) > 1]
+    stem, ext = os.path.splitext(image_output)
+    plots = []
+    for setting in settings:
+        setting_stats = {cell[3:]: value for cell, value in stats.items()
+                         if cell[:3] == setting}
+        output = image_output
+        if varying:
+            output = '{}_{}{}'.format(stem, '_'.join(
+                SETTING_COLUMNS[CELL_COLUMNS[num]] + str(setting[num])
+                for num in varying), ext)
+        plots.append((setting_barplot, (setting, setting_stats, output)))
+    return plots
+
+
+def draw_boxes(ax, positions, width, stats):
+    """Draws box plots at `positions` from their statistics (see `box_stats`),
+    like `Axes.bxp` without fliers. All the boxes are drawn as two paths,
+    which renders much faster than `Axes.bxp`'s six lines per box.
+
+    """
+    from matplotlib.patches import PathPatch
+    from matplotlib.path import Path
+
+    whislo, q1, median, q3, whishi = stats
+    left, right = positions - width / 2, positions + width / 2
+    cap_left, cap_right = positions - width / 4, positions + width / 4
+    outlines = [
+        # boxes
+        [(left, q1), (right, q1), (right, q3), (left, q3), (left, q1)],
+        # whiskers and their caps
+        [(positions, whislo), (positions, q1)],
+        [(positions, q3), (positions, whishi)],
+        [(cap_left, whislo), (cap_right, whislo)],
+        [(cap_left, whishi), (cap_right, whishi)],
+    ]
+    medians = [[(left, median), (right, median)]]
+    for lines, color in [(outlines, 'black'), (medians, 'C1')]:
+        vertices, codes = [], []
+        for points in lines:
+            # (boxes x points x 2): a polyline per box
+            polylines = np.stack([np.column_stack(point) for point in points],
+                                 axis=1)
+            vertices.append(polylines.reshape(-1, 2))
+            polyline_codes = np.full(len(points), Path.LINETO)
+            polyline_codes[0] = Path.MOVETO
+            codes.append(np.tile(polyline_codes, len(positions)))
+        # added as an artist, since computing the data limits of the path is
+        # slower than drawing it. the caller sets the limits.
+        ax.add_artist(PathPatch(Path(np.concatenate(vertices),
+                                     np.concatenate(codes)),
+                                fill=False, edgecolor=color))
+
+
+def setting_barplot(setting, stats, image_output):
+    """Plots the box plot statistics of a learner setting, a dict that maps
+    (language, noise) to the number of echildren and their statistics.
+
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    learner, rate, consrate = setting
+    params = PARAMETERS
+    language_list = sorted({language for language, _ in stats})
+    noise_levels = sorted({noise for _, noise in stats})
+    title = """Learner: {learner}
+    Learning Rate: {rate}
     Conservative Rate: {consrate}
     Noise Levels: {noise_levels}
     Echildren per language & noise-level: {num_echildren}
-    """.format(noise_levels=', '.join(str(x) for x in df.noise.unique()),
+    """.format(learner=learner, rate=rate, consrate=consrate,
+               noise_levels=', '.join(str(x) for x in noise_levels),
                num_echildren=','.join(
-                   str(x)
-                   for x in df.groupby(['language', 'noise']).size().unique()),
-               **hyperparams),
-                 fontsize=24)
-    for language, ax in zip(df.language.unique(), axs):
-        for noise_level, noise_amt in enumerate(df.noise.unique()):
-            param_vals = (df[df.language.eq(language)
-                             & df.noise.eq(noise_amt)][params]).values
-            ax.boxplot(
-                param_vals,
-                positions=[n + (noise_level / 5) for n in range(len(params))],
-                notch=False,
-                widths=1 / 7.5)
-        grammar_str = format(language, '013b')
-        xlabels = [
-            '{}={}'.format(name, grammar_str[num])
-            for num, name in enumerate(params)
-        ]
-        ax.set_xticks(range(len(params)))
-        ax.set_xticklabels(xlabels, fontsize=16)
-        ax.set_yticks([0.5])
-        ax.set_yticks([0, 1], minor=True)
-        ax.grid()
-        ax.grid(axis='y', which='minor', ls=':')
-        ax.set_title('{} {}'.format(language, languages.get(language, '')))
-
-    fig.savefig(image_output)
+                   str(x) for x in sorted({count for count, _ in
+                                           stats.values()})))
+
+    with PdfPages(image_output) as pdf:
+        for first in range(0, len(language_list), LANGUAGES_PER_PAGE):
+            page = language_list[first:first + LANGUAGES_PER_PAGE]
+            fig, axs = plt.subplots(LANGUAGES_PER_PAGE, 1, figsize=(15, 25),
+                                    squeeze=False)
+            fig.suptitle(title, fontsize=24)
+            for language, ax in zip(page, axs.flat):
+                for noise_level, noise_amt in enumerate(noise_levels):
+                    if (language, noise_amt) not in stats:
+                        continue
+                    _, cell_stats = stats[language, noise_amt]
+                    draw_boxes(ax, np.arange(len(params)) + noise_level / 5,
+                               1 / 7.5, cell_stats)
+                ax.set_xlim(-0.5, len(params))
+                ax.set_ylim(-0.05, 1.05)
+                grammar_str = format(language, '013b')
+                xlabels = [
+                    '{}={}'.format(name, grammar_str[num])
+                    for num, name in enumerate(params)
+                ]
+                ax.set_xticks(range(len(params)))
+                ax.set_xticklabels(xlabels, fontsize=16)
+                ax.set_yticks([0.5])
+                ax.set_yticks([0, 1], minor=True)
+                ax.grid()
+                ax.grid(axis='y', which='minor', ls=':')
+                ax.set_title('{} {}'.format(language,
+                                            languages.get(language, '')))
+            for ax in axs.flat[len(page):]:
+                ax.set_axis_off()
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+def _render_plot(plot):
+    function, args = plot
+    function(*args)
+
+
+def render_plots(plots, num_procs=1):
+    """Renders `plots`, a list of (function, arguments) pairs that each write a
+    pdf, in up to `num_procs` processes.
+
+    """
+    num_procs = min(num_procs, len(plots))
+    if num_procs <= 1:
+        for plot in plots:
+            _render_plot(plot)
+        return
+    with multiprocessing.Pool(num_procs) as pool:
+        pool.map(_render_plot, plots, chunksize=1)
+
+
+def bands_plot_output(bands: TrajectoryBands, image_output, log_scale=False):
+    """Plots the trajectory bands of every cell on its own page of the pdf
+    `image_output`: the median of each parameter over time, within its
+    interquartile range and 5th-95th percentile band, and the mean.
+
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    levels = list(bands.quantiles)
+    with PdfPages(image_output) as pdf:
+        for key in sorted(bands.cells):
+            learner, rate, consrate, language, noise = key
+            cell = bands.cells[key]
+            quantiles = cell.quantiles(levels)
+            x = cell.sentences
+            fig, axs = plt.subplots(5, 3, figsize=(15, 20), sharex=True,
+                                    sharey=True, constrained_layout=True)
+            fig.suptitle('{} {}, noise {}\n{}, rate {}, cons. rate {}, '
+                         '{} echildren'.format(
+                             language, languages.get(language, ''), noise,
+                             learner, rate, consrate, cell.count),
+                         fontsize=16)
+            for num, (param, ax) in enumerate(zip(PARAMETERS, axs.flat)):
+                ax.fill_between(x, quantiles[levels.index(0.05), :, num],
+                                quantiles[levels.index(0.95), :, num],
+                                alpha=0.2, color='C0', label='5-95%')
+                ax.fill_between(x, quantiles[levels.index(0.25), :, num],
+                                quantiles[levels.index(0.75), :, num],
+                                alpha=0.4, color='C0', label='25-75%')
+                ax.plot(x, quantiles[levels.index(0.5), :, num], color='C0',
+                        label='median')
+                ax.plot(x, cell.mean[:, num], color='C1', ls='--',
+                        label='mean')
+                ax.set_title('{}={}'.format(param,
+                                            format(language, '013b')[num]))
+                ax.set_ylim(-0.05, 1.05)
+                ax.axhline(0.5, color='grey', ls=':')
+                if log_scale:
+                    ax.set_xscale('log')
+            for ax in axs.flat[len(PARAMETERS):]:
+                ax.set_axis_off()
+            axs.flat[0].legend(loc='best')
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+class ColumnarResults:
+    """Collects results column by column, with the same columns as output.csv
+    (minus the timestamp), and writes them as arrays to an npz file. Unset
+    convergence metrics are stored as -1, and durations in seconds.
+
+    """
+
+    def __init__(self):
+        self.columns = {name: [] for name in NDResult.csv_headers()
+                        if name != 'timestamp'}
+
+    def add(self, result: NDResult):
+        row = result.as_csv_row()
+        row['duration'] = row['duration'].total_seconds()
+        for name, values in self.columns.items():
+            value = row.get(name)
+            values.append(-1 if value is None else value)
+
+    def arrays(self):
+        arrays = {}
+        for name, values in self.columns.items():
+            if name == 'seed':
+                arrays[name] = np.array(values, dtype=np.uint64)
+            elif name.endswith(('_converged', '_within_eps')):
+                arrays[name] = np.array(values, dtype=np.int64)
+            else:
+                arrays[name] = np.array(values)
+        return arrays
+
+    def write(self, path):
+        np.savez_compressed(path, **self.arrays())
+
+
+def learnability_output(df, by_grammar_output=None, by_parameter_output=None):
+    """Writes learnability reports of the results in `df` (as read from
+    results.npz) to csv: per grammar, and per parameter across grammars. The
+    reports whose output is None are skipped. A parameter counts as learned by
+    an echild if it ended up on its target side of 0.5 (ie. its
+    `<param>_converged` is set). Returns which params each echild learned, for
+    `learnability_plot`.
+
+    """
+    settings = list(SETTING_COLUMNS)
+    converged = df[[param + '_converged' for param in PARAMETERS]].values
+    learned = converged >= 0
+    df = df[settings + ['noise', 'language']].copy()
+    for num, param in enumerate(PARAMETERS):
+        df[param] = learned[:, num]
+    df['params_learned'] = learned.sum(axis=1)
+    df['all_learned'] = learned.all(axis=1)
+    # the number of sentences after which all params stayed on target
+    df['sentences_to_all'] = np.where(df.all_learned, converged.max(axis=1),
+                                      np.nan)
+
+    if by_grammar_output is not None:
+        learnability_by_grammar(df, by_grammar_output)
+    if by_parameter_output is not None:
+        learnability_by_parameter(df, learned, converged, by_parameter_output)
+    return df
+
+
+def learnability_by_grammar(df, output):
+    settings = list(SETTING_COLUMNS)
+    by_grammar = df.groupby(settings + ['noise', 'language']).agg(
+        echildren=('all_learned', 'size'),
+        params_learned=('params_learned', 'mean'),
+        all_learned=('all_learned', 'mean'),
+        sentences_to_all=('sentences_to_all', 'mean'),
+        **{param + '_learned': (param, 'mean') for param in PARAMETERS})
+    by_grammar.to_csv(output)
+
+
+def learnability_by_parameter(df, learned, converged, output):
+    import pandas as pd
+
+    settings = list(SETTING_COLUMNS)
+    # one row per echild and param, with the param's target value
+    targets = np.array([[int(bit) for bit in format(int(language), '013b')]
+                        for language in df.language])
+    long = pd.DataFrame({
+        **{col: np.repeat(df[col].values, len(PARAMETERS))
+           for col in settings + ['noise', 'language']},
+        'param': np.tile(PARAMETERS, len(df)),
+        'target': targets.ravel(),
+        'learned': learned.ravel(),
+        'sentences': np.where(learned, converged, np.nan).ravel(),
+    })
+    # fraction of the echildren of each grammar that learned the param
+    per_grammar = long.groupby(
+        settings + ['noise', 'param', 'target', 'language']).learned.mean()
+    by_parameter = long.groupby(settings + ['noise', 'param', 'target']).agg(
+        grammars=('language', 'nunique'),
+        echildren=('learned', 'size'),
+        learned=('learned', 'mean'),
+        sentences_to_learn=('sentences', 'mean'),
+        median_sentences_to_learn=('sentences', 'median'))
+    by_parameter['grammars_learned'] = (per_grammar >= 0.5).groupby(
+        settings + ['noise', 'param', 'target']).mean()
+    by_parameter.to_csv(output)
+
+
+def learnability_plot(df, image_output):
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    settings = list(SETTING_COLUMNS)
+    with PdfPages(image_output) as pdf:
+        for setting, setting_df in df.groupby(settings):
+            fig, (bar_ax, hist_ax) = plt.subplots(
+                2, 1, figsize=(15, 12), constrained_layout=True)
+            fig.suptitle('{}, rate {}, cons. rate {}: {} grammars'.format(
+                *setting, setting_df.language.nunique()), fontsize=16)
+            noise_levels = sorted(setting_df.noise.unique())
+            width = 0.8 / len(noise_levels)
+            for i, (noise, noise_df) in enumerate(
+                    setting_df.groupby('noise')):
+                bar_ax.bar(np.arange(len(PARAMETERS)) + i * width,
+                           noise_df[PARAMETERS].mean().values, width,
+                           label='noise {}'.format(noise))
+                hist_ax.hist(noise_df.groupby('language').all_learned.mean(),
+                             bins=20, range=(0, 1), histtype='step',
+                             label='noise {}'.format(noise))
+            bar_ax.set_xticks(np.arange(len(PARAMETERS)) + 0.4 - width / 2)
+            bar_ax.set_xticklabels(PARAMETERS)
+            bar_ax.set_ylim(0, 1)
+            bar_ax.set_ylabel('fraction of echildren that learned it')
+            bar_ax.legend()
+            hist_ax.set_xlabel('fraction of echildren that learned every '
+                               'parameter')
+            hist_ax.set_ylabel('grammars')
+            hist_ax.legend()
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+class TriggerReport:
+    """Aggregates the e-trigger profiles of echildren (see
+    `NDChild.trigger_profiling`) per language, noise level and learner
+    setting.
+
+    """
+
+    def __init__(self):
+        # maps cell -> [echildren, sentences]
+        self.totals = {}
+        # maps cell -> (trigger, param, direction, conservative) -> fires
+        self.fires = {}
+        # maps cell -> trigger -> seconds
+        self.time = {}
+
+    def add(self, params, stats):
+        cell = (params.language, params.noise, params.learner, params.rate,
+                params.conservativerate)
+        totals = self.totals.setdefault(cell, [0, 0])
+        totals[0] += 1
+        totals[1] += stats['sentences']
+        fires = self.fires.setdefault(cell, {})
+        for key, count in stats['fires'].items():
+            fires[key] = fires.get(key, 0) + count
+        if stats['time'] is not None:
+            time = self.time.setdefault(cell, {})
+            for trigger, seconds in stats['time'].items():
+                time[trigger] = time.get(trigger, 0) + seconds
+
+    def write(self, fires_output, times_output):
+        cell_fields = ['language', 'noise', 'learner', 'rate',
+                       'conservativerate']
+        with open(fires_output, 'w') as fh:
+            writer = csv.writer(fh)
+            writer.writerow(cell_fields + [
+                'trigger', 'param', 'direction', 'conservative', 'echildren',
+                'sentences', 'fires', 'fires_per_sentence'])
+            for cell in sorted(self.fires):
+                echildren, sentences = self.totals[cell]
+                for key, count in sorted(self.fires[cell].items()):
+                    writer.writerow([*cell, *key, echildren, sentences, count,
+                                     count / sentences])
+
+        if not self.time:
+            return
+        with open(times_output, 'w') as fh:
+            writer = csv.writer(fh)
+            writer.writerow(cell_fields + [
+                'trigger', 'echildren', 'calls', 'seconds',
+                'microseconds_per_call'])
+            for cell in sorted(self.time):
+                echildren, sentences = self.totals[cell]
+                for trigger, seconds in self.time[cell].items():
+                    writer.writerow([*cell, trigger, echildren, sentences,
+                                     seconds, seconds / sentences * 1e6])
 
 
 def write_results(output_directory, params, results: List[NDResult]):
     """Writes simulation results to csv, plots to a pdf and writes summary stats
-    to an excel file."""
-
-    from main import TrialParameters
+    to an excel file, in a new subdirectory of `output_directory`. Returns the
+    path of the subdirectory. The plots are skipped with `params.no_plot`, and
+    the summaries with `params.no_summary`.
 
+    """
     output_subdir = os.path.join(
         output_directory, '{timestamp}_R{rate}_C{cons_rate}'.format(
             timestamp=datetime.datetime.now().strftime('%F:%R:%S'),
-            rate=params.rate,
-            cons_rate=params.cons_rate))
+            rate=format_values(params.rate),
+            cons_rate=format_values(params.cons_rate)))
 
     try:
         os.mkdir(output_directory)
@@ -94,17 +535,88 @@ def write_results(output_directory, params, results: List[NDResult]):
 
     logging.info('writing results to %s', csv_output)
 
+    trace_dir = os.path.join(output_subdir, 'traces')
+    columns = ColumnarResults()
+    bands = TrajectoryBands()
+    trigger_report = TriggerReport()
+    if params.trace:
+        logging.info('writing traces to %s', trace_dir)
+        os.mkdir(trace_dir)
+
     with open(csv_output, 'w') as fh:
         writer = csv.DictWriter(fh, fieldnames=NDResult.csv_headers())
         writer.writeheader()
         for result in results:
             writer.writerow(result.as_csv_row())
+            columns.add(result)
+            if result.trace is not None:
+                write_trace(trace_dir, result.trial_params, result.trace)
+                bands.add(result.trial_params, result.trace)
+            if result.trigger_stats is not None:
+                trigger_report.add(result.trial_params, result.trigger_stats)
+
+    if trigger_report.totals:
+        fires_output = os.path.join(output_subdir, 'triggers.csv')
+        times_output = os.path.join(output_subdir, 'trigger_times.csv')
+        logging.info('writing e-trigger profile to %s', fires_output)
+        trigger_report.write(fires_output, times_output)
+
+    # the plots are rendered last, side by side
+    plots = []
+
+    if bands.cells:
+        bands_output = os.path.join(output_subdir, 'bands.npz')
+        bands_plot = os.path.join(output_subdir, 'bands.pdf')
+        logging.info('writing trajectory bands to %s', bands_output)
+        bands.write(bands_output)
+        if not params.no_plot:
+            logging.info('plotting trajectory bands to %s', bands_plot)
+            plots.append((bands_plot_output,
+                          (bands, bands_plot, params.trace_spacing == 'log')))
+
+    columns_output = os.path.join(output_subdir, 'results.npz')
+    logging.info('writing columnar results to %s', columns_output)
+    columns.write(columns_output)
+    arrays = columns.arrays()
+
+    if not (params.no_summary and params.no_plot):
+        import pandas as pd
+
+        by_grammar_output = by_parameter_output = None
+        if not params.no_summary:
+            by_grammar_output = os.path.join(output_subdir,
+                                             'learnability_by_grammar.csv')
+            by_parameter_output = os.path.join(
+                output_subdir, 'learnability_by_parameter.csv')
+            logging.info('writing learnability reports to %s',
+                         by_grammar_output)
+        learned = learnability_output(pd.DataFrame(arrays), by_grammar_output,
+                                      by_parameter_output)
+        if not params.no_plot:
+            image_output = os.path.join(output_subdir, 'learnability.pdf')
+            logging.info('plotting learnability to %s', image_output)
+            plots.append((learnability_plot, (learned, image_output)))
+
+    # with every grammar of the domain, per-language stats and plots would be
+    # too many to be useful
+    if not params.all_languages:
+        if not params.no_summary:
+            stats_output = os.path.join(output_subdir, 'summary.xls')
+            logging.info('writing summary stats to %s', stats_output)
+            summary_stats_output(csv_output, stats_output)
+
+            if params.common_random_numbers:
+                paired_output = os.path.join(output_subdir,
+                                             'paired_summary.xls')
+                logging.info('writing paired differences to %s',
+                             paired_output)
+                paired_summary_output(csv_output, paired_output)
 
-    plot_output = os.path.join(output_subdir, 'plot.pdf')
-    stats_output = os.path.join(output_subdir, 'summary.xls')
+        if not params.no_plot:
+            plot_output = os.path.join(output_subdir, 'plot.pdf')
+            logging.info('plotting results to %s', plot_output)
+            plots.extend(barplot_output(box_stats(arrays), plot_output))
 
-    logging.info('writing summary stats to %s', stats_output)
-    summary_stats_output(csv_output, stats_output)
+    render_plots(plots, params.num_procs)
 
-    logging.info('plotting results to %s', plot_output)
-    barplot_output(csv_output, plot_output)
+    return output_subdir
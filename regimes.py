@@ -0,0 +1,482 @@
+# coding: utf-8
+"""Markov chains of the threshold regimes of NDChild learners.
+
+The state dependent e-triggers (OPT, ItoC and AH, see
+`trigger_index.STATE_DEPENDENCIES`) only read which side of 0.5 some
+parameters are: SP, HIP, HCP, NT, TM and ItoC, the regime parameters. Which
+side of 0.5 each of them is on (below, at or above) is the learner's regime.
+With a learning rate above 0.5, an adjustment always leaves its parameter on
+the side it moves it towards, and a conservative adjustment only changes the
+side of a parameter at 0.5. So the regime after a sentence only depends on the
+regime before it and on the sentence, and the regimes of an echild fed random
+sentences of a language, with noise, are a Markov chain. The chain of every
+language and noise level is built from the domain and solved exactly: the
+probability of ending in each regime, of ever entering some regimes (eg. ones
+where ItoC is mis-set), and the expected number of sentences until then.
+
+This is exact, for every learning rate above 0.5, but for one approximation:
+conservative adjustments against the side a parameter was moved to at the
+learning rate do take it across 0.5 eventually, after at least `flip_bound`
+of them in a row (1176 at the default rates). The chain ignores that slow
+drift. The parameters of a chain it may affect are listed in its `inexact`.
+The regimes are those of NDChild and its cached variants, not of the
+modified LRP learner, whose adjustments depend on the values of parameters.
+
+    $ python regimes.py -l 611 584 -n 0 0.05 --output regimes.csv
+
+"""
+import argparse
+import csv
+import itertools
+import logging
+import math
+import time
+
+import numpy as np
+
+from NDChild import NDChild, TriggerCacher
+from datatypes import PARAMETERS
+from trigger_index import STATE_DEPENDENCIES, STATE_VALUES
+from utils import progress_bar
+
+# the parameters the state dependent triggers read, in PARAMETERS order
+REGIME_PARAMETERS = [param for param in PARAMETERS
+                     if any(param in params
+                            for params in STATE_DEPENDENCIES.values())]
+
+# the sides of 0.5 a regime parameter can be on, indexing STATE_VALUES
+BELOW, AT, ABOVE = range(3)
+SIDE_NAMES = '-=+'
+
+# regimes are tuples of the sides of REGIME_PARAMETERS, numbered in this shape
+REGIME_SHAPE = (3,) * len(REGIME_PARAMETERS)
+NUM_REGIMES = 3 ** len(REGIME_PARAMETERS)
+
+# the only regime parameter adjusted by a state dependent trigger: its own,
+# which reads the sides of SP, HIP and HCP after their triggers adjusted them,
+# and the triggers after it (QInv) adjust it too
+ITOC_INPUTS = STATE_DEPENDENCIES['ItoC']
+
+
+def flip_bound(rate, conservativerate):
+    """The least number of conservative adjustments in a row that can take a
+    parameter across 0.5, after an adjustment at the learning rate moved it
+    away. Raises ValueError for learning rates of 0.5 or less, which may not
+    move a parameter across 0.5 at all.
+
+    """
+    if not 0.5 < rate <= 1:
+        raise ValueError('regimes need a learning rate above 0.5, not '
+                         '{}'.format(rate))
+    if conservativerate <= 0:
+        return math.inf
+    if conservativerate >= 1:
+        return 1
+    return math.ceil(math.log(2 * rate) / -math.log(1 - conservativerate))
+
+
+def regime_name(regime):
+    """ eg. 'SP- HIP+ HCP- NT= TM- ItoC+' """
+    return ' '.join(param + SIDE_NAMES[side]
+                    for param, side in zip(REGIME_PARAMETERS, regime))
+
+
+def target_regime(language):
+    """ The sides of the regime parameters in the grammar `language` """
+    bits = format(int(language), '013b')
+    return tuple(ABOVE if bits[PARAMETERS.index(param)] == '1' else BELOW
+                 for param in REGIME_PARAMETERS)
+
+
+class _RegimeLearner(NDChild):
+    """An NDChild whose regime parameters are only ever one of STATE_VALUES, on
+    the side of 0.5 its adjustments leave them. It records the adjustments of
+    regime parameters its triggers make.
+
+    """
+
+    def __init__(self):
+        super().__init__(None, None, None)
+        self.evidence = set()
+
+    def adjustweight(self, parameter, direction):
+        if parameter in REGIME_PARAMETERS:
+            self.evidence.add((parameter, direction, False))
+            self.grammar[parameter] = STATE_VALUES[ABOVE if direction
+                                                   else BELOW]
+
+    def adjustweightConservatively(self, parameter, direction):
+        if parameter in REGIME_PARAMETERS:
+            self.evidence.add((parameter, direction, True))
+            if self.grammar[parameter] == STATE_VALUES[AT]:
+                self.grammar[parameter] = STATE_VALUES[ABOVE if direction
+                                                       else BELOW]
+
+    def sides(self, params):
+        return tuple(STATE_VALUES.index(self.grammar[param])
+                     for param in params)
+
+
+def sentence_effect(sentence, learner=None):
+    """Returns the effect of `sentence` on the regime of a learner, as a
+    hashable (maps, itoc, evidence):
+
+    - maps: for every regime parameter but ItoC, the side it is on after the
+      sentence, by the side it was on before
+    - itoc: the side ItoC is on after the sentence, by the sides of SP, HIP
+      and HCP after their triggers and of ItoC before the sentence, flattened
+    - evidence: the (parameter, direction, conservative) adjustments of regime
+      parameters the sentence can make
+
+    """
+    learner = learner or _RegimeLearner()
+    learner.evidence = set()
+    names = [TriggerCacher.trigger_name(trigger)
+             for trigger in learner.trigger_methods]
+    independent = [trigger for name, trigger in zip(names,
+                                                    learner.trigger_methods)
+                   if name not in STATE_DEPENDENCIES]
+    from_itoc = learner.trigger_methods[names.index('ItoC'):]
+    params = REGIME_PARAMETERS[:-1]
+
+    after = []
+    for side in (BELOW, AT, ABOVE):
+        learner.grammar.update(dict.fromkeys(params, STATE_VALUES[side]))
+        for trigger in independent:
+            trigger(sentence)
+        after.append(learner.sides(params))
+    maps = tuple(zip(*after))
+
+    itoc = []
+    for sides in itertools.product(range(3), repeat=len(ITOC_INPUTS) + 1):
+        learner.grammar.update(zip(ITOC_INPUTS + ['ItoC'],
+                                   (STATE_VALUES[side] for side in sides)))
+        for trigger in from_itoc:
+            trigger(sentence)
+        itoc.append(STATE_VALUES.index(learner.grammar['ItoC']))
+
+    return maps, tuple(itoc), frozenset(learner.evidence)
+
+
+def next_regimes(effect):
+    """The regime (numbered) after a sentence with the effect `effect`, from
+    each regime, as an int array.
+
+    """
+    maps, itoc, _ = effect
+    before = np.array(np.unravel_index(np.arange(NUM_REGIMES), REGIME_SHAPE))
+    after = [np.array(side_map)[sides]
+             for side_map, sides in zip(maps, before)]
+    inputs = [after[REGIME_PARAMETERS.index(param)] for param in ITOC_INPUTS]
+    after.append(np.array(itoc)[np.ravel_multi_index(
+        (*inputs, before[-1]), (3,) * (len(ITOC_INPUTS) + 1))])
+    return np.ravel_multi_index(after, REGIME_SHAPE)
+
+
+class RegimeTables:
+    """The effects of the sentences of a domain on the regimes of learners, from
+    which the chain of any language and noise level is built
+
+    """
+
+    def __init__(self):
+        # the distinct effects (see sentence_effect) of the sentences
+        self.effects = []
+        # maps sentence id -> index of its effect
+        self.sentence_effects = {}
+        # the regime after a sentence of each effect, from each regime. int
+        # array of shape (effects, NUM_REGIMES)
+        self.transitions = None
+        # number of the sentences of the domain with each effect
+        self.counts = None
+
+    @classmethod
+    def build(cls, domain):
+        tables = cls()
+        learner = _RegimeLearner()
+        # sentences with the same features have the same effects
+        by_features, by_effect = {}, {}
+        for sentence_id, sentence in progress_bar(
+                domain.sentences.items(), desc='tabulating regime effects'):
+            key = (sentence.inflection, tuple(sentence.features))
+            if key not in by_features:
+                effect = sentence_effect(sentence, learner)
+                if effect not in by_effect:
+                    by_effect[effect] = len(tables.effects)
+                    tables.effects.append(effect)
+                by_features[key] = by_effect[effect]
+            tables.sentence_effects[sentence_id] = by_features[key]
+        tables.transitions = np.array(
+            [next_regimes(effect) for effect in tables.effects])
+        tables.counts = tables.effect_counts(domain.sentences)
+        return tables
+
+    def effect_counts(self, sentence_ids, weights=None):
+        """ The (weighted) number of sentences of `sentence_ids` per effect """
+        indices = [self.sentence_effects[i] for i in sentence_ids]
+        return np.bincount(indices, weights=weights,
+                           minlength=len(self.effects)).astype(np.float64)
+
+    def effect_probabilities(self, domain, language, noise=0,
+                             noise_model='uniform',
+                             input_distribution='uniform'):
+        """The probability that the next sentence of an echild of `language` has
+        each effect, as fed by main.sentence_stream.
+
+        """
+        sentence_ids = domain.languages[language]
+        if input_distribution == 'uniform':
+            clean = self.effect_counts(sentence_ids) / len(sentence_ids)
+        else:
+            table = domain.input_table(language, input_distribution)
+            clean = self.effect_counts(sentence_ids, table.probabilities())
+        if not noise:
+            return clean
+        if noise_model == 'uniform':
+            in_language = domain.language_set(language)
+            noisy = ((self.counts - self.effect_counts(in_language)) /
+                     (len(domain.sentences) - len(in_language)))
+        else:
+            pool = domain.noise_pool(language, noise_model)
+            noisy = self.effect_counts(pool) / len(pool)
+        return (1 - noise) * clean + noise * noisy
+
+
+class RegimeChain:
+    """The Markov chain of the regimes of an echild, over the regimes it can
+    reach from its initial one, where every regime parameter is at 0.5
+
+    """
+
+    def __init__(self, regimes, transitions, inexact):
+        # the reachable regimes, as tuples of sides. the initial one is first
+        self.regimes = regimes
+        # transitions[i, j] is the probability of moving from regime i to j
+        self.transitions = transitions
+        # the regime parameters whose conservative adjustments may slowly take
+        # them across 0.5, which the chain does not model (see flip_bound)
+        self.inexact = inexact
+        n = len(regimes)
+
+        # reach[i, j]: whether regime j can be reached from regime i
+        reach = (transitions > 0) | np.eye(n, dtype=bool)
+        while True:
+            closure = (reach.astype(np.float64) @ reach) > 0
+            if (closure == reach).all():
+                break
+            reach = closure
+        self.reach = reach
+        # a regime is recurrent when it can be reached back from anywhere it
+        # leads to. the regimes reachable from a recurrent one are its class.
+        self.recurrent = np.all(~reach | reach.T, axis=1)
+
+        self.ending = np.zeros(n)
+        classes = []
+        for i in np.flatnonzero(self.recurrent):
+            if not any(members[i] for members in classes):
+                classes.append(reach[i])
+        transient = np.flatnonzero(~self.recurrent)
+        absorption = np.zeros((n, len(classes)))
+        for c, members in enumerate(classes):
+            absorption[members, c] = 1
+        if len(transient):
+            to_classes = np.stack([transitions[np.ix_(transient, members)]
+                                   .sum(axis=1) for members in classes],
+                                  axis=1)
+            absorption[transient] = np.linalg.solve(
+                np.eye(len(transient)) -
+                transitions[np.ix_(transient, transient)], to_classes)
+        for c, members in enumerate(classes):
+            self.ending[members] = absorption[0, c] * stationary(
+                transitions[np.ix_(members, members)])
+
+    @classmethod
+    def build(cls, tables: RegimeTables, domain, language, noise=0,
+              noise_model='uniform', input_distribution='uniform'):
+        probabilities = tables.effect_probabilities(
+            domain, language, noise, noise_model, input_distribution)
+        effects = np.flatnonzero(probabilities)
+        transitions = np.zeros((NUM_REGIMES, NUM_REGIMES))
+        for effect in effects:
+            transitions[np.arange(NUM_REGIMES),
+                        tables.transitions[effect]] += probabilities[effect]
+
+        initial = np.ravel_multi_index((AT,) * len(REGIME_PARAMETERS),
+                                       REGIME_SHAPE)
+        reachable, frontier = [initial], [initial]
+        seen = {initial}
+        while frontier:
+            regime = frontier.pop()
+            for other in np.flatnonzero(transitions[regime]).tolist():
+                if other not in seen:
+                    seen.add(other)
+                    reachable.append(other)
+                    frontier.append(other)
+
+        evidence = set().union(*(tables.effects[effect][2]
+                                 for effect in effects))
+        inexact = [param for param in REGIME_PARAMETERS
+                   if any((param, direction, True) in evidence and (
+                       (param, 1 - direction, False) in evidence or
+                       (param, 1 - direction, True) in evidence)
+                          for direction in (0, 1))]
+
+        regimes = [tuple(int(side) for side in
+                         np.unravel_index(regime, REGIME_SHAPE))
+                   for regime in reachable]
+        return cls(regimes, transitions[np.ix_(reachable, reachable)],
+                   inexact)
+
+    def mask(self, predicate):
+        """ Which regimes satisfy `predicate`, a function of a regime """
+        return np.array([bool(predicate(regime)) for regime in self.regimes])
+
+    def ending_probabilities(self):
+        """Maps every regime an echild may end in to the probability that it is
+        in that regime after many sentences.
+
+        """
+        return {regime: probability
+                for regime, probability in zip(self.regimes, self.ending)
+                if probability > 0}
+
+    def distribution(self, sentences):
+        """The probability of each regime (in `regimes` order) after `sentences`
+        sentences, as an array.
+
+        """
+        return np.linalg.matrix_power(self.transitions, sentences)[0]
+
+    def side_probability(self, param, side):
+        """ The probability that `param` ends on the side `side` of 0.5 """
+        i = REGIME_PARAMETERS.index(param)
+        return float(self.ending[self.mask(lambda r: r[i] == side)].sum())
+
+    def hitting(self, predicate):
+        """Returns the probability that an echild ever enters a regime which
+        satisfies `predicate`, and the expected number of sentences until it
+        first does, which is infinite when it may never do.
+
+        """
+        return self._hitting(self.mask(predicate))
+
+    def _hitting(self, target):
+        if target[0]:
+            return 1.0, 0.0
+        if not target.any():
+            return 0.0, math.inf
+        P = self.transitions
+        probability = np.zeros(len(self.regimes))
+        probability[target] = 1
+        others = np.flatnonzero(self.reach[:, target].any(axis=1) & ~target)
+        probability[others] = np.linalg.solve(
+            np.eye(len(others)) - P[np.ix_(others, others)],
+            P[np.ix_(others, np.flatnonzero(target))].sum(axis=1))
+        if probability[0] < 1 - 1e-9:
+            return float(probability[0]), math.inf
+        # the regimes from which the target is certain only lead there, or to
+        # each other
+        certain = np.flatnonzero((probability > 1 - 1e-9) & ~target)
+        sentences = np.linalg.solve(
+            np.eye(len(certain)) - P[np.ix_(certain, certain)],
+            np.ones(len(certain)))
+        return 1.0, float(sentences[np.flatnonzero(certain == 0)[0]])
+
+    def settling(self):
+        """ The expected number of sentences until the regime stops changing """
+        return self._hitting(self.recurrent)[1]
+
+
+def stationary(transitions):
+    """ The stationary distribution of an irreducible chain """
+    n = len(transitions)
+    system = transitions.T - np.eye(n)
+    system[-1] = 1
+    rhs = np.zeros(n)
+    rhs[-1] = 1
+    return np.linalg.solve(system, rhs)
+
+
+def analysis_row(chain: RegimeChain, language):
+    """The csv row of `chain`: for every regime parameter, the probability that
+    it ends on the side of `language` (`<param>_target`), that it is ever on
+    the other side (`<param>_misset`), and the expected number of sentences
+    until it first reaches the target side (`<param>_hit`).
+
+    """
+    row = {'regimes': len(chain.regimes),
+           'settling': round(chain.settling(), 3),
+           'inexact': ' '.join(chain.inexact)}
+    ending = chain.ending_probabilities()
+    likeliest = max(ending, key=ending.get)
+    row['likeliest'] = regime_name(likeliest)
+    row['likeliest_probability'] = round(ending[likeliest], 6)
+    for i, (param, side) in enumerate(zip(REGIME_PARAMETERS,
+                                          target_regime(language))):
+        wrong = BELOW if side == ABOVE else ABOVE
+        row[param + '_target'] = round(chain.side_probability(param, side), 6)
+        row[param + '_misset'] = round(
+            chain.hitting(lambda r: r[i] == wrong)[0], 6)
+        row[param + '_hit'] = round(
+            chain.hitting(lambda r: r[i] == side)[1], 3)
+    return row
+
+
+def main():
+    from main import (DOMAIN, ExperimentDefaults, input_distribution_argument,
+                      noise_model_argument)
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-l', '--languages', nargs='+', type=int,
+                        help='grammars to analyse (default: all of them)')
+    parser.add_argument('-n', '--noise-levels', nargs='+', type=float,
+                        default=ExperimentDefaults.noise_levels)
+    parser.add_argument('--noise-model', type=noise_model_argument,
+                        default='uniform')
+    parser.add_argument('--input-distribution',
+                        type=input_distribution_argument, default='uniform')
+    parser.add_argument('-r', '--rate', type=float,
+                        default=ExperimentDefaults.rate,
+                        help='learning rate the analysis is checked against')
+    parser.add_argument('-c', '--cons-rate', type=float,
+                        default=ExperimentDefaults.conservativerate,
+                        help='conservative learning rate the analysis is '
+                        'checked against')
+    parser.add_argument('-o', '--output', default='regimes.csv',
+                        help='write the analysis of every language and noise '
+                        'level to this csv file')
+    args = parser.parse_args()
+
+    try:
+        bound = flip_bound(args.rate, args.cons_rate)
+    except ValueError as e:
+        parser.error(str(e))
+    logging.info('conservative adjustments take at least %s sentences to '
+                 'move a parameter across 0.5 at these rates', bound)
+
+    DOMAIN.init_from_flatfile()
+    tables = RegimeTables.build(DOMAIN)
+    logging.info('%s distinct sentence effects', len(tables.effects))
+    languages = args.languages or sorted(DOMAIN.languages)
+
+    then = time.perf_counter()
+    rows = []
+    for language, noise in progress_bar(
+            list(itertools.product(languages, args.noise_levels)),
+            desc='solving regime chains'):
+        chain = RegimeChain.build(tables, DOMAIN, language, noise,
+                                  args.noise_model, args.input_distribution)
+        rows.append({'language': language, 'noise': noise,
+                     **analysis_row(chain, language)})
+    logging.info('solved %s chains in %.2fs', len(rows),
+                 time.perf_counter() - then)
+
+    with open(args.output, 'w') as fh:
+        writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    logging.info('wrote %s', args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+# coding: utf-8
+"""Compact binary trajectories of learners, and a replay verifier.
+
+A trajectory (see `datatypes.Trajectory`) is the exact stream of sentence ids
+an echild consumed, as uint32, with float64 snapshots of its parameters every
+`stride` sentences and after the last one. Replaying a learner over the stream
+and comparing it at every snapshot checks that it behaves exactly like the
+learner that recorded it, eg. that an optimized learner has not drifted from
+NDChild:
+
+    $ python replay.py verify tests/run_data/*.npz --learner CachedNDChild
+
+When a snapshot differs, the verifier reports the first parameter that
+differs. With a reference learner, it steps both from the previous snapshot to
+find the exact sentence where they part.
+
+The drift fixtures in tests/run_data were converted from per-sentence jsonl
+logs with:
+
+    $ python replay.py convert tests/run_data/*.jsonl.gz
+
+"""
+import argparse
+import gzip
+import json
+import os.path
+import re
+import sys
+import time
+
+import numpy as np
+
+from NDChild import LEARNERS
+from datatypes import PARAMETERS, Divergence, Trajectory
+
+# number of sentences between snapshots
+DEFAULT_STRIDE = 1000
+
+
+def snapshot_points(num_sentences, stride=DEFAULT_STRIDE):
+    """ The sentence counts after which the parameters are snapshotted """
+    points = list(range(stride, num_sentences + 1, stride))
+    if num_sentences and (not points or points[-1] != num_sentences):
+        points.append(num_sentences)
+    return points
+
+
+def record_trajectory(child, learner, sentences, stride=DEFAULT_STRIDE):
+    """Feeds `sentences` to the learner `child`, an instance of
+    `LEARNERS[learner]`, and returns its trajectory.
+
+    """
+    sentences = list(sentences)
+    points = snapshot_points(len(sentences), stride)
+    grammar = np.empty((len(points), len(PARAMETERS)))
+    due = iter(enumerate(points))
+    j, point = next(due, (None, None))
+    for i, s in enumerate(sentences, 1):
+        child.consumeSentence(s)
+        if i == point:
+            grammar[j] = [child.grammar[param] for param in PARAMETERS]
+            j, point = next(due, (None, None))
+    return Trajectory(
+        language=child.target_language,
+        rate=child.r,
+        conservativerate=child.conservativerate,
+        learner=learner,
+        sentence_ids=np.array([s.sentID for s in sentences], dtype=np.uint32),
+        sentences=np.array(points, dtype=np.int64),
+        grammar=grammar)
+
+
+def convert_jsonl(path, stride=DEFAULT_STRIDE):
+    """Converts a drift log of NDChild, with a line per sentence holding its id
+    and the grammar after it (see tests/generate_testdata.py), to a
+    trajectory. The language and learning rates are read from the filename.
+
+    """
+    language, rate, cons = re.search(
+        r'lang(\d+):rate(\d+.\d+):cons(\d+.\d+)', path).groups()
+    sentence_ids, grammars = [], []
+    with gzip.open(path) as fh:
+        for line in fh:
+            data = json.loads(line)
+            sentence_ids.append(data['sentence_id'])
+            grammars.append(data['grammar'])
+    points = snapshot_points(len(sentence_ids), stride)
+    return Trajectory(
+        language=int(language),
+        rate=float(rate),
+        conservativerate=float(cons),
+        learner='NDChild',
+        sentence_ids=np.array(sentence_ids, dtype=np.uint32),
+        sentences=np.array(points, dtype=np.int64),
+        grammar=np.array([[grammars[point - 1][param] for param in PARAMETERS]
+                          for point in points], dtype=np.float64))
+
+
+def write_trajectory(path, trajectory: Trajectory):
+    """ Writes `trajectory` to the compressed .npz file `path` """
+    np.savez_compressed(
+        path,
+        language=trajectory.language,
+        rate=trajectory.rate,
+        conservativerate=trajectory.conservativerate,
+        learner=trajectory.learner,
+        sentence_ids=np.asarray(trajectory.sentence_ids, dtype=np.uint32),
+        sentences=trajectory.sentences,
+        grammar=np.asarray(trajectory.grammar, dtype=np.float64),
+        parameters=np.array(PARAMETERS))
+
+
+def read_trajectory(path):
+    """ Reads a trajectory written by `write_trajectory` """
+    with np.load(path) as data:
+        assert list(data['parameters']) == PARAMETERS, path
+        return Trajectory(language=int(data['language']),
+                          rate=float(data['rate']),
+                          conservativerate=float(data['conservativerate']),
+                          learner=str(data['learner']),
+                          sentence_ids=data['sentence_ids'],
+                          sentences=data['sentences'],
+                          grammar=data['grammar'])
+
+
+def first_difference(expected, actual):
+    """Returns the first (parameter, expected, actual) that differ between the
+    parameter lists `expected` and `actual`.
+
+    """
+    for param, value, other in zip(PARAMETERS, expected, actual):
+        if value != other:
+            return param, value, other
+
+
+def make_learner(trajectory: Trajectory, learner, grammar=None):
+    child = LEARNERS[learner](trajectory.rate, trajectory.conservativerate,
+                              trajectory.language)
+    if grammar is not None:
+        child.grammar.update(zip(PARAMETERS, grammar))
+    return child
+
+
+def replay(trajectory: Trajectory, learner, domain, reference=None):
+    """Replays the learner `learner` (a name in `NDChild.LEARNERS`) over the
+    sentences of `trajectory`, from `domain`. Returns None if its parameters
+    match every snapshot exactly, or the `Divergence` found first.
+
+    Between snapshots, a divergence is located with the `reference` learner, if
+    given: both are started from the previous snapshot, and stepped until they
+    differ.
+
+    """
+    LEARNERS[learner].precompute_domain(domain)
+    sentences = domain.sentences
+    sentence_ids = trajectory.sentence_ids.tolist()
+    snapshots = trajectory.grammar.tolist()
+
+    child = make_learner(trajectory, learner)
+    start = 0
+    for num, point in enumerate(trajectory.sentences.tolist()):
+        for sentence_id in sentence_ids[start:point]:
+            child.consumeSentence(sentences[sentence_id])
+        actual = [child.grammar[param] for param in PARAMETERS]
+        if actual != snapshots[num]:
+            break
+        start = point
+    else:
+        return None
+
+    if point - start > 1 and reference is not None:
+        LEARNERS[reference].precompute_domain(domain)
+        previous = snapshots[num - 1] if num else None
+        child = make_learner(trajectory, learner, previous)
+        reference_child = make_learner(trajectory, reference, previous)
+        for i in range(start, point):
+            s = sentences[sentence_ids[i]]
+            child.consumeSentence(s)
+            reference_child.consumeSentence(s)
+            if child.grammar != reference_child.grammar:
+                difference = first_difference(
+                    [reference_child.grammar[param] for param in PARAMETERS],
+                    [child.grammar[param] for param in PARAMETERS])
+                return Divergence(i + 1, sentence_ids[i], *difference,
+                                  exact=True)
+
+    return Divergence(point, sentence_ids[point - 1],
+                      *first_difference(snapshots[num], actual),
+                      exact=point - start == 1)
+
+
+def convert(args):
+    for path in args.paths:
+        output = re.sub(r'\.jsonl\.gz$', '', path) + '.npz'
+        write_trajectory(output, convert_jsonl(path, args.stride))
+        print('{} ({} bytes) -> {} ({} bytes)'.format(
+            path, os.path.getsize(path), output, os.path.getsize(output)))
+
+
+def verify(args):
+    from main import DOMAIN
+
+    DOMAIN.init_from_flatfile()
+    diverged = 0
+    for path in args.paths:
+        trajectory = read_trajectory(path)
+        then = time.perf_counter()
+        divergence = replay(trajectory, args.learner, DOMAIN, args.reference)
+        seconds = time.perf_counter() - then
+        if divergence is None:
+            print('{}: ok, {} sentences in {:.2f}s'.format(
+                path, len(trajectory.sentence_ids), seconds))
+            continue
+        diverged += 1
+        print('{}: {} after sentence {} (id {}){}: {} expected {!r}, got '
+              '{!r}'.format(path, args.learner, divergence.sentence,
+                            divergence.sentence_id,
+                            '' if divergence.exact else ' or earlier',
+                            divergence.parameter, divergence.expected,
+                            divergence.actual))
+    if diverged:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser(
+        'convert', help='convert jsonl.gz drift logs to trajectories')
+    convert_parser.add_argument('paths', nargs='+')
+    convert_parser.add_argument('--stride', type=int, default=DEFAULT_STRIDE,
+                                help='number of sentences between snapshots')
+    convert_parser.set_defaults(func=convert)
+
+    verify_parser = subparsers.add_parser(
+        'verify', help='replay a learner over trajectories')
+    verify_parser.add_argument('paths', nargs='+')
+    verify_parser.add_argument('--learner', choices=sorted(LEARNERS),
+                               default='CachedNDChild')
+    verify_parser.add_argument('--reference', choices=sorted(LEARNERS),
+                               help='locate divergences between snapshots '
+                               'with this learner')
+    verify_parser.set_defaults(func=verify)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
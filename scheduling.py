@@ -0,0 +1,211 @@
+"""Cost-aware scheduling of trials on a pool.
+
+A work unit is a list of trials run by a worker in a single call: the trials
+sharing a sentence stream (see `main.run_trials`), a branched family (see
+`main.run_branches`) or a single traced trial. Units of different cells can
+cost very different amounts (longer streams, noise models that are slow to
+sample, slower learners), and when they are submitted in grid order the last
+costly units keep a few workers busy while the others idle.
+
+`CostModel` predicts the cost of a unit from the measured durations of earlier
+units of its cell, and can persist them across runs. `run_longest_first`
+submits the costliest units first, and only a few at a time, so the units
+still waiting are reordered as soon as the first results revise the
+predictions.
+
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import queue
+import time
+
+# seconds per sentence per learner of cells without any recorded duration,
+# before any unit has completed. about the cost of a CachedNDChild.
+DEFAULT_COST = 1e-5
+
+
+def unit_sentences(trials):
+    """The number of sentences a learner of the unit `trials` consumes, summed
+    over its passes: once through the shared prefix, if any, and once through
+    every distinct sentence stream after it.
+
+    """
+    streams = {trial.stream_key(): trial for trial in trials}.values()
+    prefix = trials[0].prefix_sentences
+    return prefix + sum(trial.numberofsentences - prefix for trial in streams)
+
+
+def unit_work(trials):
+    """The number of sentences consumed by all the learners of the unit
+    `trials`, which its cost is proportional to.
+
+    """
+    streams = len({trial.stream_key() for trial in trials})
+    return unit_sentences(trials) * len(trials) / streams
+
+
+class CostModel:
+    """Predicts the duration of work units from the durations of earlier units of
+    the same cell, as a cost in seconds per sentence per learner.
+
+    A cell is identified by the language, noise level, noise model, input
+    distribution and learners of a unit, and by `kind`, which distinguishes
+    the ways a unit may be run (eg. traced). The costs are read from and
+    written to the json file `path`, if given, so every run benefits from the
+    durations recorded by the earlier ones.
+
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        # maps cell -> [number of durations recorded, mean cost]
+        self.costs = {}
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path) as fh:
+                    self.costs = json.load(fh)
+            except (OSError, ValueError):
+                logging.warning('ignoring unreadable cost model %s', path)
+        self.total_cost = sum(cost for _, cost in self.costs.values())
+
+    @staticmethod
+    def cell(trials, kind=''):
+        trial = trials[0]
+        learners = ','.join(sorted({trial.learner for trial in trials}))
+        return '|'.join(str(field) for field in (
+            trial.language, trial.noise, trial.noise_model,
+            trial.input_distribution, learners, kind))
+
+    def recorded(self, cell):
+        """ Whether any duration was recorded for `cell` """
+        return cell in self.costs
+
+    def default_cost(self):
+        """ The cost of cells without any recorded duration: the mean cost """
+        if not self.costs:
+            return DEFAULT_COST
+        return self.total_cost / len(self.costs)
+
+    def predict(self, trials, kind=''):
+        """ The predicted duration of the unit `trials`, in seconds """
+        cost = self.costs.get(self.cell(trials, kind))
+        cost = self.default_cost() if cost is None else cost[1]
+        return cost * unit_work(trials)
+
+    def record(self, trials, seconds, kind=''):
+        """ Records that the unit `trials` took `seconds` to run """
+        cell = self.cell(trials, kind)
+        count, cost = self.costs.get(cell, (0, 0.0))
+        new_cost = cost + (seconds / unit_work(trials) - cost) / (count + 1)
+        self.costs[cell] = [count + 1, new_cost]
+        self.total_cost += new_cost - cost
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w') as fh:
+            json.dump(self.costs, fh)
+        os.replace(tmp_path, self.path)
+
+
+def timed(func, unit):
+    """ Returns func(unit), and how many seconds it took """
+    start = time.perf_counter()
+    result = func(unit)
+    return result, time.perf_counter() - start
+
+
+def run_longest_first(pool, func, units, cost_model: CostModel, max_pending,
+                      kind=''):
+    """Calls `func` on every unit (a list of trials) of `units` on `pool`, and
+    yields the results as they complete.
+
+    The units with the longest predicted duration are submitted first, and at
+    most `max_pending` at a time: a few more than the pool has workers, so
+    none of them idles between two units, and the rest wait here rather than
+    in the pool's queue. The measured duration of every completed unit
+    updates `cost_model`, and the predictions of its cell, so a cell found to
+    be slower than predicted moves ahead of the units still waiting.
+
+    """
+    # the units waiting in each cell, the cheapest first
+    waiting = {}
+    for unit in units:
+        waiting.setdefault(cost_model.cell(unit, kind), []).append(unit)
+    for cell_units in waiting.values():
+        cell_units.sort(key=unit_work)
+
+    # heaps of the costliest waiting unit of every cell: by predicted duration
+    # for the cells with recorded durations, and by work for the others, which
+    # all share the default cost. entries made before the prediction of their
+    # cell was last revised are stale, and skipped.
+    recorded, unrecorded = [], []
+    revision = dict.fromkeys(waiting, 0)
+    order = itertools.count()
+
+    def push(cell):
+        if not waiting[cell]:
+            return
+        unit = waiting[cell][-1]
+        if cost_model.recorded(cell):
+            heapq.heappush(recorded, (-cost_model.predict(unit, kind),
+                                      next(order), cell, revision[cell]))
+        else:
+            heapq.heappush(unrecorded, (-unit_work(unit), next(order), cell,
+                                        revision[cell]))
+
+    def top(heap):
+        while heap and heap[0][3] != revision[heap[0][2]]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    for cell in waiting:
+        push(cell)
+
+    completed = queue.Queue()
+    pending = 0
+
+    def submit():
+        nonlocal pending
+        recorded_top, unrecorded_top = top(recorded), top(unrecorded)
+        if unrecorded_top is not None and (
+                recorded_top is None or -unrecorded_top[0] *
+                cost_model.default_cost() > -recorded_top[0]):
+            heap = unrecorded
+        elif recorded_top is not None:
+            heap = recorded
+        else:
+            return False
+        _, _, cell, _ = heapq.heappop(heap)
+        unit = waiting[cell].pop()
+        # the next unit of the cell takes the place of this one
+        push(cell)
+        pool.apply_async(timed, (func, unit),
+                         callback=lambda result: completed.put((unit, result)),
+                         error_callback=completed.put)
+        pending += 1
+        return True
+
+    while pending < max_pending and submit():
+        pass
+
+    while pending:
+        item = completed.get()
+        if isinstance(item, BaseException):
+            raise item
+        unit, (result, seconds) = item
+        pending -= 1
+
+        cell = cost_model.cell(unit, kind)
+        cost_model.record(unit, seconds, kind)
+        revision[cell] += 1
+        push(cell)
+
+        submit()
+        yield result
+
+    cost_model.save()
@@ -0,0 +1,237 @@
+# coding: utf-8
+"""A long-running simulation server, which keeps the domain, the precomputed
+triggers and a pool of workers warm between experiments.
+
+Experiments ("jobs") are submitted to a queue in a local SQLite database with
+the same arguments as main.py, and run one after the other. The results of
+each job are written to the simulation_output directory of the working
+directory it was submitted from.
+
+    $ python server.py serve &
+    $ python server.py submit -- -l 611 -n 0 0.1 -e 10 -s 10000
+    $ python server.py status
+
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+import traceback
+from datetime import datetime
+
+import main
+from NDChild import LEARNERS
+from output_handler import write_results
+from telemetry import Telemetry, init_worker
+
+DEFAULT_DB = 'simulation_jobs.sqlite'
+
+
+class JobQueue:
+    """A queue of experiment jobs, stored in the SQLite database `path`. Jobs
+    go from 'queued' to 'running', then to 'done' or 'failed'.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                argv TEXT NOT NULL,
+                output_directory TEXT NOT NULL,
+                submitted TEXT NOT NULL,
+                started TEXT,
+                finished TEXT,
+                output TEXT,
+                error TEXT
+            )''')
+
+    def submit(self, argv, output_directory):
+        """ Queues a job running main.py with `argv`. Returns its id """
+        cursor = self.db.execute(
+            'INSERT INTO jobs (argv, output_directory, submitted) '
+            'VALUES (?, ?, ?)',
+            (json.dumps(argv), output_directory, datetime.now().isoformat()))
+        return cursor.lastrowid
+
+    def claim(self):
+        """ Marks the oldest queued job as running, and returns it (or None) """
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            job = self.db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' "
+                "ORDER BY id LIMIT 1").fetchone()
+            if job is not None:
+                self.db.execute(
+                    "UPDATE jobs SET status = 'running', started = ? "
+                    "WHERE id = ?", (datetime.now().isoformat(), job['id']))
+        finally:
+            self.db.execute('COMMIT')
+        return job
+
+    def finish(self, job_id, output=None, error=None):
+        self.db.execute(
+            'UPDATE jobs SET status = ?, finished = ?, output = ?, error = ? '
+            'WHERE id = ?',
+            ('failed' if error else 'done', datetime.now().isoformat(),
+             output, error, job_id))
+
+    def requeue_running(self):
+        """ Puts jobs left running (by a server that died) back in the queue """
+        return self.db.execute(
+            "UPDATE jobs SET status = 'queued', started = NULL "
+            "WHERE status = 'running'").rowcount
+
+    def get(self, job_id):
+        return self.db.execute('SELECT * FROM jobs WHERE id = ?',
+                               (job_id,)).fetchone()
+
+    def jobs(self):
+        return self.db.execute('SELECT * FROM jobs ORDER BY id').fetchall()
+
+
+def run_job(job, pool, telemetry):
+    """Runs `job` on the warm `pool`, whose size overrides the --num-procs of
+    the job. Returns its output directory.
+
+    """
+    args = main.parse_arguments(json.loads(job['argv']))
+    params = main.experiment_parameters(args)
+    if params.metrics_port is not None:
+        logging.warning('job %s: ignoring --metrics-port, use the '
+                        '--metrics-port of the server', job['id'])
+
+    logging.info('job %s: starting simulation with %s', job['id'],
+                 ' '.join('{}={}'.format(key, val)
+                          for key, val in args.__dict__.items()))
+
+    results = main.run_simulations(params, pool, telemetry)
+    return write_results(job['output_directory'], args, results)
+
+
+def serve(args):
+    jobs = JobQueue(args.db)
+    requeued = jobs.requeue_running()
+    if requeued:
+        logging.info('requeued %s interrupted job(s)', requeued)
+
+    main.DOMAIN.init_from_flatfile()
+    # precompute before starting the pool, so every worker inherits the
+    # triggers and the trigger index
+    main.prepare_domain(LEARNERS, trigger_index=True)
+
+    telemetry = Telemetry(args.num_procs, port=args.metrics_port)
+    with multiprocessing.Pool(args.num_procs, initializer=init_worker,
+                              initargs=telemetry.worker_args()) as pool:
+        logging.info('serving jobs from %s with %s workers', args.db,
+                     args.num_procs)
+        while True:
+            job = jobs.claim()
+            if job is None:
+                time.sleep(args.poll_interval)
+                continue
+            try:
+                output = run_job(job, pool, telemetry)
+            except (Exception, SystemExit):
+                logging.exception('job %s failed', job['id'])
+                jobs.finish(job['id'], error=traceback.format_exc())
+            else:
+                logging.info('job %s done, results in %s', job['id'], output)
+                jobs.finish(job['id'], output=output)
+
+
+def submit(args):
+    # check the arguments now, rather than when the job runs
+    parsed = main.parse_arguments(args.args)
+    argv = list(args.args)
+    # paths are resolved against this directory, rather than the server's,
+    # and a file input distribution is pinned to the weights it has now
+    if parsed.input_distribution != 'uniform':
+        argv += ['--input-distribution', parsed.input_distribution]
+    if parsed.cache_dir is not None:
+        argv += ['--cache-dir', parsed.cache_dir]
+    jobs = JobQueue(args.db)
+    job_id = jobs.submit(argv, os.path.abspath(args.output_directory))
+    print(job_id)
+
+    if not args.wait:
+        return
+    while True:
+        job = jobs.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.1)
+    if job['status'] == 'failed':
+        print(job['error'], file=sys.stderr)
+        sys.exit(1)
+    print(job['output'])
+
+
+def status(args):
+    jobs = JobQueue(args.db)
+    rows = [jobs.get(job_id) for job_id in args.job_ids] if args.job_ids \
+        else jobs.jobs()
+    for job in rows:
+        if job is None:
+            continue
+        print('{id:>5} {status:<8} {submitted:<26} {args}  {result}'.format(
+            id=job['id'], status=job['status'], submitted=job['submitted'],
+            args=' '.join(json.loads(job['argv'])),
+            result=job['output'] or (job['error'] or '').strip().split(
+                '\n')[-1]))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help='the SQLite database of the job queue')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser(
+        'serve', help='run the queued jobs, and wait for more')
+    serve_parser.add_argument('-p', '--num-procs', type=int,
+                              help='number of concurrent processes to run',
+                              default=multiprocessing.cpu_count())
+    serve_parser.add_argument('--poll-interval', type=float,
+                              help='seconds between checks for new jobs',
+                              default=0.05)
+    serve_parser.add_argument('--metrics-port', type=int,
+                              help='serve live throughput metrics of the '
+                              'workers on http://localhost:METRICS_PORT/'
+                              'metrics')
+    serve_parser.set_defaults(func=serve)
+
+    submit_parser = commands.add_parser(
+        'submit', help='queue a job, and print its id')
+    submit_parser.add_argument('--wait', default=False,
+                               action='store_const', const=True,
+                               help='wait for the job to finish, and print '
+                               'its output directory')
+    submit_parser.add_argument('-o', '--output-directory',
+                               default='simulation_output',
+                               help='write the results of the job here')
+    submit_parser.add_argument('args', nargs=argparse.REMAINDER,
+                               help='arguments of main.py (after --)')
+    submit_parser.set_defaults(func=submit)
+
+    status_parser = commands.add_parser('status', help='list jobs')
+    status_parser.add_argument('job_ids', nargs='*', type=int)
+    status_parser.set_defaults(func=status)
+
+    args = parser.parse_args()
+    if args.command == 'submit' and args.args[:1] == ['--']:
+        args.args = args.args[1:]
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    args.func(args)
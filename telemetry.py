@@ -0,0 +1,298 @@
+"""Live progress telemetry from the pool workers.
+
+Every worker owns a slot of a shared-memory array, in which it publishes the
+number of sentences it has consumed so far, the cell (language and noise
+level) it is working on, its RSS and when it last reported. Workers only
+write their own slot, every `REPORT_EVERY` sentences, so reporting costs next
+to nothing and needs no locking.
+
+The main process samples the slots once per second (see `Telemetry`), and
+derives the sentences/sec of every worker and overall, and the ETA. These are
+shown on the progress bar, and optionally served as plain text metrics over
+HTTP.
+
+"""
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+from datetime import timedelta
+
+# the fields of a worker's slot
+SENTENCES, LANGUAGE, NOISE, RSS, UPDATED, BUSY = range(6)
+FIELDS = 6
+
+# number of sentences between two reports of a worker
+REPORT_EVERY = 10000
+
+# the slots of all workers, and the slot of this worker (set in the workers by
+# `init_worker`). the workers of a thread pool share the slots, and each has
+# its own slot.
+_slots = None
+_worker = threading.local()
+
+
+def rss_bytes():
+    """ The current resident set size of this process (its peak, if the current
+    one isn't available) """
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # linux reports kilobytes, macos bytes
+        return usage if sys.platform == 'darwin' else usage * 2 ** 10
+
+
+def init_worker(slots, counter):
+    """Pool initializer: claims a slot of `slots` for this worker, a process or
+    a thread.
+
+    """
+    global _slots
+    with counter.get_lock():
+        # workers replaced by the pool reuse slots
+        _worker.slot = counter.value % (len(slots) // FIELDS)
+        counter.value += 1
+    _slots = slots
+
+
+def track(sentences, params):
+    """Yields from `sentences`, the sentence stream of the trial `params`, and
+    reports progress to the main process. Outside of a pool worker, returns
+    `sentences` as is.
+
+    """
+    slot = getattr(_worker, 'slot', None)
+    if slot is None:
+        return sentences
+    return _track(sentences, params, slot)
+
+
+def _track(sentences, params, slot):
+    base = slot * FIELDS
+    _slots[base + LANGUAGE] = params.language
+    _slots[base + NOISE] = params.noise
+    _slots[base + BUSY] = 1
+    _slots[base + UPDATED] = time.time()
+    i = 0
+    try:
+        for i, s in enumerate(sentences, 1):
+            yield s
+            if not i % REPORT_EVERY:
+                _slots[base + SENTENCES] += REPORT_EVERY
+                _slots[base + RSS] = rss_bytes()
+                _slots[base + UPDATED] = time.time()
+    finally:
+        _slots[base + SENTENCES] += i % REPORT_EVERY
+        _slots[base + BUSY] = 0
+        _slots[base + UPDATED] = time.time()
+
+
+class Telemetry:
+    """Collects the progress reported by the workers of a pool.
+
+    Pass `worker_args()` as the `initargs` of the pool, along with
+    `init_worker` as its initializer, and use the telemetry as a context
+    manager around the pool's lifetime. While active, it samples the workers
+    every `interval` seconds, passes a one line summary to `display` (eg. the
+    `set_postfix_str` of a tqdm bar), and serves metrics on
+    http://localhost:`port`/metrics if `port` is set.
+
+    `expected` is the total number of sentences the pool is going to consume
+    while the telemetry is active, if known. It is used to compute the ETA.
+    The same telemetry can be activated again, eg. for the next job of a pool
+    that is kept running.
+
+    """
+
+    def __init__(self, num_workers, port=None, interval=1.0):
+        self.num_workers = num_workers
+        self.port = port
+        self.interval = interval
+        self.expected = None
+        self.display = None
+        self.slots = multiprocessing.Array('d', num_workers * FIELDS,
+                                           lock=False)
+        self.counter = multiprocessing.Value('i', 0)
+
+        self._reset()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._server = None
+
+    def _reset(self):
+        self.rates = [0.0] * self.num_workers
+        self.rate = 0.0
+        # number of samples in which each worker was busy, for utilisation
+        self.busy_samples = [0] * self.num_workers
+        self.samples = 0
+        self._last = None
+        # sentences consumed before the telemetry was activated
+        self._start = self.sentences
+
+    def worker_args(self):
+        return (self.slots, self.counter)
+
+    def worker(self, i):
+        """ The fields of the slot of worker `i` """
+        return self.slots[i * FIELDS:(i + 1) * FIELDS]
+
+    @property
+    def sentences(self):
+        """ Number of sentences consumed by all workers so far """
+        return sum(self.slots[i * FIELDS + SENTENCES]
+                   for i in range(self.num_workers))
+
+    @property
+    def eta(self):
+        """ The estimated time left, or None if unknown """
+        if self.expected is None or not self.rate:
+            return None
+        return timedelta(seconds=round(
+            max(self.expected - self.sentences + self._start, 0) /
+            self.rate))
+
+    def sample(self):
+        """ Updates the sentences/sec of every worker, and overall """
+        now = time.monotonic()
+        counts = [self.slots[i * FIELDS + SENTENCES]
+                  for i in range(self.num_workers)]
+        with self._lock:
+            if self._last is not None:
+                then, last_counts = self._last
+                elapsed = now - then
+                self.rates = [(count - last) / elapsed
+                              for count, last in zip(counts, last_counts)]
+                # smooth the overall rate, which drives the ETA
+                rate = sum(self.rates)
+                self.rate = rate if not self.rate else (
+                    0.8 * self.rate + 0.2 * rate)
+            self._last = (now, counts)
+            self.samples += 1
+            for i in range(self.num_workers):
+                if self.slots[i * FIELDS + BUSY]:
+                    self.busy_samples[i] += 1
+
+    def summary(self):
+        """ A one line summary, for the progress bar """
+        with self._lock:
+            parts = ['{:,.0f} sents/s'.format(self.rate)]
+            busy = [i for i in range(self.num_workers)
+                    if self.slots[i * FIELDS + BUSY]]
+            if busy:
+                slowest = min(busy, key=lambda i: self.rates[i])
+                parts.append('slowest #{} {:,.0f}/s'.format(
+                    slowest, self.rates[slowest]))
+            eta = self.eta
+            if eta is not None:
+                parts.append('ETA {}'.format(eta))
+        return ', '.join(parts)
+
+    def metrics(self):
+        """ The current metrics, in the prometheus text format """
+        lines = []
+
+        def metric(name, kind, help, values):
+            lines.append('# HELP ndchild_{} {}'.format(name, help))
+            lines.append('# TYPE ndchild_{} {}'.format(name, kind))
+            for labels, value in values:
+                lines.append('ndchild_{}{} {}'.format(name, labels, value))
+
+        with self._lock:
+            workers = [('{{worker="{}"}}'.format(i), self.worker(i))
+                       for i in range(self.num_workers)]
+            metric('worker_sentences_total', 'counter',
+                   'Sentences consumed by the worker.',
+                   [(labels, int(slot[SENTENCES])) for labels, slot in workers])
+            metric('worker_sentences_per_second', 'gauge',
+                   'Sentences consumed by the worker per second.',
+                   [(labels, round(rate, 1))
+                    for (labels, _), rate in zip(workers, self.rates)])
+            metric('worker_busy', 'gauge',
+                   'Whether the worker is running a trial.',
+                   [(labels, int(slot[BUSY])) for labels, slot in workers])
+            metric('worker_language', 'gauge',
+                   'Language of the trial the worker runs (or last ran).',
+                   [(labels, int(slot[LANGUAGE])) for labels, slot in workers])
+            metric('worker_noise', 'gauge',
+                   'Noise level of the trial the worker runs (or last ran).',
+                   [(labels, slot[NOISE]) for labels, slot in workers])
+            metric('worker_rss_bytes', 'gauge',
+                   'Resident set size of the worker.',
+                   [(labels, int(slot[RSS])) for labels, slot in workers])
+            metric('worker_seconds_since_report', 'gauge',
+                   'Seconds since the worker last reported.',
+                   [(labels, round(time.time() - slot[UPDATED], 1)
+                     if slot[UPDATED] else -1)
+                    for labels, slot in workers])
+            metric('sentences_per_second', 'gauge',
+                   'Sentences consumed by all workers per second.',
+                   [('', round(self.rate, 1))])
+            eta = self.eta
+            if eta is not None:
+                metric('eta_seconds', 'gauge',
+                       'Estimated seconds until all trials are done.',
+                       [('', int(eta.total_seconds()))])
+        return '\n'.join(lines) + '\n'
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if self.display is not None:
+                self.display(self.summary())
+
+    def _serve(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = telemetry.metrics().encode()
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        logging.info('serving metrics on http://127.0.0.1:%s/metrics',
+                     self._server.server_address[1])
+
+    def __enter__(self):
+        self._reset()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if self.port is not None:
+            self._serve()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.samples:
+            for i in range(self.num_workers):
+                logging.info('worker #%s: %s sentences in total, busy %.0f%% '
+                             'of the time', i,
+                             int(self.slots[i * FIELDS + SENTENCES]),
+                             100 * self.busy_samples[i] / self.samples)
@@ -0,0 +1,36 @@
+import pytest
+
+import main
+from NDChild import LEARNERS
+from Sentence import Sentence
+from domain import ColagDomain
+
+
+def make_domain(sentences):
+    """Builds a domain from `sentences`, which maps grammar id -> list of
+    (illocution, sentence) pairs. Like in COLAG, a sentence of several
+    grammars has a single id.
+
+    """
+    domain = ColagDomain()
+    ids = {}
+    for grammar, grammar_sentences in sentences.items():
+        for illocution, sentence in grammar_sentences:
+            sentence_id = ids.setdefault((illocution, sentence), len(ids))
+            domain.sentences[sentence_id] = Sentence(
+                [str(grammar), illocution, sentence, sentence_id])
+            domain.languages.setdefault(grammar, []).append(sentence_id)
+    domain.sentence_list = list(domain.sentences.values())
+    return domain
+
+
+@pytest.fixture
+def domain(request, monkeypatch):
+    """The domain of the `SENTENCES` of the test module (see `make_domain`),
+    installed as main.DOMAIN, with the static triggers precomputed.
+
+    """
+    domain = make_domain(request.module.SENTENCES)
+    monkeypatch.setattr(main, 'DOMAIN', domain)
+    LEARNERS['CachedNDChild'].precompute_domain(domain)
+    return domain
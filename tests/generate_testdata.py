@@ -1,9 +1,8 @@
-import gzip
-import json
 import random
 
 from OriginalNDChild import NDChild
 from main import DOMAIN, progress_bar
+from replay import record_trajectory, write_trajectory
 
 DOMAIN.init_from_flatfile()
 
@@ -16,17 +15,16 @@ for _ in range(20):
 
     child = NDChild(learningrate, conslearningrate, language)
 
-    path = 'tests/run_data/lang{}:rate{}:cons{}.jsonl.gz'.format(
+    path = 'tests/run_data/lang{}:rate{}:cons{}.npz'.format(
         language,
         learningrate,
         conslearningrate
     )
 
-    with gzip.open(path, 'wt') as fh:
-        for i in progress_bar(range(num_sents), total=num_sents, desc=str(language)):
-            s = DOMAIN.get_sentence_in_language(grammar_id=language)
-            child.consumeSentence(s)
-            d = dict(child.grammar)
-            d.pop('lang')
-            fh.write(json.dumps(({'sentence_id': s.sentID, 'grammar': d})) + '\n')
-        print(f'wrote {path}')
+    sentences = [DOMAIN.get_sentence_in_language(grammar_id=language)
+                 for _ in range(num_sents)]
+    trajectory = record_trajectory(
+        child, 'NDChild',
+        progress_bar(sentences, total=num_sents, desc=str(language)))
+    write_trajectory(path, trajectory)
+    print(f'wrote {path}')
@@ -0,0 +1,29 @@
+from collections import Counter
+
+import main
+from datatypes import ExperimentParameters
+
+SENTENCES = {
+    611: [('DEC', 'Adv S Verb O1'), ('DEC', 'S Aux Verb O1'),
+          ('Q', 'Aux S Verb O1'), ('IMP', 'Verb O1')],
+    3856: [('DEC', 'S O1 Verb'), ('Q', 'S O1 Verb ka')],
+}
+
+
+def run_adaptive(target_se):
+    params = ExperimentParameters(
+        languages=[611], noise_levels=[0, 0.5], learningrates=[0.9],
+        conservative_learningrates=[0.0005], num_sentences=200,
+        num_echildren=12, num_procs=2, trace=False, target_se=target_se,
+        min_echildren=4, executor='thread')
+    results = list(main.run_simulations(params))
+    return Counter(result.trial_params.noise for result in results)
+
+
+def test_adaptive_stopping(domain):
+    domain.digest = 'test'
+    # noiseless echildren all learn the same parameters from the few
+    # sentences, so their means have no error once min_echildren are in
+    assert run_adaptive(0.01) == {0: 4, 0.5: 12}
+    # cells stop at num_echildren if they never converge
+    assert run_adaptive(0) == {0: 12, 0.5: 12}
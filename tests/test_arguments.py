@@ -0,0 +1,32 @@
+import argparse
+
+import pytest
+
+import main
+from main import float_range
+
+
+def test_float_range():
+    assert float_range('0.5') == [0.5]
+    assert float_range('0.1:0.5:0.2') == [0.1, 0.3, 0.5]
+    assert float_range('0:0.3:0.1') == [0, 0.1, 0.2, 0.3]
+    assert float_range('0.5:0.5:0.1') == [0.5]
+    # the stop is inclusive, but never overshot
+    assert float_range('0.1:0.9:0.5') == [0.1, 0.6]
+    assert float_range('0.5:0.95:0.3') == [0.5, 0.8]
+    assert float_range('0.1:1:0.3') == [0.1, 0.4, 0.7, 1.0]
+
+    for value in ['0.1:0.5', '0.5:0.1:0.1', '0.1:0.5:0', 'a:b:c']:
+        with pytest.raises(argparse.ArgumentTypeError):
+            float_range(value)
+
+
+def test_rate_arguments():
+    args = main.parse_arguments(['-r', '0.1:0.9:0.5', '0.9',
+                                 '-c', '0:0.002:0.001'])
+    assert args.rate == [0.1, 0.6, 0.9]
+    assert args.cons_rate == [0, 0.001, 0.002]
+
+    for argv in [['-r', '1.5'], ['-r', '0.5:1.5:0.5'], ['-c', '-0.1']]:
+        with pytest.raises(SystemExit):
+            main.parse_arguments(argv)
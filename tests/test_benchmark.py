@@ -0,0 +1,52 @@
+import json
+import os.path
+import subprocess
+import sys
+
+from benchmark import compare
+
+BENCHMARK = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmark.py')
+
+
+def run_benchmark(*args):
+    return subprocess.run([sys.executable, BENCHMARK, '-s', '100',
+                           '--trial-sentences', '100', '--plot-languages',
+                           '2', '--repeat', '1', *args],
+                          env=dict(os.environ, MPLBACKEND='Agg'),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+
+
+def test_benchmarks_run(tmp_path):
+    output = str(tmp_path / 'results.json')
+    process = run_benchmark('--output', output)
+    assert process.returncode == 0, process.stderr
+    with open(output) as fh:
+        results = json.load(fh)
+    assert results['domain'] == 'small'
+    assert set(results['benchmarks']) == {
+        'import_main', 'domain_parse', 'domain_cache_load',
+        'precompute_domain', 'sample_in_language', 'sample_in_language_zipf',
+        'sample_in_language_zipf_batch', 'sample_noise',
+        'sample_noise_confuser', 'consume_NDChild', 'consume_CachedNDChild',
+        'run_trial', 'plot_2_languages'}
+    for result in results['benchmarks'].values():
+        assert result['throughput'] > 0 and result['peak_rss_mb'] > 0
+
+    # a baseline 10 times faster than anything, so every benchmark regressed
+    for result in results['benchmarks'].values():
+        result['throughput'] *= 10
+    with open(output, 'w') as fh:
+        json.dump(results, fh)
+    process = run_benchmark('--baseline', output)
+    assert process.returncode == 1
+    assert '13 benchmark(s) regressed' in process.stdout
+
+
+def test_compare():
+    baseline = {'a': {'throughput': 100}, 'b': {'throughput': 100}}
+    results = {'a': {'throughput': 95}, 'b': {'throughput': 80},
+               'c': {'throughput': 1}}
+    assert compare(results, baseline, 0.1) == ['b']
+    assert compare(results, baseline, 0.25) == []
@@ -0,0 +1,119 @@
+import itertools
+import pickle
+
+import pytest
+
+import main
+from datatypes import TrialParameters
+
+SENTENCES = {
+    611: [('DEC', 'Adv S Verb O1'), ('DEC', 'Adv S Aux Verb O1'),
+          ('Q', 'Aux S Verb O1'), ('Q', 'O1[+WH] Aux S Verb'),
+          ('IMP', 'Verb O1'), ('DEC', 'O1 S Verb')],
+    3856: [('DEC', 'S O1 Verb'), ('Q', 'S O1 Verb ka'),
+           ('DEC', 'O1 S Aux Verb')],
+}
+
+
+def test_snapshot_restore(domain):
+    trial = TrialParameters(language=611, noise=0.2, rate=0.3,
+                            conservativerate=0.01, numberofsentences=2000,
+                            seed=0, learner='NDChild', epsilon=0.01)
+    child = main.make_child(trial, profiling='counts')
+    sentences = list(main.sentence_stream(trial))
+    for s in sentences[:1000]:
+        child.consumeSentence(s)
+    state = pickle.loads(pickle.dumps(child.snapshot()))
+    resumed = main.make_child(trial, profiling='counts')
+    resumed.restore(state)
+    for s in sentences[1000:]:
+        child.consumeSentence(s)
+        resumed.consumeSentence(s)
+    assert resumed.grammar == child.grammar
+    assert resumed.convergence() == child.convergence()
+    assert resumed.trigger_stats() == child.trigger_stats()
+
+
+@pytest.mark.parametrize('input_distribution', ['uniform', 'zipf:1'])
+def test_branches_match_unbranched_runs(domain, input_distribution):
+    trials = [
+        TrialParameters(language=611, noise=noise, rate=rate,
+                        conservativerate=0.01, numberofsentences=3000,
+                        seed=7, learner=learner, epsilon=0.01,
+                        input_distribution=input_distribution,
+                        prefix_sentences=1000, prefix_rate=0.5,
+                        prefix_conservativerate=0.001)
+        for noise in [0, 0.1, 0.5]
+        for rate in [0.1, 0.9]
+        for learner in ['NDChild', 'CachedNDChild']
+    ]
+    assert len({trial.family_key() for trial in trials}) == 1
+    results = main.run_branches(trials)
+
+    for trial, result in zip(trials, results):
+        assert result.trial_params is trial
+        child = main.make_child(trial)
+        child.r, child.conservativerate = 0.5, 0.001
+        for i, s in enumerate(main.sentence_stream(trial)):
+            if i == trial.prefix_sentences:
+                child.r, child.conservativerate = trial.rate, 0.01
+            child.consumeSentence(s)
+        assert result.grammar == child.grammar
+        assert result.convergence == child.convergence()
+
+
+def test_run_pass_checkpoints(domain):
+    trial = TrialParameters(language=611, noise=0.1, rate=0.3,
+                            conservativerate=0.01, numberofsentences=3000,
+                            seed=3, learner='CachedNDChild', epsilon=0.01)
+    result = main.run_trial(trial)
+
+    child = main.make_child(trial)
+    checkpoints = main.run_pass([trial], [child], points=[1000, 2000, 5000])
+    seen = [(c.sentences, c.final, dict(c.children[0].grammar))
+            for c in checkpoints]
+    assert [(n, final) for n, final, _ in seen] == [
+        (1000, False), (2000, False), (3000, True)]
+    assert seen[-1][2] == result.grammar
+
+    # stopping early leaves the learner where it stopped
+    child = main.make_child(trial)
+    for checkpoint in main.run_pass([trial], [child], points=[1000, 2000]):
+        break
+    assert child.sentences_consumed == 1000
+    assert child.grammar == seen[0][2]
+
+
+@pytest.mark.parametrize('input_distribution', ['uniform', 'zipf:1'])
+def test_run_pass_matches_stream(domain, input_distribution):
+    trials = [TrialParameters(language=611, noise=0.3, rate=rate,
+                              conservativerate=0.01, numberofsentences=3000,
+                              seed=5, learner='CachedNDChild', epsilon=0.01,
+                              input_distribution=input_distribution)
+              for rate in [0.3, 0.9]]
+
+    # fed the stream directly, sentence by sentence
+    expected = [main.make_child(trial) for trial in trials]
+    for s in main.sentence_stream(trials[0]):
+        for child in expected:
+            child.consumeSentence(s)
+
+    children = [main.make_child(trial) for trial in trials]
+    *_, last = main.run_pass(trials, children, points=[1, 1500, 2999])
+    assert last.final and last.sentences == 3000
+    for child, direct in zip(children, expected):
+        assert child.grammar == direct.grammar
+        assert child.convergence() == direct.convergence()
+
+    # resumed halfway, from the state of the random streams there
+    rng = main.StreamRandom(trials[0])
+    stream = main.sentence_stream(trials[0], rng)
+    resumed = [main.make_child(trial) for trial in trials]
+    for s in itertools.islice(stream, 1000):
+        for child in resumed:
+            child.consumeSentence(s)
+    for _ in main.run_pass(trials, resumed, rng=rng, start=1000):
+        pass
+    for child, direct in zip(resumed, expected):
+        assert child.grammar == direct.grammar
+        assert child.sentences_consumed == 3000
@@ -0,0 +1,166 @@
+import importlib.util
+import inspect
+import os.path
+import sys
+from datetime import datetime, timedelta
+
+import main
+from cache import ResultCache
+from datatypes import ExperimentParameters, NDResult, TrialParameters
+
+SENTENCES = {
+    611: [('DEC', 'Adv S Verb O1'), ('DEC', 'S Aux Verb O1'),
+          ('Q', 'Aux S Verb O1'), ('IMP', 'Verb O1')],
+    610: [('DEC', 'S Verb O1'), ('Q', 'Aux S Verb O1')],
+    3856: [('DEC', 'S O1 Verb'), ('Q', 'S O1 Verb ka')],
+}
+
+
+def make_result(seed):
+    params = TrialParameters(language=611, noise=0.1, rate=0.9,
+                             conservativerate=0.0005, numberofsentences=100,
+                             seed=seed, learner='CachedNDChild',
+                             epsilon=0.01)
+    return NDResult(trial_params=params,
+                    timestamp=datetime.now(),
+                    duration=timedelta(seconds=1),
+                    language=611,
+                    grammar={'SP': 0.5})
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = ResultCache(str(tmp_path), 2 ** 20, namespace='a')
+    result = make_result(1)
+    assert cache.get(result.trial_params) is None
+    cache.put(result)
+    assert cache.get(result.trial_params) == result
+
+    # entries are found again by a new cache on the same directory, but not
+    # under a different namespace (eg. after the learner code changed)
+    assert ResultCache(str(tmp_path), 2 ** 20, namespace='a').get(
+        result.trial_params) == result
+    assert ResultCache(str(tmp_path), 2 ** 20, namespace='b').get(
+        result.trial_params) is None
+
+
+def test_cache_lru_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path), 2 ** 20, namespace='a')
+    results = [make_result(seed) for seed in range(3)]
+    for result in results:
+        cache.put(result)
+    entry_size = cache.total_bytes // 3
+
+    # touch the oldest entry, so the second one becomes least recently used
+    cache.get(results[0].trial_params)
+    cache.max_bytes = entry_size * 2 + entry_size // 2
+    cache.evict()
+
+    assert cache.get(results[1].trial_params) is None
+    assert cache.get(results[0].trial_params) == results[0]
+    assert cache.get(results[2].trial_params) == results[2]
+
+
+def traced_code(func, *args):
+    """ The code objects of the repository run by func(*args) """
+    root = os.path.dirname(os.path.abspath(main.__file__))
+    code = set()
+
+    def profile(frame, event, arg):
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (event == 'call' and os.path.dirname(filename) == root
+                and os.path.isfile(filename)):
+            code.add(frame.f_code)
+
+    sys.setprofile(profile)
+    try:
+        func(*args)
+    finally:
+        sys.setprofile(None)
+    return code
+
+
+def fingerprinted(code, objects):
+    """ Whether `code` is part of the fingerprint of `objects` """
+    filename = os.path.abspath(code.co_filename)
+    for obj in objects:
+        if inspect.ismodule(obj):
+            if os.path.abspath(inspect.getsourcefile(obj)) == filename:
+                return True
+        elif inspect.isclass(obj):
+            if any(os.path.abspath(inspect.getsourcefile(klass)) == filename
+                   for klass in obj.__mro__
+                   if klass.__module__ != 'builtins'):
+                return True
+        elif os.path.abspath(inspect.getsourcefile(obj)) == filename:
+            lines, first = inspect.getsourcelines(obj)
+            if first <= code.co_firstlineno < first + len(lines):
+                return True
+    return False
+
+
+def run_echildren(params):
+    for noise in params.noise_levels:
+        trials = main.echild_trials(params, 611, noise, 0)
+        if params.prefix_sentences:
+            main.run_branches(trials)
+        else:
+            main.run_trials(trials)
+
+
+def test_result_code_covers_trial_path(domain):
+    learners = ['CachedNDChild', 'NDChildModLRP']
+    main.prepare_domain(learners, trigger_index=True)
+    base = dict(languages=[611], learningrates=[0.9],
+                conservative_learningrates=[0.0005], num_sentences=200,
+                num_echildren=1, num_procs=1, trace=False,
+                learners=learners)
+    code = set()
+    for extra in [dict(noise_levels=[0]),
+                  dict(noise_levels=[0.5], noise_model='hamming:1',
+                       input_distribution='zipf:1'),
+                  dict(noise_levels=[0, 0.5], prefix_sentences=50,
+                       prefix_rate=0.5)]:
+        code |= traced_code(run_echildren,
+                            ExperimentParameters(**base, **extra))
+
+    assert {c.co_name for c in code} >= {'echild_trials', 'sentence_stream',
+                                         'in_language_sentences',
+                                         'make_child', 'run_branches'}
+    objects = main.result_code(learners)
+    missing = sorted('{}:{}'.format(os.path.basename(c.co_filename),
+                                    c.co_name)
+                     for c in code if not fingerprinted(c, objects))
+    assert not missing
+
+
+def run(module, params):
+    return sorted(module.run_simulations(params),
+                  key=lambda result: result.trial_params.seed)
+
+
+def test_sampling_changes_invalidate_cache(domain, tmp_path, monkeypatch):
+    domain.digest = 'test'
+    params = ExperimentParameters(
+        languages=[611], noise_levels=[0.5], learningrates=[0.9],
+        conservative_learningrates=[0.0005], num_sentences=200,
+        num_echildren=2, num_procs=1, trace=False,
+        cache_dir=str(tmp_path / 'cache'), executor='thread')
+    first = run(main, params)
+    # served from the cache, timestamps included
+    assert run(main, params) == first
+
+    # a copy of main which draws its in-language sentences from another seed
+    source = inspect.getsource(main)
+    edited = source.replace("'in-language'", "'in-language, edited'")
+    assert edited != source
+    path = tmp_path / 'edited_main.py'
+    path.write_text(edited)
+    spec = importlib.util.spec_from_file_location('edited_main', str(path))
+    edited_main = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, 'edited_main', edited_main)
+    spec.loader.exec_module(edited_main)
+    edited_main.DOMAIN = domain
+
+    rerun = run(edited_main, params)
+    assert len(rerun) == len(first)
+    assert not any(result in first for result in rerun)
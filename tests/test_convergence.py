@@ -0,0 +1,37 @@
+import pytest
+
+from NDChild import NDChild, convergence_tracking
+from Sentence import Sentence
+
+# grammar 16 only has TM set
+LANGUAGE = 16
+TM_UP = Sentence(['16', 'DEC', 'O1 S[+WA] Verb', 0])
+TM_DOWN = Sentence(['16', 'DEC', 'O1 Verb O2', 1])
+OTHER = Sentence(['16', 'DEC', 'S Verb', 2])
+
+
+def test_convergence_tracking():
+    child = convergence_tracking(NDChild, 0.01)(0.6, 0.0005, LANGUAGE)
+    sentences = [OTHER, TM_UP, TM_UP, TM_DOWN] + [TM_UP] * 5
+    # TM after each sentence, at rate 0.6, and when it last moved above 0.5
+    # (or None if it is below) and first came within 0.01 of 1
+    expected = [
+        (0.5, None, None),
+        (0.8, 2, None),
+        (0.92, 2, None),
+        (0.368, None, None),
+        (0.7472, 5, None),
+        (0.89888, 5, None),
+        (0.959552, 5, None),
+        (0.9838208, 5, None),
+        (0.99352832, 5, 9),
+    ]
+    for s, (value, converged, within_eps) in zip(sentences, expected):
+        child.consumeSentence(s)
+        assert child.grammar['TM'] == pytest.approx(value)
+        assert child.converged_at['TM'] == converged
+        assert child.within_epsilon_at['TM'] == within_eps
+
+    assert child.sentences_consumed == 9
+    metrics = child.convergence()
+    assert (metrics['TM_converged'], metrics['TM_within_eps']) == (5, 9)
@@ -0,0 +1,29 @@
+import threading
+
+import main
+import telemetry
+from datatypes import TrialParameters
+from telemetry import SENTENCES, Telemetry, track
+
+PARAMS = TrialParameters(language=611, noise=0, rate=0.9,
+                         conservativerate=0.0005, numberofsentences=25000,
+                         seed=0, learner='CachedNDChild', epsilon=0.01)
+
+
+def consume(num_sentences):
+    for _ in track(range(num_sentences), PARAMS):
+        pass
+    return threading.get_ident()
+
+
+def test_thread_workers_report_to_their_own_slots():
+    t = Telemetry(3)
+    with main.worker_pool(3, t, executor='thread') as pool:
+        threads = set(pool.map(consume, [25000] * 6, chunksize=1))
+    assert threading.get_ident() not in threads
+    assert t.sentences == 6 * 25000
+    # every thread which ran a trial claimed a slot
+    assert sum(1 for i in range(3) if t.worker(i)[SENTENCES]) == len(threads)
+    # outside of the workers, nothing is tracked
+    assert getattr(telemetry._worker, 'slot', None) is None
+    assert track(range(3), PARAMS) == range(3)
@@ -0,0 +1,43 @@
+import os.path
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the simulation core must not pull in the output backends, or the network
+HEAVY_MODULES = ['pandas', 'matplotlib', 'numpy', 'requests']
+
+# seconds to import main. it takes about 0.1s, against 1.5s when it imported
+# pandas and matplotlib
+IMPORT_BUDGET = 0.5
+
+
+def test_core_imports_are_light():
+    code = ('import sys, main, domain, NDChild, datatypes; '
+            'print(" ".join(sorted(sys.modules)))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    modules = {name.split('.')[0] for name in output.stdout.split()}
+    assert not modules & set(HEAVY_MODULES)
+
+
+def test_output_imports_are_lazy():
+    # pandas and matplotlib are only imported by the summaries and plots
+    code = ('import sys, output_handler; '
+            'print(" ".join(sorted(sys.modules)))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    modules = {name.split('.')[0] for name in output.stdout.split()}
+    assert not modules & {'pandas', 'matplotlib', 'main'}
+
+
+def test_import_time_budget():
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             'import main'],
+                            cwd=ROOT, check=True, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    # the last line is main's: "import time: self | cumulative | main", in us
+    line = output.stderr.strip().splitlines()[-1]
+    assert line.endswith('| main')
+    cumulative = int(line.split('|')[1]) / 1e6
+    assert cumulative < IMPORT_BUDGET
@@ -0,0 +1,102 @@
+import dataclasses
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import main
+from cache import ResultCache
+from datatypes import TrialParameters
+from domain import parse_input_distribution, resolve_input_distribution
+from utils import AliasTable
+
+SENTENCES = {
+    611: [('DEC', 'S Verb'), ('DEC', 'S Verb O1'), ('DEC', 'S Aux Verb O1 O2'),
+          ('Q', 'Aux S Verb'), ('IMP', 'Verb')],
+}
+
+
+def test_alias_table():
+    weights = [5, 0, 1, 3, 1]
+    table = AliasTable(weights)
+    rng = random.Random(0)
+    counts = Counter(table.draw(rng) for _ in range(100000))
+    batch = Counter(table.draw_batch(np.random.default_rng(0), 100000))
+    for i, weight in enumerate(weights):
+        assert counts[i] / 100000 == pytest.approx(weight / 10, abs=0.01)
+        assert batch[i] / 100000 == pytest.approx(weight / 10, abs=0.01)
+
+    with pytest.raises(ValueError):
+        AliasTable([0, 0])
+
+
+def test_parse_input_distribution():
+    assert parse_input_distribution('zipf:1.5') == ('zipf', 1.5)
+    assert parse_input_distribution('illocution:DEC=2,Q=1') == (
+        'illocution', {'DEC': 2, 'Q': 1})
+    for spec in ['zipf', 'illocution:DEC', 'file:', 'normal']:
+        with pytest.raises(ValueError):
+            parse_input_distribution(spec)
+
+
+def test_input_tables(domain, tmpdir):
+
+    # ranked by length: 'Verb', 'S Verb', then the 3 word sentences by id
+    zipf = domain.input_table(611, 'zipf:1').probabilities()
+    ranks = [2, 3, 5, 4, 1]
+    total = sum(1 / rank for rank in ranks)
+    assert zipf == pytest.approx([1 / rank / total for rank in ranks])
+
+    illocution = domain.input_table(611,
+                                    'illocution:DEC=3,Q=1').probabilities()
+    assert illocution == pytest.approx([0.25, 0.25, 0.25, 0.25, 0])
+
+    path = tmpdir.join('weights.txt')
+    path.write('# sentence weight\n4 3\n0 1\n')
+    weighted = domain.input_table(611, 'file:' + str(path)).probabilities()
+    assert weighted == pytest.approx([0.25, 0, 0, 0, 0.75])
+
+    with pytest.raises(ValueError):
+        domain.input_table(611, 'illocution:WH=1')
+
+    rng = random.Random(0)
+    drawn = {domain.get_sentence_in_language(611, rng, 'file:' + str(path))
+             .sentenceStr for _ in range(100)}
+    assert drawn == {'S Verb', 'Verb'}
+
+
+def test_file_distributions(domain, tmpdir, monkeypatch):
+    tmpdir.join('weights.txt').write('4 3\n0 1\n')
+    monkeypatch.chdir(tmpdir)
+    # relative paths are resolved at argument parsing, and pinned to the
+    # contents of the file
+    args = main.parse_arguments(['--input-distribution', 'file:weights.txt'])
+    spec = args.input_distribution
+    path, digest = parse_input_distribution(spec)[1]
+    assert path == str(tmpdir.join('weights.txt')) and digest is not None
+    assert resolve_input_distribution(spec) == spec
+    assert domain.input_table(611, spec).probabilities() == pytest.approx(
+        [0.25, 0, 0, 0, 0.75])
+
+    # edited weights are a new distribution, to the domain and the cache
+    tmpdir.join('weights.txt').write('4 1\n0 1\n')
+    edited = resolve_input_distribution('file:weights.txt')
+    assert edited != spec
+    assert domain.input_table(611, edited).probabilities() == pytest.approx(
+        [0.5, 0, 0, 0, 0.5])
+    assert domain.input_table(611, 'file:weights.txt') is domain.input_table(
+        611, edited)
+    trial = TrialParameters(language=611, noise=0, rate=0.9,
+                            conservativerate=0.0005, numberofsentences=10,
+                            seed=0, learner='NDChild', epsilon=0.01,
+                            input_distribution=spec)
+    cache = ResultCache(str(tmpdir.join('cache')), 2 ** 20)
+    assert cache.key(trial) != cache.key(
+        dataclasses.replace(trial, input_distribution=edited))
+
+    # a domain which did not read the old weights can't anymore
+    domain.input_tables.clear()
+    domain.sentence_weights.clear()
+    with pytest.raises(ValueError):
+        domain.input_table(611, spec)
@@ -1,25 +1,15 @@
 import glob
-import gzip
-import json
 import random
-import re
 
 import pytest
 
 from NDChild import NDChild, NDChildModLRP, cached_child
 from main import DOMAIN, progress_bar
+from replay import read_trajectory, replay
 
 CachedChild = cached_child(NDChild)
 
 
-def find_difference(g1, g2):
-    diffs = {}
-    for key in g1:
-        if g1[key] != g2[key]:
-            diffs[key] = g1[key], g2[key]
-    return diffs
-
-
 DOMAIN.init_from_flatfile()
 
 for sent in progress_bar(DOMAIN.sentences.values(),
@@ -43,36 +33,21 @@ def test_modlrp_child():
         assert round(child.grammar['AH'], 2) == expected
 
 
-runs = glob.glob('tests/run_data/*.gz')
+runs = glob.glob('tests/run_data/*.npz')
 
 @pytest.mark.parametrize('path', runs)
-def test_drift_from_original(path):
+@pytest.mark.parametrize('learner', ['NDChild', 'CachedNDChild'])
+def test_drift_from_original(path, learner):
     """Tests to ensure the behavior of NDChild has not changed.
 
-    The directory tests/run_data contains a set of logs generated by NDChild
-    runs on random languages, using randomly generated learning rates. Each
-    file represents snapshots from a single child on a single language. The
-    language, and learning rates are contained in the filename.
-
-    Each of these files is a gzipped jsonl file. Each line in the file is a
-    snapshot of the learner's grammar after consuming a sentence.
+    The directory tests/run_data contains a set of trajectories (see replay.py)
+    of NDChild runs on random languages, using randomly generated learning
+    rates: the sentences each child consumed, and snapshots of its grammar.
+    Replaying a learner over them must reproduce every snapshot exactly.
 
     """
-    lang, rate, cons = re.search(r'lang(\d+):rate(\d+.\d+):cons(\d+.\d+)', path).groups()
-    rate, cons = float(rate), float(cons)
-
-    child = NDChild(rate, cons, lang)
-    cached_child = CachedChild(rate, cons, lang)
-
-    with gzip.open(path) as fh:
-        for line in fh:
-            data = json.loads(line)
-            s = DOMAIN.sentences[data['sentence_id']]
-            expected = data['grammar']
-            child.consumeSentence(s)
-            cached_child.consumeSentence(s)
-            assert child.grammar == expected
-            assert child.grammar == cached_child.grammar
+    trajectory = read_trajectory(path)
+    assert replay(trajectory, learner, DOMAIN, reference='NDChild') is None
 
 
 all_languages = list(DOMAIN.languages.keys())
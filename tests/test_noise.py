@@ -0,0 +1,77 @@
+import multiprocessing
+import random
+
+import pytest
+
+import main
+from domain import parse_noise_model
+
+# grammar -> sentences. 0b11 and 0b101 are at distance 1 from 0b1, 0b1000000
+# at distance 2
+SENTENCES = {
+    0b1: [('DEC', 'S Verb'), ('DEC', 'S Verb O1')],
+    0b11: [('DEC', 'S Verb'), ('DEC', 'Verb S')],
+    0b101: [('DEC', 'S Aux Verb')],
+    0b1000000: [('DEC', 'O1 Verb S'), ('DEC', 'S Verb O1')],
+}
+
+
+def strings(domain, pool):
+    return {domain.sentences[i].sentenceStr for i in pool}
+
+
+def test_parse_noise_model():
+    assert parse_noise_model('uniform') == ('uniform', None)
+    assert parse_noise_model('hamming:2') == ('hamming', 2)
+    assert parse_noise_model('confuser:611') == ('confuser', 611)
+    for spec in ['hamming', 'confuser:x', 'uniform:1', 'gaussian']:
+        with pytest.raises(ValueError):
+            parse_noise_model(spec)
+
+
+def test_noise_pools(domain):
+    assert strings(domain, domain.noise_pool(0b1, 'hamming:1')) == {
+        'Verb S', 'S Aux Verb'}
+    assert strings(domain, domain.noise_pool(0b1, 'hamming:2')) == {
+        'Verb S', 'S Aux Verb', 'O1 Verb S'}
+    assert strings(domain, domain.noise_pool(0b1, 'confuser:64')) == {
+        'O1 Verb S'}
+    assert strings(domain, domain.noise_pool(0b1, 'uniform')) == {
+        'Verb S', 'S Aux Verb', 'O1 Verb S'}
+    # pools are computed once
+    assert domain.noise_pool(0b1, 'hamming:1') is domain.noise_pool(
+        0b1, 'hamming:1')
+
+    # 0b1000000 has no neighbours within distance 1, and 0b1 is not a confuser
+    # of itself
+    with pytest.raises(ValueError):
+        domain.noise_pool(0b1000000, 'hamming:1')
+    with pytest.raises(ValueError):
+        domain.noise_pool(0b1, 'confuser:1')
+
+
+def test_noise_draws(domain):
+    rng = random.Random(0)
+    for model in ['uniform', 'hamming:1', 'confuser:64']:
+        pool = strings(domain, domain.noise_pool(0b11, model))
+        drawn = {domain.get_noise_sentence(0b11, model, rng).sentenceStr
+                 for _ in range(200)}
+        assert drawn == pool
+        assert not drawn & {sentence for _, sentence in SENTENCES[0b11]}
+
+
+def built_noise_pools(barrier):
+    barrier.wait()
+    return sorted(main.DOMAIN.noise_pools)
+
+
+def test_prepare_workers(domain):
+    # the workers of a pool started before the pools are built, like the warm
+    # pool of server.py, each build them
+    pairs = [(0b1, 'hamming:1'), (0b11, 'confuser:64')]
+    with multiprocessing.Pool(2) as pool:
+        main.prepare_workers(pool, pairs)
+        with multiprocessing.Manager() as manager:
+            barrier = manager.Barrier(2)
+            built = pool.map(built_noise_pools, [barrier] * 2, chunksize=1)
+    assert built == [pairs, pairs]
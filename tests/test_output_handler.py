@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.cbook import boxplot_stats
+
+from datatypes import PARAMETERS
+from output_handler import (LANGUAGES_PER_PAGE, barplot_output, box_stats,
+                            learnability_output, paired_differences)
+
+
+def make_arrays(languages, noise_levels, echildren, seed=0):
+    rng = np.random.RandomState(seed)
+    cells = [(language, noise) for language in languages
+             for noise in noise_levels for _ in range(echildren)]
+    arrays = {
+        'learner': np.array(['CachedNDChild'] * len(cells)),
+        'rate': np.full(len(cells), 0.9),
+        'conservativerate': np.full(len(cells), 0.0005),
+        'language': np.array([language for language, _ in cells]),
+        'noise': np.array([noise for _, noise in cells]),
+    }
+    for param in PARAMETERS:
+        # mostly near 0 or 1, with some outliers
+        arrays[param] = np.clip(rng.beta(0.3, 0.3, len(cells)) +
+                                rng.normal(0, 0.05, len(cells)), 0, 1)
+    return arrays
+
+
+def test_box_stats():
+    """The box plot statistics agree with matplotlib's, computed from the raw
+    values.
+
+    """
+    arrays = make_arrays([611, 584], [0, 0.1], 50)
+    stats = box_stats(arrays)
+    assert len(stats) == 4
+    count, cell_stats = stats['CachedNDChild', 0.9, 0.0005, 584, 0.1]
+    assert count == 50
+    rows = (arrays['language'] == 584) & (arrays['noise'] == 0.1)
+    for num, param in enumerate(PARAMETERS):
+        expected, = boxplot_stats(arrays[param][rows])
+        assert np.allclose(cell_stats[:, num],
+                           [expected[key] for key in
+                            ['whislo', 'q1', 'med', 'q3', 'whishi']])
+
+
+def test_barplot_pages(tmpdir):
+    languages = list(range(10))
+    arrays = make_arrays(languages, [0, 0.5], 5)
+    arrays['rate'][:len(arrays['rate']) // 2] = 0.5
+    image_output = str(tmpdir.join('plot.pdf'))
+    plots = barplot_output(box_stats(arrays), image_output)
+    assert sorted(args[2] for _, args in plots) == [
+        str(tmpdir.join('plot_R0.5.pdf')), str(tmpdir.join('plot_R0.9.pdf'))]
+
+    function, args = plots[0]
+    function(*args)
+    with open(args[2], 'rb') as fh:
+        pdf = fh.read()
+    # the page tree, and a page per LANGUAGES_PER_PAGE of the 5 languages
+    assert LANGUAGES_PER_PAGE == 4
+    assert pdf.count(b'/Type /Page') == 1 + 2
+
+
+def test_learnability_reports(tmpdir):
+    nan = float('nan')
+    # sentences after which each param stayed on target, or nan. 611 targets
+    # OPT but not SP, 0 targets neither.
+    echildren = [
+        (611, [10 * (i + 1) for i in range(len(PARAMETERS))]),
+        (611, [nan] + [5] * (len(PARAMETERS) - 1)),
+        (0, [100] * len(PARAMETERS)),
+        (0, [nan] * len(PARAMETERS)),
+        (0, [nan] * len(PARAMETERS)),
+    ]
+    df = pd.DataFrame({
+        'learner': 'CachedNDChild', 'rate': 0.9, 'conservativerate': 0.0005,
+        'noise': 0.0, 'language': [language for language, _ in echildren],
+        **{param + '_converged': [converged[i] for _, converged in echildren]
+           for i, param in enumerate(PARAMETERS)}})
+    by_grammar_path = str(tmpdir.join('by_grammar.csv'))
+    by_parameter_path = str(tmpdir.join('by_parameter.csv'))
+    learnability_output(df, by_grammar_path, by_parameter_path)
+
+    by_grammar = pd.read_csv(by_grammar_path).set_index('language')
+    assert list(by_grammar.echildren[[611, 0]]) == [2, 3]
+    assert list(by_grammar.params_learned[[611, 0]]) == pytest.approx(
+        [12.5, 13 / 3])
+    assert list(by_grammar.all_learned[[611, 0]]) == pytest.approx(
+        [0.5, 1 / 3])
+    assert list(by_grammar.sentences_to_all[[611, 0]]) == [130, 100]
+    assert list(by_grammar.SP_learned[[611, 0]]) == pytest.approx([0.5, 1 / 3])
+    assert list(by_grammar.HIP_learned[[611, 0]]) == pytest.approx([1, 1 / 3])
+
+    by_parameter = pd.read_csv(by_parameter_path).set_index(
+        ['param', 'target'])
+    sp = by_parameter.loc[('SP', 0)]
+    assert (sp.grammars, sp.echildren) == (2, 5)
+    assert sp.learned == pytest.approx(0.4)
+    assert sp.sentences_to_learn == sp.median_sentences_to_learn == 55
+    # 611 learned SP in half of its echildren, 0 in a third
+    assert sp.grammars_learned == 0.5
+    assert ('SP', 1) not in by_parameter.index
+    opt = by_parameter.loc[('OPT', 1)]
+    assert (opt.grammars, opt.echildren, opt.learned) == (1, 2, 1)
+    assert opt.sentences_to_learn == 22.5
+    assert opt.grammars_learned == 1
+    opt = by_parameter.loc[('OPT', 0)]
+    assert (opt.grammars, opt.echildren) == (1, 3)
+    assert opt.learned == pytest.approx(1 / 3)
+    assert opt.grammars_learned == 0
+
+
+def test_paired_differences():
+    # echildren of the same seed, at noise 0 and 0.5, in no particular order.
+    # seed 4 has no noiseless echild to pair with.
+    rows = [(0.5, 2, 0.2), (0, 1, 0.1), (0.5, 4, 0.7), (0, 3, 0.3),
+            (0.5, 1, 0.4), (0, 2, 0.2), (0.5, 3, 0.9)]
+    df = pd.DataFrame({
+        'learner': 'CachedNDChild', 'rate': 0.9, 'conservativerate': 0.0005,
+        'language': 611, 'noise': [noise for noise, _, _ in rows],
+        'seed': [seed for _, seed, _ in rows],
+        **{param: 0.5 for param in PARAMETERS}})
+    df['SP'] = [sp for _, _, sp in rows]
+
+    diffs = paired_differences(df)
+    assert list(diffs.index) == [(611, 0.5)]
+    # SP differences of seeds 1, 2, 3: 0.3, 0, 0.6
+    sp = diffs.loc[(611, 0.5), 'SP']
+    assert sp['mean'] == pytest.approx(0.3)
+    assert sp['var'] == pytest.approx(0.09)
+    assert sp['sem'] == pytest.approx((0.09 / 3) ** 0.5)
+    hip = diffs.loc[(611, 0.5), 'HIP']
+    assert list(hip) == [0, 0, 0]
@@ -0,0 +1,65 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from NDChild import NDChild
+from regimes import (ABOVE, AT, BELOW, REGIME_PARAMETERS, REGIME_SHAPE,
+                     STATE_VALUES, RegimeChain, RegimeTables, flip_bound)
+
+SENTENCES = {
+    611: [('DEC', 'Adv S Verb O1'), ('DEC', 'S Aux Verb O1'),
+          ('Q', 'Aux S Verb O1'), ('DEC', 'S Verb O2'),
+          ('DEC', 'Adv S Verb O1 O2 P O3')],
+    3856: [('DEC', 'S O1 Verb'), ('DEC', 'S O1 Verb Aux'),
+           ('DEC', 'O1 S[+WA] Verb'), ('Q', 'S O1 Verb ka')],
+}
+
+
+def side(value):
+    return AT if value == 0.5 else ABOVE if value > 0.5 else BELOW
+
+
+def test_transitions_match_ndchild(domain):
+    tables = RegimeTables.build(domain)
+    for sentence_id, sentence in domain.sentences.items():
+        transitions = tables.transitions[tables.sentence_effects[sentence_id]]
+        for regime in itertools.product(range(3), repeat=len(REGIME_SHAPE)):
+            child = NDChild(0.9, 0.0005, 611)
+            child.grammar.update(zip(REGIME_PARAMETERS,
+                                     (STATE_VALUES[i] for i in regime)))
+            child.consumeSentence(sentence)
+            expected = np.ravel_multi_index(
+                [side(child.grammar[param]) for param in REGIME_PARAMETERS],
+                REGIME_SHAPE)
+            assert transitions[np.ravel_multi_index(
+                regime, REGIME_SHAPE)] == expected, (sentence.sentenceStr,
+                                                     regime)
+
+
+def test_chain(domain):
+    tables = RegimeTables.build(domain)
+
+    chain = RegimeChain.build(tables, domain, 611)
+    assert chain.transitions.sum(axis=1) == pytest.approx(1)
+    assert sum(chain.ending_probabilities().values()) == pytest.approx(1)
+    # SP is set below 0.5 by 2 of the 5 sentences, and never above
+    assert chain.side_probability('SP', BELOW) == pytest.approx(1)
+    assert chain.hitting(lambda r: r[0] == BELOW) == pytest.approx((1, 2.5))
+    assert chain.hitting(lambda r: r[0] == ABOVE) == (0, float('inf'))
+    # NT goes up at the learning rate, and down conservatively
+    assert chain.inexact == ['NT']
+    assert chain.distribution(0)[0] == 1
+
+    noisy = RegimeChain.build(tables, domain, 611, 0.2, 'confuser:3856')
+    assert sum(noisy.ending_probabilities().values()) == pytest.approx(1)
+    assert noisy.side_probability('TM', ABOVE) == pytest.approx(1)
+    assert noisy.hitting(lambda r: r[0] == BELOW)[1] == pytest.approx(
+        1 / (0.8 * 2 / 5))
+
+
+def test_flip_bound():
+    assert flip_bound(0.9, 0.0005) == 1176
+    assert flip_bound(0.9, 0) == float('inf')
+    with pytest.raises(ValueError):
+        flip_bound(0.5, 0.0005)
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from NDChild import NDChild
+from replay import (read_trajectory, record_trajectory, replay,
+                    snapshot_points, write_trajectory)
+
+SENTENCES = {
+    611: [('DEC', 'Adv S Verb O1'), ('DEC', 'Adv S Aux Verb O1'),
+          ('Q', 'Aux S Verb O1'), ('Q', 'O1[+WH] Aux S Verb'),
+          ('IMP', 'Verb O1'), ('DEC', 'O1 S Verb')],
+}
+
+
+def test_snapshot_points():
+    assert snapshot_points(10, 4) == [4, 8, 10]
+    assert snapshot_points(8, 4) == [4, 8]
+    assert snapshot_points(3, 4) == [3]
+
+
+def test_replay(domain, tmpdir):
+    rng = random.Random(0)
+    sentences = [domain.get_sentence_in_language(611, rng)
+                 for _ in range(1000)]
+    trajectory = record_trajectory(NDChild(0.3, 0.01, 611), 'NDChild',
+                                   sentences, stride=100)
+    path = str(tmpdir.join('trajectory.npz'))
+    write_trajectory(path, trajectory)
+    trajectory = read_trajectory(path)
+    assert len(trajectory.sentence_ids) == 1000
+    assert trajectory.grammar.shape == (10, 13)
+
+    for learner in ['NDChild', 'CachedNDChild']:
+        assert replay(trajectory, learner, domain) is None
+
+    trajectory.grammar[0, 0] += 0.1
+    divergence = replay(trajectory, 'NDChild', domain)
+    assert (divergence.sentence, divergence.parameter) == (100, 'SP')
+    assert divergence.actual == pytest.approx(divergence.expected - 0.1)
+    assert not divergence.exact
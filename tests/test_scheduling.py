@@ -0,0 +1,49 @@
+from multiprocessing.pool import ThreadPool
+
+from datatypes import TrialParameters
+from scheduling import CostModel, run_longest_first, unit_work
+
+
+def trial(language, numberofsentences, seed, learner='CachedNDChild', **kwargs):
+    return TrialParameters(language=language, noise=0, rate=0.9,
+                           conservativerate=0.0005,
+                           numberofsentences=numberofsentences, seed=seed,
+                           learner=learner, epsilon=0.01, **kwargs)
+
+
+def test_unit_work():
+    # two learners on one stream
+    assert unit_work([trial(611, 1000, 0), trial(611, 1000, 0, 'NDChild')]) \
+        == 2000
+    # a family of two noise levels branched after 400 sentences
+    family = [trial(611, 1000, 0, prefix_sentences=400),
+              trial(611, 1000, 0, prefix_sentences=400)]
+    family[1].noise = 0.1
+    assert unit_work(family) == 1600
+
+
+def test_longest_first(tmpdir):
+    units = [[trial(611, 1000 * (i % 3 + 1), i)] for i in range(6)]
+    units += [[trial(584, 1000, 6)], [trial(584, 1000, 7)]]
+    cost_model = CostModel()
+    order = []
+    with ThreadPool(1) as pool:
+        for result in run_longest_first(pool, order.append, units,
+                                        cost_model, max_pending=1):
+            assert result is None
+    assert [unit[0].numberofsentences for unit in order[:2]] == [3000, 3000]
+    assert {unit[0].seed for unit in order} == set(range(8))
+
+    # language 584 is recorded to be 10 times as costly, so its units go first
+    path = str(tmpdir.join('costs.json'))
+    cost_model = CostModel(path)
+    cost_model.record(units[0], 1.0)
+    cost_model.record(units[-1], 10.0 * unit_work(units[0]) / 1000)
+    cost_model.save()
+    cost_model = CostModel(path)
+    assert cost_model.predict(units[-1]) > cost_model.predict(units[2])
+    order = []
+    with ThreadPool(1) as pool:
+        list(run_longest_first(pool, order.append, units, cost_model,
+                               max_pending=1))
+    assert [unit[0].language for unit in order[:2]] == [584, 584]
@@ -0,0 +1,43 @@
+import pickle
+
+from Sentence import (Sentence, TOKENS, STRING_KEYS, WORD_KEYS, HAS_S, O3_IN,
+                      LAST_AUX, FIRST_WH, FIRST_P_O3_WH, OUT_OBLIQUE)
+
+
+def test_sentence_features():
+    """The features of a sentence agree with the word and string lookups they
+    replace in the e-triggers.
+
+    """
+    sentences = [
+        Sentence(['611', 'Q', 'O1[+WH] Aux S Never Verb O2 P O3 Aux', '1']),
+        Sentence(['584', 'DEC', 'O2 Verb S[+WA] O1 Adv', '2']),
+        Sentence(['2253', 'Q', 'P O3[+WH] Aux S Verb ka', '3']),
+        Sentence(['3856', 'IMP', 'Verb', '4']),
+    ]
+    for s in sentences:
+        words = s.sentenceStr.split()
+        for i, token in enumerate(TOKENS):
+            expected = words.index(token) if token in words else -1
+            assert s.features[i] == expected
+        for key in WORD_KEYS:
+            expected = next((i for i, word in enumerate(words) if key in word),
+                            -1)
+            assert s.indexString(key) == s.indexStringFull(key) == expected
+        for i, key in enumerate(STRING_KEYS, HAS_S):
+            assert s.features[i] == (key in s.sentenceStr)
+        assert s.features[LAST_AUX] == (words[-1] == 'Aux')
+        assert s.features[FIRST_WH] == ('+WH' in words[0])
+        assert s.features[FIRST_P_O3_WH] == (
+            len(words) > 1 and 'P' in words[0] and words[1] == 'O3[+WH]')
+
+        # sentences are pickled with the domain
+        copy = pickle.loads(pickle.dumps(s))
+        assert copy.features == s.features
+        assert copy.sentenceList == s.sentenceList
+
+    # O2 topicalized, out of canonical argument order
+    oblique = Sentence(['611', 'DEC', 'O2 Aux S Verb O1 P O3', '5'])
+    assert oblique.features[OUT_OBLIQUE] and oblique.outOblique()
+    assert not sentences[0].outOblique()
+    assert sentences[0].features[O3_IN] == 7
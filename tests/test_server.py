@@ -0,0 +1,59 @@
+import argparse
+import json
+
+import main
+import server
+from server import JobQueue
+
+
+def test_job_queue(tmp_path):
+    jobs = JobQueue(str(tmp_path / 'jobs.sqlite'))
+    first = jobs.submit(['-l', '611'], '/out/first')
+    second = jobs.submit(['-l', '584'], '/out/second')
+    assert [job['status'] for job in jobs.jobs()] == ['queued', 'queued']
+
+    # oldest first
+    job = jobs.claim()
+    assert job['id'] == first
+    assert json.loads(job['argv']) == ['-l', '611']
+    assert jobs.get(first)['status'] == 'running'
+    assert jobs.get(first)['started'] is not None
+
+    assert jobs.claim()['id'] == second
+    assert jobs.claim() is None
+
+    jobs.finish(first, output='/out/first/run')
+    assert jobs.get(first)['status'] == 'done'
+    assert jobs.get(first)['output'] == '/out/first/run'
+    assert jobs.get(first)['finished'] is not None
+
+    # a server restarting after dying mid-job runs it again, from a new
+    # connection to the same database
+    jobs = JobQueue(str(tmp_path / 'jobs.sqlite'))
+    assert jobs.requeue_running() == 1
+    job = jobs.get(second)
+    assert (job['status'], job['started']) == ('queued', None)
+    assert jobs.requeue_running() == 0
+
+    assert jobs.claim()['id'] == second
+    jobs.finish(second, error='Traceback...')
+    assert jobs.get(second)['status'] == 'failed'
+    assert jobs.get(second)['error'] == 'Traceback...'
+    assert jobs.claim() is None
+
+
+def test_submit_resolves_paths(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    args = argparse.Namespace(db='jobs.sqlite', output_directory='out',
+                              wait=False,
+                              args=['-l', '611', '--cache-dir', 'cache'])
+    server.submit(args)
+    job_id = int(capsys.readouterr().out)
+
+    job = JobQueue(str(tmp_path / 'jobs.sqlite')).get(job_id)
+    assert job['output_directory'] == str(tmp_path / 'out')
+    # the server parses the job's arguments in its own directory
+    monkeypatch.chdir('/')
+    parsed = main.parse_arguments(json.loads(job['argv']))
+    assert parsed.cache_dir == str(tmp_path / 'cache')
+    assert parsed.languages == [611]
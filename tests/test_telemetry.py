@@ -0,0 +1,81 @@
+import threading
+
+import telemetry
+from datatypes import TrialParameters
+from telemetry import (BUSY, LANGUAGE, NOISE, REPORT_EVERY, RSS, SENTENCES,
+                       UPDATED, Telemetry, init_worker, track)
+
+PARAMS = TrialParameters(language=611, noise=0.1, rate=0.9,
+                         conservativerate=0.0005, numberofsentences=25000,
+                         seed=0, learner='CachedNDChild', epsilon=0.01)
+
+
+def test_worker_reports():
+    t = Telemetry(1)
+    seen = []
+
+    def worker():
+        init_worker(*t.worker_args())
+        for i, _ in enumerate(track(range(25000), PARAMS), 1):
+            if i in (1, REPORT_EVERY + 1):
+                seen.append(t.worker(0))
+
+    # in a thread of its own, so the main thread stays outside of the pool
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    first, reported = seen
+    assert first[SENTENCES] == 0
+    assert (first[LANGUAGE], first[NOISE], first[BUSY]) == (611, 0.1, 1)
+    # reports come every REPORT_EVERY sentences
+    assert reported[SENTENCES] == REPORT_EVERY
+    assert reported[RSS] > 0
+    assert reported[UPDATED] >= first[UPDATED] > 0
+    # and at the end of the stream, with the remainder
+    assert t.sentences == 25000
+    assert t.worker(0)[BUSY] == 0
+
+
+def test_metrics(monkeypatch):
+    t = Telemetry(2)
+    now = 1000.0
+    monkeypatch.setattr(telemetry.time, 'time', lambda: now)
+    monkeypatch.setattr(telemetry.time, 'monotonic', lambda: now)
+
+    t.sample()
+    t.slots[0:6] = [30000, 611, 0.1, 2 ** 20, now - 2.5, 1]
+    t.slots[6:12] = [10000, 0, 0, 0, 0, 0]
+    now += 10
+    t.sample()
+    assert t.rates == [3000, 1000]
+    assert t.rate == 4000
+    assert t.busy_samples == [1, 0] and t.samples == 2
+    assert t.eta is None
+    t.expected = 100000
+    assert t.eta.total_seconds() == 15
+    assert t.summary() == '4,000 sents/s, slowest #0 3,000/s, ETA 0:00:15'
+
+    lines = t.metrics().splitlines()
+    values = [line for line in lines if not line.startswith('#')]
+    assert values == [
+        'ndchild_worker_sentences_total{worker="0"} 30000',
+        'ndchild_worker_sentences_total{worker="1"} 10000',
+        'ndchild_worker_sentences_per_second{worker="0"} 3000.0',
+        'ndchild_worker_sentences_per_second{worker="1"} 1000.0',
+        'ndchild_worker_busy{worker="0"} 1',
+        'ndchild_worker_busy{worker="1"} 0',
+        'ndchild_worker_language{worker="0"} 611',
+        'ndchild_worker_language{worker="1"} 0',
+        'ndchild_worker_noise{worker="0"} 0.1',
+        'ndchild_worker_noise{worker="1"} 0.0',
+        'ndchild_worker_rss_bytes{worker="0"} 1048576',
+        'ndchild_worker_rss_bytes{worker="1"} 0',
+        # worker 1 never reported
+        'ndchild_worker_seconds_since_report{worker="0"} 12.5',
+        'ndchild_worker_seconds_since_report{worker="1"} -1',
+        'ndchild_sentences_per_second 4000.0',
+        'ndchild_eta_seconds 15',
+    ]
+    assert '# TYPE ndchild_worker_sentences_total counter' in lines
+    assert '# TYPE ndchild_eta_seconds gauge' in lines
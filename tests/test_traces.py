@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import main
+from datatypes import PARAMETERS, Trace, TrialParameters
+from traces import TrajectoryBands, read_trace, sample_points, write_trace
+
+SENTENCES = {
+    611: [('DEC', 'Adv S Verb O1'), ('DEC', 'Adv S Aux Verb O1'),
+          ('Q', 'Aux S Verb O1'), ('Q', 'O1[+WH] Aux S Verb'),
+          ('IMP', 'Verb O1'), ('DEC', 'O1 S Verb')],
+    3856: [('DEC', 'S O1 Verb'), ('Q', 'S O1 Verb ka')],
+}
+
+PARAMS = TrialParameters(language=611, noise=0.1, rate=0.9,
+                         conservativerate=0.0005, numberofsentences=1000,
+                         seed=0, learner='CachedNDChild', epsilon=0.01)
+
+
+def test_trajectory_bands(tmpdir):
+    rng = np.random.default_rng(0)
+    points = sample_points(1000, 20)
+    values = rng.beta(0.5, 2, size=(500, len(points), len(PARAMETERS)))
+    bands = TrajectoryBands(bins=50)
+    for grammar in values:
+        bands.add(PARAMS, Trace(sentences=points,
+                                grammar=grammar.astype(np.float32)))
+
+    cell = bands.cells[TrajectoryBands.cell_key(PARAMS)]
+    values = values.astype(np.float32).astype(np.float64)
+    assert cell.count == 500
+    assert cell.mean == pytest.approx(values.mean(axis=0))
+    assert cell.variance() == pytest.approx(values.var(axis=0, ddof=1))
+    quantiles = cell.quantiles(TrajectoryBands.quantiles)
+    expected = np.quantile(values, TrajectoryBands.quantiles, axis=0)
+    assert np.abs(quantiles - expected).max() <= 1 / 50
+
+    path = str(tmpdir.join('bands.npz'))
+    bands.write(path)
+    with np.load(path) as data:
+        assert data['quantiles'].shape == (1, 5, len(points), len(PARAMETERS))
+        assert list(data['count']) == [500]
+
+    with pytest.raises(ValueError):
+        bands.add(PARAMS, Trace(sentences=points[:-1],
+                                grammar=values[0, :-1]))
+
+
+@pytest.mark.parametrize('spacing', ['linear', 'log'])
+def test_traced_trial(domain, tmpdir, spacing):
+    result = main.run_traced_trial(PARAMS, samples=11, spacing=spacing)
+    trace = result.trace
+    points = sample_points(1000, 11, spacing)
+    if spacing == 'linear':
+        assert points.tolist() == [1, 101, 201, 301, 401, 500, 600, 700, 800,
+                                   900, 1000]
+    assert trace.sentences.tolist() == points.tolist()
+    assert trace.grammar.dtype == np.float32
+
+    # the same learner, fed the same stream, has the recorded parameters at
+    # each point
+    child = main.make_child(PARAMS)
+    expected = []
+    for i, s in enumerate(main.sentence_stream(PARAMS), 1):
+        child.consumeSentence(s)
+        if i in points:
+            expected.append([child.grammar[p] for p in PARAMETERS])
+    assert trace.grammar.tolist() == np.float32(expected).tolist()
+    assert result.grammar == child.grammar
+
+    # and are saved and read back as is
+    params, read = read_trace(write_trace(str(tmpdir), PARAMS, trace))
+    assert params == PARAMS
+    assert np.array_equal(read.sentences, trace.sentences)
+    assert np.array_equal(read.grammar, trace.grammar)
@@ -0,0 +1,64 @@
+import random
+
+from NDChild import NDChild, restricted_triggers
+from trigger_index import TriggerIndex, sentence_effects
+
+SENTENCES = {
+    611: [('DEC', 'Adv S Verb O1'), ('DEC', 'Adv S Aux Verb O1'),
+          ('Q', 'Aux S Verb O1'), ('Q', 'O1[+WH] Aux S Verb'),
+          ('IMP', 'Verb O1')],
+    3856: [('DEC', 'S O1 Verb'), ('Q', 'S O2 O1 Verb ka'),
+           ('DEC', 'O1 S[+WA] O2 Never Verb')],
+}
+
+
+class Recorder(NDChild):
+    def __init__(self):
+        super().__init__(None, None, None)
+        self.fired = set()
+
+    def adjustweight(self, parameter, direction):
+        self.fired.add((parameter, direction, False))
+
+    def adjustweightConservatively(self, parameter, direction):
+        self.fired.add((parameter, direction, True))
+
+
+def test_index_covers_every_state(domain):
+    """Whatever the state of the learner, a sentence only has effects listed in
+    the index.
+
+    """
+    index = TriggerIndex.build(domain)
+    rng = random.Random(0)
+    for grammar, sentence_ids in domain.languages.items():
+        evidence = index.evidence(grammar)
+        for _ in range(500):
+            child = Recorder()
+            for param in child.grammar:
+                child.grammar[param] = rng.choice([0.2, 0.5, 0.8])
+            child.consumeSentence(domain.sentences[rng.choice(sentence_ids)])
+            assert child.fired <= set(evidence)
+
+    # no sentence of 611 is a question with ka, or an O1 before S
+    assert 'QInv' in index.reachable_triggers(611)
+    assert ('QInv', 0, False) not in index.evidence(611)
+    assert ('SP', 1, False) not in index.evidence(611)
+    assert index.evidence(611)[('SP', 0, False)] == 2 / 5
+
+
+def test_restricted_triggers(domain):
+    index = TriggerIndex.build(domain)
+    triggers = index.reachable_triggers(3856)
+    klass = restricted_triggers(NDChild, triggers)
+    child, restricted = NDChild(0.9, 0.01, 3856), klass(0.9, 0.01, 3856)
+    assert len(restricted.trigger_methods) == len(triggers) < 13
+
+    for _ in range(100):
+        s = domain.sentences[random.choice(domain.languages[3856])]
+        child.consumeSentence(s)
+        restricted.consumeSentence(s)
+    assert child.grammar == restricted.grammar
+
+    effects = sentence_effects(domain.sentences[6])
+    assert ('QInv', 'QInv', 0, False) in effects
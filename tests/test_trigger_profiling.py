@@ -0,0 +1,80 @@
+import csv
+
+import pytest
+
+from NDChild import LEARNERS, trigger_profiling
+from datatypes import TrialParameters
+from output_handler import TriggerReport
+
+# grammar 16 only has TM set
+SENTENCES = {
+    16: [('DEC', 'O1 S[+WA] Verb'), ('DEC', 'O1 Verb O2'), ('DEC', 'S Verb'),
+         ('Q', 'Aux S Verb O1')],
+}
+
+# what each sentence above fires, from the initial grammar. a topic marker
+# raises TM, two separated objects lower it, and TM is the only parameter they
+# move, so the other triggers fire the same on the question whenever it comes
+TM_UP = {('TM', 'TM', 1, False): 1}
+TM_DOWN = {('TM', 'TM', 0, False): 1}
+QUESTION = {('HCP', 'HCP', 0, False): 1, ('VtoI', 'VtoI', 0, True): 1,
+            ('AH', 'AH', 0, True): 1, ('QInv', 'QInv', 1, False): 1}
+
+
+def profile(domain, learner, order, timing=False):
+    child = trigger_profiling(LEARNERS[learner], timing)(0.6, 0.0005, 16)
+    for sentence_id in order:
+        child.consumeSentence(domain.sentences[sentence_id])
+    return child.trigger_stats()
+
+
+@pytest.mark.parametrize('learner', ['NDChild', 'CachedNDChild'])
+def test_trigger_counts(domain, learner):
+    for sentence_id, fires in enumerate([TM_UP, TM_DOWN, {}, QUESTION]):
+        assert profile(domain, learner, [sentence_id])['fires'] == fires
+
+    stats = profile(domain, learner, [2, 3, 0, 0, 1, 0, 2])
+    assert stats['sentences'] == 7
+    assert stats['fires'] == {('TM', 'TM', 1, False): 3,
+                              ('TM', 'TM', 0, False): 1, **QUESTION}
+    assert stats['time'] is None
+
+    stats = profile(domain, learner, [0, 1, 2], timing=True)
+    assert stats['sentences'] == 3
+    assert len(stats['time']) == 13
+    assert all(seconds >= 0 for seconds in stats['time'].values())
+
+
+def test_cached_counts_match(domain):
+    order = [3, 0, 1, 2, 0, 0, 3, 1, 1, 1, 1, 0]
+    assert profile(domain, 'NDChild', order) == \
+        profile(domain, 'CachedNDChild', order)
+
+
+def test_trigger_report(domain, tmpdir):
+    report = TriggerReport()
+    for seed, order in enumerate([[0, 0, 1, 2], [3, 0, 2, 2]]):
+        trial = TrialParameters(language=16, noise=0, rate=0.6,
+                                conservativerate=0.0005,
+                                numberofsentences=len(order), seed=seed,
+                                learner='CachedNDChild', epsilon=0.01)
+        report.add(trial, profile(domain, 'CachedNDChild', order))
+
+    fires_output = str(tmpdir.join('triggers.csv'))
+    times_output = str(tmpdir.join('trigger_times.csv'))
+    report.write(fires_output, times_output)
+    with open(fires_output) as fh:
+        rows = [(row['trigger'], row['param'], row['direction'],
+                 row['conservative'], row['echildren'], row['sentences'],
+                 row['fires'], float(row['fires_per_sentence']))
+                for row in csv.DictReader(fh)]
+    assert rows == [
+        ('AH', 'AH', '0', 'True', '2', '8', '1', 1 / 8),
+        ('HCP', 'HCP', '0', 'False', '2', '8', '1', 1 / 8),
+        ('QInv', 'QInv', '1', 'False', '2', '8', '1', 1 / 8),
+        ('TM', 'TM', '0', 'False', '2', '8', '1', 1 / 8),
+        ('TM', 'TM', '1', 'False', '2', '8', '3', 3 / 8),
+        ('VtoI', 'VtoI', '0', 'True', '2', '8', '1', 1 / 8),
+    ]
+    # no timings, no timing report
+    assert not tmpdir.join('trigger_times.csv').exists()
@@ -0,0 +1,62 @@
+import main
+from datatypes import ExperimentParameters
+
+SENTENCES = {
+    611: [('DEC', 'Adv S Verb O1'), ('DEC', 'Adv S Aux Verb O1'),
+          ('Q', 'Aux S Verb O1'), ('Q', 'O1[+WH] Aux S Verb'),
+          ('IMP', 'Verb O1'), ('DEC', 'O1 S Verb')],
+    3856: [('DEC', 'S O1 Verb'), ('Q', 'S O1 Verb ka')],
+}
+
+LEARNERS = ['CachedNDChild', 'NDChildModLRP']
+
+
+def recording_children(monkeypatch):
+    """Makes main.make_child record the ids of the sentences each learner is
+    fed. Returns the list of (trial, ids) it fills.
+
+    """
+    make_child = main.make_child
+    fed = []
+
+    def recording_make_child(params, profiling=None):
+        child = make_child(params, profiling)
+        ids = []
+        consume = child.consumeSentence
+
+        def consumeSentence(s):
+            ids.append(s.sentID)
+            consume(s)
+
+        child.consumeSentence = consumeSentence
+        fed.append((params, ids))
+        return child
+
+    monkeypatch.setattr(main, 'make_child', recording_make_child)
+    return fed
+
+
+def test_variants_share_streams(domain, monkeypatch):
+    params = ExperimentParameters(
+        languages=[611], noise_levels=[0.2], learningrates=[0.9],
+        conservative_learningrates=[0.0005], num_sentences=2000,
+        num_echildren=1, num_procs=1, trace=False, learners=LEARNERS)
+    trials = main.echild_trials(params, 611, 0.2, 0)
+    assert [trial.learner for trial in trials] == LEARNERS
+    assert len({trial.stream_key() for trial in trials}) == 1
+
+    fed = recording_children(monkeypatch)
+    side_by_side = main.run_trials(trials)
+    # every variant was fed the same sentences
+    (_, first), (_, second) = fed
+    assert len(first) == 2000 and first == second
+
+    # and learned what it learns on its own
+    for trial, result in zip(trials, side_by_side):
+        assert result.trial_params == trial
+        alone = main.run_trial(trial)
+        assert fed[-1][1] == first
+        assert result.grammar == alone.grammar
+        assert result.convergence == alone.convergence
+    # the variants do learn differently
+    assert side_by_side[0].grammar != side_by_side[1].grammar
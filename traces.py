@@ -0,0 +1,200 @@
+"""Recording of echild trajectories: the values of the parameters over the
+course of a simulation, sampled at fixed sentence counts into compact arrays.
+
+"""
+import os.path
+
+import numpy as np
+
+from datatypes import PARAMETERS, Trace, TrialParameters
+
+
+def sample_points(num_sentences, samples, spacing='linear'):
+    """Returns the sorted sentence counts (between 1 and `num_sentences`) after
+    which a traced echild's parameters are recorded. The `samples` points are
+    evenly spaced, either linearly or (with spacing='log') logarithmically, which
+    resolves the fast early learning better. Points that round to the same
+    sentence count are merged, so there may be fewer than `samples`.
+
+    """
+    if spacing == 'log':
+        points = np.geomspace(1, num_sentences, samples)
+    elif spacing == 'linear':
+        points = np.linspace(1, num_sentences, samples)
+    else:
+        raise ValueError('unknown trace spacing {!r}'.format(spacing))
+    return np.unique(np.round(points).astype(np.int64))
+
+
+class TraceRecorder:
+    """Records the parameters of a learner at the sentence counts `points` into
+    a preallocated float32 array.
+
+    """
+
+    def __init__(self, points):
+        self.points = points
+        self.values = np.empty((len(points), len(PARAMETERS)),
+                               dtype=np.float32)
+        self._points = points.tolist()
+        self._next = 0
+        # the sentence count at which the next sample is due
+        self.due = self._points[0] if self._points else -1
+
+    def record(self, grammar):
+        self.values[self._next] = [grammar[p] for p in PARAMETERS]
+        self._next += 1
+        if self._next < len(self._points):
+            self.due = self._points[self._next]
+        else:
+            self.due = -1
+
+    def trace(self):
+        return Trace(sentences=self.points[:self._next],
+                     grammar=self.values[:self._next])
+
+
+def trace_filename(params: TrialParameters):
+    return '{}_{}_{}_R{}_C{}_{}.npz'.format(
+        params.language, params.noise, params.learner, params.rate,
+        params.conservativerate, params.seed)
+
+
+def write_trace(directory, params: TrialParameters, trace: Trace):
+    """Writes `trace` to a compressed .npz file in `directory`, along with the
+    parameter names and the trial parameters. Returns the path written.
+
+    """
+    path = os.path.join(directory, trace_filename(params))
+    np.savez_compressed(path,
+                        sentences=trace.sentences,
+                        grammar=trace.grammar,
+                        parameters=np.array(PARAMETERS),
+                        # unset fields would need pickling, and read back as
+                        # their default of None anyway
+                        **{key: np.array(value)
+                           for key, value in params.as_dict().items()
+                           if value is not None})
+    return path
+
+
+def read_trace(path):
+    """ Reads a trace written by `write_trace`. Returns (trial params, trace) """
+    with np.load(path) as data:
+        params = TrialParameters(**{
+            field: data[field].item()
+            for field in TrialParameters.__dataclass_fields__
+            # traces written before a field was added get its default
+            if field in data.files})
+        return params, Trace(sentences=data['sentences'],
+                             grammar=data['grammar'])
+
+
+class TrajectoryBands:
+    """Aggregates the traces of many echildren online into per-cell trajectory
+    bands: the mean, variance and approximate quantiles of each parameter at
+    each sample point. A cell is a language and noise level, for a given
+    learner setting.
+
+    Means and variances are kept with Welford's algorithm. Quantiles are read
+    off a histogram of `bins` equal-width bins over [0, 1] per parameter and
+    sample point, interpolating within bins, so they are accurate to about
+    1/bins. Memory is independent of the number of echildren aggregated.
+
+    """
+    quantiles = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+    def __init__(self, bins=100):
+        self.bins = bins
+        # maps cell -> _CellBands
+        self.cells = {}
+
+    @staticmethod
+    def cell_key(params: TrialParameters):
+        return (params.learner, params.rate, params.conservativerate,
+                params.language, params.noise)
+
+    def add(self, params: TrialParameters, trace: Trace):
+        key = self.cell_key(params)
+        if key not in self.cells:
+            self.cells[key] = _CellBands(trace.sentences, self.bins)
+        self.cells[key].add(trace)
+
+    def write(self, path):
+        """Writes the bands of every cell to the compressed .npz file `path`.
+
+        Arrays are stacked over cells, in the order of the `cell_*` arrays
+        which identify them: `count` (cells,), `mean` and `var` (cells,
+        samples, parameters) and `quantiles` (cells, len(quantiles), samples,
+        parameters). `sentences` holds the sample points of each cell.
+
+        """
+        keys = sorted(self.cells)
+        cells = [self.cells[key] for key in keys]
+        columns = list(zip(*keys))
+        np.savez_compressed(
+            path,
+            cell_learner=np.array(columns[0]),
+            cell_rate=np.array(columns[1]),
+            cell_conservativerate=np.array(columns[2]),
+            cell_language=np.array(columns[3]),
+            cell_noise=np.array(columns[4]),
+            parameters=np.array(PARAMETERS),
+            quantile_levels=np.array(self.quantiles),
+            sentences=np.stack([c.sentences for c in cells]),
+            count=np.array([c.count for c in cells]),
+            mean=np.stack([c.mean for c in cells]),
+            var=np.stack([c.variance() for c in cells]),
+            quantiles=np.stack([c.quantiles(self.quantiles) for c in cells]))
+
+
+class _CellBands:
+    """ The running aggregates of the traces of one cell """
+
+    def __init__(self, sentences, bins):
+        self.sentences = sentences
+        self.bins = bins
+        self.count = 0
+        shape = (len(sentences), len(PARAMETERS))
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+        self.histogram = np.zeros(shape + (bins,), dtype=np.int32)
+        # offset of the histogram of each (sample, parameter) in the
+        # flattened histogram
+        self._offsets = np.arange(shape[0] * shape[1]).reshape(shape) * bins
+
+    def add(self, trace: Trace):
+        if not np.array_equal(trace.sentences, self.sentences):
+            raise ValueError('traces of a cell must share their sample points')
+        values = trace.grammar.astype(np.float64)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (values - self.mean)
+
+        bin_index = np.clip((values * self.bins).astype(np.int64),
+                            0, self.bins - 1)
+        # each (sample, parameter) gets exactly one increment, so there are no
+        # repeated indexes and fancy-index assignment is safe.
+        self.histogram.reshape(-1)[self._offsets + bin_index] += 1
+
+    def variance(self):
+        if self.count < 2:
+            return np.full_like(self.mean, np.nan)
+        return self._m2 / (self.count - 1)
+
+    def quantiles(self, levels):
+        cumulative = np.cumsum(self.histogram, axis=-1)
+        result = []
+        for level in levels:
+            target = level * self.count
+            # the first bin whose cumulative count reaches the target
+            index = np.minimum((cumulative < target).sum(axis=-1),
+                               self.bins - 1)[..., np.newaxis]
+            before = np.take_along_axis(cumulative, index, axis=-1) \
+                - np.take_along_axis(self.histogram, index, axis=-1)
+            in_bin = np.maximum(
+                np.take_along_axis(self.histogram, index, axis=-1), 1)
+            fraction = np.clip((target - before) / in_bin, 0, 1)
+            result.append(((index + fraction) / self.bins)[..., 0])
+        return np.stack(result)
@@ -0,0 +1,187 @@
+# coding: utf-8
+"""An index of the e-trigger effects that each grammar's sentences can cause.
+
+For every grammar of a domain, the index records which (trigger, parameter,
+direction, conservative) adjustments its sentences can trigger, and on what
+fraction of its sentences. Most triggers only look at the sentence, but OPT,
+ItoC and AH also look at which side of 0.5 some parameters of the learner
+are (see `STATE_DEPENDENCIES`). These are evaluated in every combination of
+those sides, so their effects are the ones that *can* happen, in some
+learner state, and their frequencies are upper bounds.
+
+Learners fed only in-language sentences can skip the triggers that never
+fire for their target grammar (see `NDChild.restricted_triggers`). Run as a
+script, the module reports which parameters get any evidence in each
+grammar:
+
+    $ python trigger_index.py --output evidence.csv
+
+"""
+import argparse
+import csv
+import itertools
+import logging
+
+from NDChild import NDChild, TriggerCacher
+from datatypes import PARAMETERS
+from utils import progress_bar
+
+# the parameters whose values the state dependent triggers compare to 0.5
+STATE_DEPENDENCIES = {
+    'OPT': ['TM', 'NT'],
+    'ItoC': ['SP', 'HIP', 'HCP'],
+    'AH': ['ItoC', 'HIP'],
+}
+
+# below, at and above 0.5: the triggers only compare parameters to 0.5
+STATE_VALUES = (0.25, 0.5, 0.75)
+
+
+class _EffectRecorder(NDChild):
+    """ An NDChild which records the adjustments of its triggers """
+
+    def __init__(self):
+        super().__init__(None, None, None)
+        self.effects = set()
+        self.current_trigger = None
+
+    def adjustweight(self, parameter, direction):
+        self.effects.add((self.current_trigger, parameter, direction, False))
+
+    def adjustweightConservatively(self, parameter, direction):
+        self.effects.add((self.current_trigger, parameter, direction, True))
+
+
+def sentence_effects(sentence, recorder=None):
+    """Returns the set of (trigger, parameter, direction, conservative) effects
+    `sentence` can have on a learner, in any state.
+
+    """
+    recorder = recorder or _EffectRecorder()
+    recorder.effects = set()
+    for trigger in recorder.trigger_methods:
+        name = TriggerCacher.trigger_name(trigger)
+        recorder.current_trigger = name
+        params = STATE_DEPENDENCIES.get(name, [])
+        for values in itertools.product(STATE_VALUES, repeat=len(params)):
+            recorder.grammar.update(zip(params, values))
+            trigger(sentence)
+    return recorder.effects
+
+
+class TriggerIndex:
+    """ The possible e-trigger effects of the sentences of each grammar """
+
+    def __init__(self):
+        # maps grammar id -> {(trigger, param, direction, conservative):
+        # number of the grammar's sentences that can have that effect}
+        self.counts = {}
+        # maps grammar id -> {(param, direction, conservative): number of the
+        # grammar's sentences that can have that effect, through any trigger}
+        self.evidence_counts = {}
+        # maps grammar id -> number of sentences
+        self.sizes = {}
+
+    @classmethod
+    def build(cls, domain):
+        index = cls()
+        recorder = _EffectRecorder()
+        effects = {
+            sentence_id: frozenset(sentence_effects(sentence, recorder))
+            for sentence_id, sentence in progress_bar(
+                domain.sentences.items(), desc='indexing trigger effects')
+        }
+        evidence = {
+            sentence_id: frozenset(effect[1:] for effect in effect_set)
+            for sentence_id, effect_set in effects.items()
+        }
+        for grammar, sentence_ids in domain.languages.items():
+            counts, evidence_counts = {}, {}
+            for sentence_id in sentence_ids:
+                for effect in effects[sentence_id]:
+                    counts[effect] = counts.get(effect, 0) + 1
+                for key in evidence[sentence_id]:
+                    evidence_counts[key] = evidence_counts.get(key, 0) + 1
+            index.counts[grammar] = counts
+            index.evidence_counts[grammar] = evidence_counts
+            index.sizes[grammar] = len(sentence_ids)
+        return index
+
+    def reachable_triggers(self, grammar):
+        """ The names of the triggers that can fire on the grammar's sentences """
+        return frozenset(trigger for trigger, *_ in self.counts[grammar])
+
+    def frequencies(self, grammar):
+        """Maps each possible effect to the fraction of the grammar's sentences
+        that can have it, ie. its probability per in-language sentence.
+
+        """
+        size = self.sizes[grammar]
+        return {effect: count / size
+                for effect, count in self.counts[grammar].items()}
+
+    def evidence(self, grammar):
+        """Maps (parameter, direction, conservative) to the fraction of the
+        grammar's sentences that can adjust the parameter that way, through
+        any trigger.
+
+        """
+        size = self.sizes[grammar]
+        return {key: count / size
+                for key, count in self.evidence_counts[grammar].items()}
+
+    def write_csv(self, path):
+        """Writes a row per grammar, with the fraction of its sentences that can
+        adjust each parameter towards 0 and towards 1, at the learning rate
+        (`<param>_<direction>`) and at the conservative rate
+        (`<param>_<direction>_cons`).
+
+        """
+        keys = [(param, direction, conservative)
+                for param in PARAMETERS
+                for direction in (0, 1)
+                for conservative in (False, True)]
+        columns = ['{}_{}{}'.format(param, direction,
+                                    '_cons' if conservative else '')
+                   for param, direction, conservative in keys]
+        with open(path, 'w') as fh:
+            writer = csv.writer(fh)
+            writer.writerow(['grammar', 'sentences'] + columns)
+            for grammar in sorted(self.counts):
+                evidence = self.evidence(grammar)
+                writer.writerow(
+                    [grammar, self.sizes[grammar]] +
+                    [round(evidence.get(key, 0), 6) for key in keys])
+
+
+def main():
+    from main import DOMAIN
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-o', '--output', default='trigger_index.csv',
+                        help='write the evidence of every grammar to this '
+                        'csv file')
+    args = parser.parse_args()
+
+    DOMAIN.init_from_flatfile()
+    index = TriggerIndex.build(DOMAIN)
+    logging.info('writing evidence per grammar to %s', args.output)
+    index.write_csv(args.output)
+
+    # parameters with no evidence in some grammar cannot be learned there
+    print('{:<6} {:>22} {:>22}'.format('param', 'grammars w/o evidence',
+                                       'w/o evidence to target'))
+    for i, param in enumerate(PARAMETERS):
+        none = without_target = 0
+        for grammar in index.counts:
+            evidence = index.evidence(grammar)
+            target = int(format(int(grammar), '013b')[i])
+            if not any(p == param for p, _, _ in evidence):
+                none += 1
+            if not any(p == param and d == target for p, d, _ in evidence):
+                without_target += 1
+        print('{:<6} {:>22} {:>22}'.format(param, none, without_target))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+import hashlib
+import random
+from array import array
+
 
 def progress_bar(iterable, **kwargs):
     """ If tqdm is installed, Reports progress on the generation of `iterable` """
@@ -6,3 +10,100 @@ def progress_bar(iterable, **kwargs):
     except ImportError:
         return iterable
     return tqdm.tqdm(iterable, **kwargs)
+
+
+def derive_seed(*keys):
+    """Deterministically derives a 64 bit random seed from `keys`. The same keys
+    always produce the same seed, across processes and python versions.
+
+    """
+    digest = hashlib.sha256(repr(keys).encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+class RunningStats:
+    """Online mean and variance of a stream of values (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """ The sample variance, or nan if fewer than two values were seen """
+        if self.count < 2:
+            return float('nan')
+        return self._m2 / (self.count - 1)
+
+    @property
+    def sem(self):
+        """ The standard error of the mean """
+        return (self.variance / self.count) ** 0.5 if self.count else float('nan')
+
+
+class AliasTable:
+    """Walker's alias method: draws index i with probability proportional to
+    `weights[i]` in constant time, with a single uniform variate per draw.
+
+    """
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        if not n or total <= 0:
+            raise ValueError('weights must have a positive sum')
+        # scaled so the average is 1: underfull entries borrow from overfull
+        # ones (Vose's construction)
+        scaled = [w * n / total for w in weights]
+        self.prob = array('d', [1.0]) * n
+        self.alias = array('i', range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+        # whatever is left is 1, up to rounding
+
+    def __len__(self):
+        return len(self.prob)
+
+    def probabilities(self):
+        """ The probability of drawing each index, as a list """
+        n = len(self.prob)
+        probs = [0.0] * n
+        for i in range(n):
+            probs[i] += self.prob[i] / n
+            probs[self.alias[i]] += (1 - self.prob[i]) / n
+        return probs
+
+    def draw(self, rng=random):
+        """ Draws an index using `rng`, a random.Random """
+        u = rng.random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def draw_batch(self, generator, size):
+        """Draws `size` indices at once using the numpy random `generator`, as an
+        int array.
+
+        """
+        import numpy as np
+
+        prob = np.frombuffer(self.prob, dtype=np.float64)
+        alias = np.frombuffer(self.alias, dtype=np.int32)
+        u = generator.random(size) * len(prob)
+        i = u.astype(np.int64)
+        return np.where(u - i < prob[i], i, alias[i])